@@ -2,6 +2,7 @@
 """
 import argparse
 import os
+import sys
 import unittest
 
 import _pickle as pickle
@@ -14,6 +15,7 @@ from tf_encrypted.performance import Performance
 from tf_encrypted.protocol import ABY3  # noqa:F403,F401
 from tf_encrypted.protocol import Pond  # noqa:F403,F401
 from tf_encrypted.protocol import SecureNN  # noqa:F403,F401
+from tf_encrypted.protocol.protocol import dispatch_table
 from tf_encrypted.utils import print_banner
 
 directory = os.path.dirname(os.path.abspath(__file__))
@@ -101,6 +103,36 @@ class TestConvertInference(unittest.TestCase):
         print("Plain model predicted:", decode_predictions(preds, top=10)[0])
         self.tfe_model_predict(model, images, decode_predictions)
 
+    def test_dispatch(self):
+        # micro-benchmark of resolving protocol implementations, which happens
+        # for every protocol operation when tracing the models above
+        repeats = 100000
+        prot = tfe.get_protocol()
+        module = sys.modules[type(prot).__module__]
+        x = tfe.define_private_input("prediction-client", lambda: tf.ones([1]))
+        y = tfe.define_constant(np.ones([1]))
+
+        def legacy_lookup(base_name, *args):
+            suffix = "_".join(
+                [arg.dispatch_id for arg in args if hasattr(arg, "dispatch_id")]
+            )
+            return getattr(module, "_{}_{}".format(base_name, suffix))
+
+        def table_lookup(base_name, *args):
+            return dispatch_table(module).resolve(base_name, args)
+
+        assert legacy_lookup("mul", x, y) is table_lookup("mul", x, y)
+
+        Performance.time_log("Legacy dispatch x" + str(repeats))
+        for _ in range(repeats):
+            legacy_lookup("mul", x, y)
+        Performance.time_log("Legacy dispatch x" + str(repeats))
+
+        Performance.time_log("Dispatch table x" + str(repeats))
+        for _ in range(repeats):
+            table_lookup("mul", x, y)
+        Performance.time_log("Dispatch table x" + str(repeats))
+
 
 if __name__ == "__main__":
 
@@ -1,16 +1,53 @@
 # pylint: disable=all
 # pylint: disable=missing-docstring
 import argparse
+import os
+import sys
+import time
 import unittest
 
 import numpy as np
 import tensorflow as tf
 
 import tf_encrypted as tfe
+from tf_encrypted.operations import secure_random
+from tf_encrypted.operations import tf_i128
+from tf_encrypted.tensor import int64factory
+from tf_encrypted.tensor import native_factory
 from tf_encrypted.performance import Performance
+from tf_encrypted.player import DataOwner
 from tf_encrypted.protocol import ABY3  # noqa:F403,F401
 from tf_encrypted.protocol import Pond  # noqa:F403,F401
 from tf_encrypted.protocol import SecureNN  # noqa:F403,F401
+from tf_encrypted.protocol.aby3 import ShareType
+from tf_encrypted.protocol.aby3.ppa_cost import PPA_TOPOLOGIES
+from tf_encrypted.protocol.aby3.ppa_cost import ppa_cost
+from tf_encrypted.protocol.aby3.ppa_cost import select_ppa_topology
+from tf_encrypted.protocol.pond import FileTripleSource
+from tf_encrypted.protocol.pond import OnlineTripleSource
+
+
+def legacy_i128_encode(A):
+    # per-element encoding through python ints, as done before vectorization
+    shape = A.shape
+    A = A.reshape([-1]).astype(object)
+    A = np.expand_dims(A, axis=-1)
+    A = np.concatenate((A, np.zeros(A.shape, dtype=object)), axis=-1)
+
+    def _encode(tupl):
+        integer = int(tupl[0]) & ((1 << 128) - 1)
+        return np.frombuffer(integer.to_bytes(16, "little"), dtype=np.int64)
+
+    return np.apply_along_axis(_encode, -1, A).reshape(shape + (2,))
+
+
+def legacy_i128_decode(A, scale):
+    def _decode_i128(two):
+        return (
+            int(two[0].astype(np.uint64)) + (int(two[1].astype(np.int64)) << 64)
+        ) / scale
+
+    return np.apply_along_axis(_decode_i128, len(A.shape) - 1, A)
 
 
 class TestOPProfile(unittest.TestCase):
@@ -59,6 +96,59 @@ class TestOPProfile(unittest.TestCase):
         test_sort(private_x)
         Performance.time_log("2nd run")
 
+    def test_sort_method_performance(self):
+        for n in [2**10, 2**12, 2**14, 2**16]:
+            x = tf.random.shuffle(tf.range(n))
+            private_x = tfe.define_private_input("server0", lambda: x)
+
+            for method in ["bitonic", "shuffle"]:
+
+                @tfe.function
+                def test_sort(input):
+                    y = tfe.sort(input, axis=0, acc=True, method=method)
+                    return y.reveal().to_native()
+
+                label = "{} sort of {} elements".format(method, n)
+                Performance.time_log(label + " 1st run")
+                result = test_sort(private_x)
+                np.testing.assert_allclose(result, np.arange(n), rtol=0.0, atol=0.01)
+                Performance.time_log(label + " 1st run")
+
+                Performance.time_log(label + " 2nd run")
+                test_sort(private_x)
+                Performance.time_log(label + " 2nd run")
+
+    def test_top_k_performance(self):
+        # a batch of 1000-class logits, as returned by a classifier
+        x = tf.reshape(
+            tf.stack([tf.random.shuffle(tf.range(1000)) for _ in range(32)]),
+            [32, 1000],
+        )
+        private_x = tfe.define_private_input("server0", lambda: x)
+
+        for k in [1, 5]:
+            expected = tf.math.top_k(x, k).values
+
+            @tfe.function
+            def test_top_k(input):
+                values, _ = tfe.top_k(input, k, axis=1)
+                return values.reveal().to_native()
+
+            @tfe.function
+            def test_sort(input):
+                values = tfe.sort(input, axis=1, acc=False)[:, :k]
+                return values.reveal().to_native()
+
+            for label, func in [("top-{}".format(k), test_top_k), ("sort", test_sort)]:
+                Performance.time_log(label + " 1st run")
+                result = func(private_x)
+                np.testing.assert_allclose(result, expected, rtol=0.0, atol=0.01)
+                Performance.time_log(label + " 1st run")
+
+                Performance.time_log(label + " 2nd run")
+                func(private_x)
+                Performance.time_log(label + " 2nd run")
+
     def test_max_performance_type1(self):
         n = 2**10
         x = tf.range(n)
@@ -226,6 +316,698 @@ class TestOPProfile(unittest.TestCase):
             test_mul_constant(private_x)
         Performance.time_log("Mul const run " + str(repeats) + " rounds")
 
+    def test_i128_encode_performance(self):
+        scale = 2**40
+        for n in [10**3, 10**4, 10**5, 10**6, 10**7]:
+            x = np.random.uniform(-1000, 1000, size=[n]) * scale
+
+            Performance.time_log("legacy i128 encode n=" + str(n))
+            encoded = legacy_i128_encode(x)
+            Performance.time_log("legacy i128 encode n=" + str(n))
+
+            Performance.time_log("vectorized i128 encode n=" + str(n))
+            result = tf_i128.encode(x)
+            Performance.time_log("vectorized i128 encode n=" + str(n))
+            np.testing.assert_array_equal(result, encoded)
+
+            Performance.time_log("legacy i128 decode n=" + str(n))
+            decoded = legacy_i128_decode(encoded, scale)
+            Performance.time_log("legacy i128 decode n=" + str(n))
+
+            Performance.time_log("vectorized i128 decode n=" + str(n))
+            result = tf_i128.decode(encoded, scale)
+            Performance.time_log("vectorized i128 decode n=" + str(n))
+            np.testing.assert_array_equal(result, decoded)
+
+    def test_limb_matmul_performance(self):
+        limb_factory = native_factory(tf.int64, MATMUL_LIMB_BITS=22)
+        info = np.iinfo(np.int64)
+        for n in [256, 512, 1024, 2048, 4096]:
+            x = np.random.randint(info.min, info.max, size=[n, n], dtype=np.int64)
+            y = np.random.randint(info.min, info.max, size=[n, n], dtype=np.int64)
+
+            results = {}
+            for name, factory in [("int64", int64factory), ("limb", limb_factory)]:
+                a = factory.tensor(x)
+                b = factory.tensor(y)
+
+                @tf.function
+                def matmul():
+                    return a.matmul(b).value
+
+                matmul()
+                Performance.time_log(name + " matmul n=" + str(n))
+                results[name] = matmul()
+                Performance.time_log(name + " matmul n=" + str(n))
+            np.testing.assert_array_equal(results["limb"], results["int64"])
+
+    def test_i128_matmul_performance(self):
+        # set with the TF_NUM_INTRAOP_THREADS environment variable
+        threads = os.environ.get("TF_NUM_INTRAOP_THREADS", "default")
+        info = np.iinfo(np.int64)
+        for n in [128, 256, 512, 1024]:
+            x = np.random.randint(info.min, info.max, size=[n, n, 2], dtype=np.int64)
+            y = np.random.randint(info.min, info.max, size=[n, n, 2], dtype=np.int64)
+            x64 = tf.constant(x[..., 0])
+            y64 = tf.constant(y[..., 0])
+            x128 = tf.constant(x)
+            y128 = tf.constant(y)
+
+            cases = [
+                ("64-bit", lambda: tf.matmul(x64, y64)),
+                ("128-bit", lambda: tf_i128.matmul(x128, y128)),
+                ("128-bit transpose_b", lambda: tf_i128.matmul(x128, y128, False, True)),
+            ]
+            for name, func in cases:
+                func()
+                label = "{} matmul n={} threads={}".format(name, n, threads)
+                Performance.time_log(label)
+                func()
+                Performance.time_log(label)
+
+    def test_secure_random_performance(self):
+        # set with the TF_NUM_INTRAOP_THREADS environment variable
+        threads = os.environ.get("TF_NUM_INTRAOP_THREADS", "default")
+        seed = secure_random.secure_seed()
+        shape = [1 << 22]
+        repeats = 10
+        i64 = tf.int64
+        lo = tf.constant([0, i64.min], dtype=i64)
+        hi = tf.constant([-1, i64.max], dtype=i64)
+        cases = [
+            (
+                "seeded int64",
+                lambda: secure_random.seeded_random_uniform(
+                    shape, i64.min, i64.max, dtype=i64, seed=seed
+                ),
+            ),
+            (
+                "int64",
+                lambda: secure_random.random_uniform(
+                    shape, i64.min, i64.max, dtype=i64
+                ),
+            ),
+            (
+                "seeded int128",
+                lambda: secure_random.i128_seeded_random_uniform(
+                    shape, seed, lo, hi
+                ),
+            ),
+            (
+                "int128",
+                lambda: secure_random.i128_random_uniform(
+                    shape, lo, hi
+                ),
+            ),
+        ]
+        for name, func in cases:
+            nbytes = func().numpy().nbytes
+            start = time.time()
+            for _ in range(repeats):
+                func()
+            elapsed = time.time() - start
+            print(
+                "{} uniform threads={}: {:.1f} MB/s".format(
+                    name, threads, repeats * nbytes / elapsed / 1e6
+                )
+            )
+
+    def test_private_input_performance(self):
+        # MNIST training images, and 1GB of 64-bit tabular values
+        inputs = [("mnist", [60000, 784]), ("tabular", [1 << 21, 64])]
+        for name, shape in inputs:
+            for owner in ["input-provider", "server0"]:
+
+                def share():
+                    x = tfe.define_private_input(
+                        owner, lambda: tf.random.uniform(shape, -1, 1)
+                    )
+                    return x.unwrapped
+
+                report = tfe.communication_stats(share)
+                print(
+                    "{} input from {}: {} bytes, {} full shares".format(
+                        name, owner, report.bytes, report.bytes // (np.prod(shape) * 8)
+                    )
+                )
+
+                label = "{} input from {}".format(name, owner)
+                Performance.time_log(label)
+                shares = share()
+                Performance.time_log(label)
+                del shares
+
+    def test_triple_store_performance(self):
+        repeats = 10
+        x = np.random.uniform(-1, 1, size=[128, 784])
+        w0 = np.random.uniform(-0.1, 0.1, size=[784, 128])
+        w1 = np.random.uniform(-0.1, 0.1, size=[128, 10])
+        sources = [
+            ("online", OnlineTripleSource("server2")),
+            ("file", FileTripleSource("server0", "server1", "server2")),
+        ]
+        for name, source in sources:
+            tfe.set_protocol(Pond(triple_source=source))
+            input_x = tfe.define_private_variable(x)
+            input_w0 = tfe.define_private_variable(w0)
+            input_w1 = tfe.define_private_variable(w1)
+
+            @tfe.function
+            def predict():
+                y = tfe.matmul(input_x, input_w0)
+                return tfe.matmul(y * y, input_w1).reveal().to_native()
+
+            if isinstance(source, FileTripleSource):
+                label = "generate triples for " + str(repeats + 1) + " rounds"
+                Performance.time_log(label)
+                source.generate_triples(predict, num=repeats + 1)
+                Performance.time_log(label)
+                source.load()
+
+            predict()
+            label = name + " triples pond inference run " + str(repeats) + " rounds"
+            Performance.time_log(label)
+            for _ in range(repeats):
+                predict()
+            Performance.time_log(label)
+
+    def test_persistent_mask_performance(self):
+        tfe.set_protocol(Pond())
+        repeats = 10
+        x = tfe.define_private_variable(np.random.uniform(-1, 1, size=[128, 784]))
+        w0 = np.random.uniform(-0.1, 0.1, size=[784, 128])
+        w1 = np.random.uniform(-0.1, 0.1, size=[128, 10])
+
+        for persistent_mask in [False, True]:
+            weights = [
+                tfe.define_private_variable(w, persistent_mask=persistent_mask)
+                for w in [w0, w1]
+            ]
+
+            @tfe.function
+            def predict():
+                y = tfe.matmul(x, weights[0])
+                return tfe.matmul(y * y, weights[1]).reveal().to_native()
+
+            name = "persistent" if persistent_mask else "per-run"
+            report = tfe.communication_stats(predict)
+            print("{} weight masks: {} bytes".format(name, report.bytes))
+
+            predict()
+            label = "{} weight masks pond inference run {} rounds".format(
+                name, repeats
+            )
+            Performance.time_log(label)
+            for _ in range(repeats):
+                predict()
+            Performance.time_log(label)
+
+    def test_randomness_pool_performance(self):
+        prot = tfe.get_protocol()
+        x = tfe.define_private_variable(tf.random.uniform([128, 784], -1, 1))
+        w0 = tfe.define_private_variable(tf.random.uniform([784, 128], -0.1, 0.1))
+        w1 = tfe.define_private_variable(tf.random.uniform([128, 10], -0.1, 0.1))
+
+        def dense_relu(input_x, input_w0, input_w1):
+            y = tfe.relu(tfe.matmul(input_x, input_w0))
+            return tfe.matmul(y, input_w1).reveal().to_native()
+
+        inline = tfe.function(dense_relu)
+        pooled = tfe.function(dense_relu)
+        repeats = 10
+
+        inline(x, w0, w1)
+        Performance.time_log("inline randomness run " + str(repeats) + " rounds")
+        for _ in range(repeats):
+            inline(x, w0, w1)
+        Performance.time_log("inline randomness run " + str(repeats) + " rounds")
+
+        pool = prot.preprocess_randomness(pooled, x, w0, w1)
+        expected = inline(x, w0, w1)
+        result = pooled(x, w0, w1)
+        np.testing.assert_allclose(result, expected, rtol=0.0, atol=0.01)
+
+        offline, online = 0.0, 0.0
+        for _ in range(repeats):
+            start = time.time()
+            pool.fill()
+            offline += time.time() - start
+            start = time.time()
+            pooled(x, w0, w1)
+            online += time.time() - start
+        print(
+            "pooled randomness run {} rounds: offline {:.3f}s, online {:.3f}s".format(
+                repeats, offline, online
+            )
+        )
+        prot.randomness_pool = None
+
+    def test_fused_products_performance(self):
+        prot = tfe.get_protocol()
+        n_products = 16
+        xs = [
+            tfe.define_private_variable(tf.random.uniform([32, 64], -1, 1))
+            for _ in range(n_products)
+        ]
+        ys = [
+            tfe.define_private_variable(tf.random.uniform([64, 32], -1, 1))
+            for _ in range(n_products)
+        ]
+
+        def separate(input_xs, input_ys):
+            zs = [tfe.matmul(x, y) for x, y in zip(input_xs, input_ys)]
+            return [z.reveal().to_native() for z in zs]
+
+        def fused(input_xs, input_ys):
+            zs = prot.fused_products(
+                [("matmul", x, y) for x, y in zip(input_xs, input_ys)]
+            )
+            return [z.reveal().to_native() for z in zs]
+
+        for name, func in [("separate", separate), ("fused", fused)]:
+            report = tfe.communication_stats(func, xs, ys)
+            print(
+                "{} products: {} messages, {} bytes, {} rounds".format(
+                    name, len(report.edges), report.bytes, report.rounds
+                )
+            )
+
+            func = tfe.function(func)
+            func(xs, ys)
+            repeats = 10
+            Performance.time_log(name + " products run " + str(repeats) + " rounds")
+            for _ in range(repeats):
+                func(xs, ys)
+            Performance.time_log(name + " products run " + str(repeats) + " rounds")
+
+    def test_dot_performance(self):
+        prot = tfe.get_protocol()
+        x = tfe.define_private_variable(tf.random.uniform([1024, 64], -1, 1))
+        y = tfe.define_private_variable(tf.random.uniform([1024, 64], -1, 1))
+
+        def unfused(input_x, input_y):
+            return tfe.reduce_sum(input_x * input_y, axis=1).reveal().to_native()
+
+        def fused(input_x, input_y):
+            return prot.dot(input_x, input_y, axis=1).reveal().to_native()
+
+        for name, func in [("unfused", unfused), ("fused", fused)]:
+            report = tfe.communication_stats(func, x, y)
+            print(
+                "{} dot: {} messages, {} bytes, {} rounds".format(
+                    name, len(report.edges), report.bytes, report.rounds
+                )
+            )
+
+            func = tfe.function(func)
+            func(x, y)
+            repeats = 10
+            Performance.time_log(name + " dot run " + str(repeats) + " rounds")
+            for _ in range(repeats):
+                func(x, y)
+            Performance.time_log(name + " dot run " + str(repeats) + " rounds")
+
+    def test_lazy_truncation_performance(self):
+        repeats = 10
+        x = np.random.uniform(-0.5, 0.5, size=[128, 10])
+        y = (x.mean(axis=1, keepdims=True) > 0).astype(np.float64)
+        for lazy in [False, True]:
+            prot = ABY3(lazy_truncation=lazy)
+            tfe.set_protocol(prot)
+            input_x = tfe.define_private_variable(x)
+            input_y = tfe.define_private_variable(y)
+
+            model = tfe.keras.Sequential()
+            model.add(tfe.keras.layers.Dense(1, batch_input_shape=[128, 10]))
+            loss = tfe.keras.losses.BinaryCrossentropy(
+                from_logits=True, lazy_normalization=True
+            )
+            model.compile(tfe.keras.optimizers.Adam(learning_rate=0.01), loss)
+
+            truncations = []
+            truncate = prot.truncate
+
+            def counting_truncate(*args, **kwargs):
+                truncations.append(args)
+                return truncate(*args, **kwargs)
+
+            prot.truncate = counting_truncate
+            report = tfe.communication_stats(model.fit_batch, input_x, input_y)
+            prot.truncate = truncate
+            name = "lazy" if lazy else "eager"
+            print(
+                "{} truncation: {} truncations, {} bytes, {} rounds per step".format(
+                    name, len(truncations), report.bytes, report.rounds
+                )
+            )
+
+            train_step = model.make_train_function()
+            train_step(input_x, input_y)
+            label = name + " truncation logistic regression " + str(repeats) + " steps"
+            Performance.time_log(label)
+            for _ in range(repeats):
+                result = train_step(input_x, input_y)
+            Performance.time_log(label)
+            print("{} truncation loss: {}".format(name, result))
+
+    def test_ppa_topology_performance(self):
+        # emulated links: round-trip time in seconds, bandwidth in bytes per second
+        links = [("lan", 2e-4, 1.25e9), ("wan", 4e-2, 1.25e7), ("slow", 1e-1, 1.25e6)]
+        repeats = 5
+        prot = ABY3()
+        tfe.set_protocol(prot)
+        print(
+            "{:>8} {:>12} {:>7} {:>11} {:>10} ".format(
+                "size", "topology", "rounds", "bytes", "local (s)"
+            )
+            + " ".join("{:>10}".format(name + " (s)") for name, _, _ in links)
+        )
+        for size in [1000, 100000, 1000000]:
+            x = tfe.define_private_variable(
+                np.random.randint(0, 2**62, size=[size], dtype=np.int64),
+                apply_scaling=False,
+                share_type=ShareType.BOOLEAN,
+            )
+            y = tfe.define_private_variable(
+                np.random.randint(0, 2**62, size=[size], dtype=np.int64),
+                apply_scaling=False,
+                share_type=ShareType.BOOLEAN,
+            )
+            for topology in PPA_TOPOLOGIES:
+
+                def ppa(input_x, input_y):
+                    return tfe.ppa(input_x, input_y, topology=topology)
+
+                report = tfe.communication_stats(ppa, x, y)
+                func = tfe.function(ppa)
+                func(x, y)
+                start = time.time()
+                for _ in range(repeats):
+                    func(x, y)
+                elapsed = (time.time() - start) / repeats
+
+                cost = ppa_cost(topology)
+                modelled = [
+                    cost.rounds * rtt + cost.bytes / 3 * size / bandwidth
+                    for _, rtt, bandwidth in links
+                ]
+                print(
+                    "{:>8} {:>12} {:>7} {:>11} {:>10.4f} ".format(
+                        size, topology, report.rounds, report.bytes, elapsed
+                    )
+                    + " ".join("{:>10.4f}".format(t) for t in modelled)
+                )
+            print(
+                "{:>8} {:>12} {:>7} {:>11} {:>10} ".format(size, "auto", "", "", "")
+                + " ".join(
+                    "{:>10}".format(select_ppa_topology(size, rtt=rtt, bandwidth=bw))
+                    for _, rtt, bw in links
+                )
+            )
+
+    def test_mul_ab_ot_performance(self):
+        repeats = 10
+        x = np.random.uniform(-1, 1, size=[16, 16, 32, 32])
+        # the default protocol runs two parallel OTs per bit, the one over a
+        # 1ms, 100Mbps link forwards the output of a single OT
+        for name, prot in [
+            ("parallel_ot", ABY3()),
+            ("forwarded_ot", ABY3(link_rtt=1e-3, link_bandwidth=1.25e7)),
+        ]:
+            tfe.set_protocol(prot)
+            input_x = tfe.define_private_variable(x)
+
+            # negating is local, and places the shares of the variable on the
+            # devices that `communication_stats` gives to the servers
+            def relu(input_x):
+                return tfe.relu(-input_x).reveal().to_native()
+
+            def maxpool(input_x):
+                return tfe.maxpool2d(
+                    -input_x, pool_size=(2, 2), strides=(2, 2), padding="VALID"
+                ).reveal().to_native()
+
+            def argmax(input_x):
+                return tfe.argmax(-input_x, axis=1).reveal().to_native()
+
+            for op, func in [("relu", relu), ("maxpool", maxpool), ("argmax", argmax)]:
+                report = tfe.communication_stats(func, input_x)
+                print(
+                    "{} {}: {} bytes, {} rounds".format(
+                        name, op, report.bytes, report.rounds
+                    )
+                )
+
+                func = tfe.function(func)
+                func(input_x)
+                label = name + " " + op + " run " + str(repeats) + " rounds"
+                Performance.time_log(label)
+                for _ in range(repeats):
+                    func(input_x)
+                Performance.time_log(label)
+
+    def test_edabit_performance(self):
+        sys.path.append("../../")
+        from models import network_b
+
+        repeats = 3
+        batch_input_shape = [8, 28, 28, 1]
+        x = np.random.uniform(-1, 1, size=batch_input_shape)
+        for name, prot in [("default", ABY3()), ("edabits", ABY3(edabits=True))]:
+            tfe.set_protocol(prot)
+            model = network_b(batch_input_shape, 10)
+            input_x = tfe.define_private_variable(x)
+
+            # negating is local, and places the shares of the variable on the
+            # devices that `communication_stats` gives to the servers
+            def predict(input_x):
+                return model(-input_x).reveal().to_native()
+
+            pool = prot.preprocess_randomness(predict, input_x)
+            report = tfe.communication_stats(predict, input_x)
+            print(
+                "{} network_b: {} bytes, {} rounds".format(
+                    name, report.bytes, report.rounds
+                )
+            )
+
+            predict = tfe.function(predict)
+            predict(input_x)
+            offline, online = 0.0, 0.0
+            for _ in range(repeats):
+                start = time.time()
+                pool.fill()
+                offline += time.time() - start
+                start = time.time()
+                predict(input_x)
+                online += time.time() - start
+            print(
+                "{} network_b run {} rounds: offline {:.3f}s, online {:.3f}s".format(
+                    name, repeats, offline, online
+                )
+            )
+            prot.randomness_pool = None
+
+    def test_depthwise_conv2d_performance(self):
+        # the depthwise step of a MobileNetV2 inverted residual block: 32 channels
+        # expanded 6 times to 192, on a batch of 8 images of 28x28
+        batch_size, channels, img_size = 8, 192, 28
+        x = tfe.define_private_variable(
+            tf.random.uniform([batch_size, channels, img_size, img_size], -1, 1)
+        )
+        kernel = np.random.normal(size=[3, 3, channels, 1])
+
+        # the kernel expanded into a regular one, zero outside of the diagonal
+        dense_kernel = np.zeros([3, 3, channels, channels])
+        for c in range(channels):
+            dense_kernel[:, :, c, c] = kernel[:, :, c, 0]
+        w = tfe.define_private_variable(kernel)
+        dense_w = tfe.define_private_variable(dense_kernel)
+
+        def dense(input_x):
+            y = tfe.conv2d(input_x, dense_w, [1, 1], "SAME")
+            return y.reveal().to_native()
+
+        def depthwise(input_x):
+            y = tfe.depthwise_conv2d(input_x, w, [1, 1], "SAME")
+            return y.reveal().to_native()
+
+        for name, func in [("dense", dense), ("depthwise", depthwise)]:
+            report = tfe.communication_stats(func, x)
+            print(
+                "{} conv: {} bytes, {} rounds".format(name, report.bytes, report.rounds)
+            )
+
+            func = tfe.function(func)
+            func(x)
+            repeats = 10
+            Performance.time_log(name + " conv run " + str(repeats) + " rounds")
+            for _ in range(repeats):
+                func(x)
+            Performance.time_log(name + " conv run " + str(repeats) + " rounds")
+
+    def test_conv2d_patches_performance(self):
+        sys.path.append("../../")
+        from models import network_c
+
+        repeats = 5
+        batch_input_shape = [32, 28, 28, 1]
+        x = np.random.uniform(-1, 1, size=batch_input_shape)
+        y = np.eye(10)[np.random.randint(0, 10, size=batch_input_shape[0])]
+        input_x = tfe.define_private_variable(x)
+        input_y = tfe.define_private_variable(y)
+        for cache_patches in [False, True]:
+            model = network_c(batch_input_shape, 10)
+            for layer in model.layers:
+                if isinstance(layer, tfe.keras.layers.Conv2D):
+                    layer.cache_patches = cache_patches
+            loss = tfe.keras.losses.CategoricalCrossentropy(
+                from_logits=True, lazy_normalization=True
+            )
+            model.compile(tfe.keras.optimizers.SGD(learning_rate=0.01), loss)
+
+            name = "cached" if cache_patches else "recomputed"
+            train_step = model.make_train_function()
+            train_step(input_x, input_y)
+            label = "{} patches network_c {} steps".format(name, repeats)
+            Performance.time_log(label)
+            for _ in range(repeats):
+                train_step(input_x, input_y)
+            Performance.time_log(label)
+
+    def test_fold_batchnorm_performance(self):
+        repeats = 5
+        channels = 16
+        batch_input_shape = [32, 16, 16, channels]
+        x = np.random.uniform(-1, 1, size=batch_input_shape)
+        input_x = tfe.define_private_variable(x)
+
+        # ResNet-style blocks: 3x3 conv without bias, batchnorm, relu
+        model = tfe.keras.Sequential()
+        for block in range(3):
+            kwargs = {"batch_input_shape": batch_input_shape} if block == 0 else {}
+            model.add(
+                tfe.keras.layers.Conv2D(
+                    channels, 3, padding="same", use_bias=False, **kwargs
+                )
+            )
+            model.add(tfe.keras.layers.BatchNormalization())
+            model.add(tfe.keras.layers.ReLU())
+        for layer in model.layers:
+            if isinstance(layer, tfe.keras.layers.BatchNormalization):
+                shape = [1, 1, 1, channels]
+                layer.set_weights(
+                    [
+                        np.random.uniform(0.5, 1.5, size=shape),
+                        np.random.normal(size=shape),
+                        np.random.normal(size=shape),
+                        np.random.uniform(0.5, 1.5, size=shape),
+                    ]
+                )
+
+        for name in ["unfolded", "folded"]:
+            if name == "folded":
+                model.fold_batchnorm()
+            predict_step = model.make_predict_function()
+            predict_step(input_x)
+            label = "{} batchnorm 3 resnet blocks {} steps".format(name, repeats)
+            Performance.time_log(label)
+            for _ in range(repeats):
+                predict_step(input_x)
+            Performance.time_log(label)
+
+    def test_fused_optimizer_performance(self):
+        repeats = 5
+        batch_input_shape = [128, 64]
+        x = np.random.uniform(-1, 1, size=batch_input_shape)
+        y = np.random.uniform(-1, 1, size=[batch_input_shape[0], 1])
+        input_x = tfe.define_private_variable(x)
+        input_y = tfe.define_private_variable(y)
+
+        for optimizer_cls in [tfe.keras.optimizers.SGD, tfe.keras.optimizers.Adam]:
+            for fused in [False, True]:
+                # 10-layer MLP
+                model = tfe.keras.Sequential()
+                model.add(
+                    tfe.keras.layers.Dense(
+                        64, batch_input_shape=batch_input_shape, activation="relu"
+                    )
+                )
+                for _ in range(8):
+                    model.add(tfe.keras.layers.Dense(64, activation="relu"))
+                model.add(tfe.keras.layers.Dense(1))
+                loss = tfe.keras.losses.MeanSquaredError()
+                model.compile(optimizer_cls(learning_rate=0.001, fused=fused), loss)
+
+                name = "{} {}".format(
+                    "fused" if fused else "per-tensor", optimizer_cls.__name__
+                )
+                report = tfe.communication_stats(model.fit_batch, input_x, input_y)
+                print(
+                    "{} mlp-10 step: {} bytes, {} rounds".format(
+                        name, report.bytes, report.rounds
+                    )
+                )
+
+                train_step = model.make_train_function()
+                train_step(input_x, input_y)
+                label = "{} mlp-10 {} steps".format(name, repeats)
+                Performance.time_log(label)
+                for _ in range(repeats):
+                    train_step(input_x, input_y)
+                Performance.time_log(label)
+
+    def test_prefetch_performance(self):
+        sys.path.append("../../")
+        from models import logistic_regression
+        from models import network_a
+
+        steps = 50
+        batch_shape = [128, 28, 28, 1]
+        for model_fn, num_classes in [(logistic_regression, 1), (network_a, 10)]:
+            for prefetch in [0, 2]:
+
+                def generator_builder():
+                    # MNIST-shaped batches, generated by the data owner
+                    while True:
+                        x = tf.random.uniform(batch_shape, dtype=tf.float64)
+                        labels = tf.random.uniform(
+                            [batch_shape[0]], 0, max(num_classes, 2), dtype=tf.int32
+                        )
+                        if num_classes > 1:
+                            y = tf.one_hot(labels, num_classes, dtype=tf.float64)
+                        else:
+                            y = tf.cast(tf.reshape(labels, [-1, 1]), tf.float64)
+                        yield x, y
+
+                data_owner = DataOwner(
+                    tfe.get_config().get_player("server0"), generator_builder
+                )
+                model = model_fn(batch_shape, num_classes)
+                if num_classes > 1:
+                    loss = tfe.keras.losses.CategoricalCrossentropy(
+                        from_logits=True, lazy_normalization=True
+                    )
+                else:
+                    loss = tfe.keras.losses.BinaryCrossentropy(
+                        from_logits=True, lazy_normalization=True
+                    )
+                model.compile(tfe.keras.optimizers.SGD(learning_rate=0.01), loss)
+
+                data_iter = data_owner.provide_data()
+                # trace the training step outside of the timed steps
+                model.fit(data_iter, steps_per_epoch=1, verbose=0)
+                start = time.time()
+                model.fit(
+                    data_iter, steps_per_epoch=steps, verbose=0, prefetch=prefetch
+                )
+                elapsed = time.time() - start
+                print(
+                    "{} prefetch={}: {:.2f} steps/s".format(
+                        model_fn.__name__, prefetch, steps / elapsed
+                    )
+                )
+
 
 if __name__ == "__main__":
     """
@@ -56,6 +56,13 @@ if __name__ == "__main__":
         default="l",
         help="use 64 or 128 bits for computation",
     )
+    parser.add_argument(
+        "--prefetch",
+        metavar="BATCHES",
+        type=int,
+        default=0,
+        help="how many batches to share ahead during training and evaluation",
+    )
     args = parser.parse_args()
 
     # import all models
@@ -119,7 +126,10 @@ if __name__ == "__main__":
     print("Train model")
     train_data_iter = training_client.provide_data()
     model.fit(
-        x=train_data_iter, epochs=args.epochs, steps_per_epoch=train_dataset.iterations
+        x=train_data_iter,
+        epochs=args.epochs,
+        steps_per_epoch=train_dataset.iterations,
+        prefetch=args.prefetch,
     )
 
     print("Set trained weights")
@@ -131,7 +141,10 @@ if __name__ == "__main__":
     print("Evaluate")
     test_data_iter = prediction_client.provide_data()
     result = model_2.evaluate(
-        x=test_data_iter, metrics=metrics, steps=test_dataset.iterations
+        x=test_data_iter,
+        metrics=metrics,
+        steps=test_dataset.iterations,
+        prefetch=args.prefetch,
     )
 
     print(result)
@@ -147,7 +147,7 @@ public:
     auto data = output->flat<T>().data();
     Gen gen(data, shape.num_elements(), seed_bytes);
 
-    gen.GenerateData(lo, hi);
+    gen.GenerateData(lo, hi, *(context->device()->tensorflow_cpu_worker_threads()));
   }
 };
 
@@ -182,26 +182,15 @@ public:
     OP_REQUIRES(context, shape.num_elements() > 0, errors::InvalidArgument("Shape contains zero elements"));
     OP_REQUIRES(context, sodium_init() >= 0, errors::Internal("libsodium failed to initialize, try again"));
 
-    auto worker_threads = *(context->device()->tensorflow_cpu_worker_threads());
-    int num_threads = worker_threads.num_threads;
-
-    // this calculated number doesn't seem to make much difference in the
-    // time it takes but its meant to just be an estimation of how many compute cycles
-    // each numbers takes to generate so that the shard function can efficiently schedule
-    // the shards to take advantage of as much parallelizism as possible
-    int estimated_chacha_cpb = 3;
-    int estimated_chacha_per_number = 3 * sizeof(T);
-    int uniform_dist_per_number = 11;
-    int total_cycles = (estimated_chacha_per_number + uniform_dist_per_number) * shape.num_elements();
-    Shard(num_threads, worker_threads.workers, shape.num_elements(), total_cycles,
-            [output, lo, hi](int64 start_group, int64 limit_group) {
-              auto data = output->flat<T>().data();
-              int64 size = limit_group - start_group;
-
-              Gen gen(data + start_group, size);
-
-              gen.GenerateData(lo, hi);
-            });
+    // a single fresh seed expanded in parallel, so the output is the seeded stream for
+    // a seed nobody knows
+    unsigned char seed_bytes[randombytes_SEEDBYTES];
+    generate_seed(seed_bytes);
+
+    auto data = output->flat<T>().data();
+    Gen gen(data, shape.num_elements(), seed_bytes);
+
+    gen.GenerateData(lo, hi, *(context->device()->tensorflow_cpu_worker_threads()));
   }
 };
 
@@ -259,7 +248,7 @@ public:
 
     i128_t* data = (i128_t*) (output->flat<int64>().data());
     SeededGenerator<i128_t> gen(data, shape.num_elements() / 2, seed_bytes);
-    gen.GenerateData(lo, hi);
+    gen.GenerateData(lo, hi, *(context->device()->tensorflow_cpu_worker_threads()));
   }
 };
 
@@ -308,26 +297,12 @@ public:
     Tensor* output;
     OP_REQUIRES_OK(context, context->allocate_output(0, shape, &output));
 
-    auto worker_threads = *(context->device()->tensorflow_cpu_worker_threads());
-    int num_threads = worker_threads.num_threads;
-
-    // this calculated number doesn't seem to make much difference in the
-    // time it takes but its meant to just be an estimation of how many compute cycles
-    // each numbers takes to generate so that the shard function can efficiently schedule
-    // the shards to take advantage of as much parallelizism as possible
-    int estimated_chacha_cpb = 3;
-    int estimated_chacha_per_number = 3 * sizeof(i128_t);
-    int uniform_dist_per_number = 11;
-    int total_cycles = (estimated_chacha_per_number + uniform_dist_per_number) * shape.num_elements();
-    Shard(num_threads, worker_threads.workers, shape.num_elements() / 2, total_cycles,
-            [output, lo, hi](int64 start_group, int64 limit_group) {
-              i128_t* data = (i128_t*) (output->flat<int64>().data());
-              int64 size = limit_group - start_group;
-
-              Generator<i128_t> gen(data + start_group, size);
-
-              gen.GenerateData(lo, hi);
-            });
+    unsigned char seed_bytes[randombytes_SEEDBYTES];
+    generate_seed(seed_bytes);
+
+    i128_t* data = (i128_t*) (output->flat<int64>().data());
+    SeededGenerator<i128_t> gen(data, shape.num_elements() / 2, seed_bytes);
+    gen.GenerateData(lo, hi, *(context->device()->tensorflow_cpu_worker_threads()));
   }
 };
 
@@ -377,22 +352,22 @@ REGISTER_KERNEL_BUILDER(
   Name("SecureRandomUniform")
   .Device(DEVICE_CPU)
   .TypeConstraint<int8>("dtype"),
-  RandomUniformOp<int8, Generator<int8>>);
+  RandomUniformOp<int8, SeededGenerator<int8>>);
 REGISTER_KERNEL_BUILDER(
   Name("SecureRandomUniform")
   .Device(DEVICE_CPU)
   .TypeConstraint<int16>("dtype"),
-  RandomUniformOp<int16, Generator<int16>>);
+  RandomUniformOp<int16, SeededGenerator<int16>>);
 REGISTER_KERNEL_BUILDER(
   Name("SecureRandomUniform")
   .Device(DEVICE_CPU)
   .TypeConstraint<int32>("dtype"),
-  RandomUniformOp<int32, Generator<int32>>);
+  RandomUniformOp<int32, SeededGenerator<int32>>);
 REGISTER_KERNEL_BUILDER(
   Name("SecureRandomUniform")
   .Device(DEVICE_CPU)
   .TypeConstraint<int64>("dtype"),
-  RandomUniformOp<int64, Generator<int64>>);
+  RandomUniformOp<int64, SeededGenerator<int64>>);
 REGISTER_KERNEL_BUILDER(
   Name("I128SecureRandomUniform")
   .Device(DEVICE_CPU)
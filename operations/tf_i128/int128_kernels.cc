@@ -185,21 +185,42 @@ DEFINE_I128_ReduceOP(I128ReduceSumOp, tf_i128::i128TensorReduceSum);
 
 class I128MatMulOp : public OpKernel {
 public:
-    explicit I128MatMulOp(OpKernelConstruction* context) : OpKernel(context) {}
+    explicit I128MatMulOp(OpKernelConstruction* context) : OpKernel(context) {
+        OP_REQUIRES_OK(context, context->GetAttr("transpose_a", &transpose_a_));
+        OP_REQUIRES_OK(context, context->GetAttr("transpose_b", &transpose_b_));
+    }
 
     void Compute(OpKernelContext* ctx) override {
         const Tensor& op0 = ctx->input(0);
         const Tensor& op1 = ctx->input(1);
         CHECK(IsValidateI128Tensor(op0.shape()));
         CHECK(IsValidateI128Tensor(op1.shape()));
+        OP_REQUIRES(ctx, op0.dims() == 3 && op1.dims() == 3,
+                    errors::InvalidArgument("I128MatMul expects 2D int128 operands, got ",
+                                            op0.shape().DebugString(), " and ", op1.shape().DebugString()));
+        long d0 = op0.shape().dim_size(transpose_a_ ? 1 : 0);
+        long k0 = op0.shape().dim_size(transpose_a_ ? 0 : 1);
+        long k1 = op1.shape().dim_size(transpose_b_ ? 1 : 0);
+        long d1 = op1.shape().dim_size(transpose_b_ ? 0 : 1);
+        OP_REQUIRES(ctx, k0 == k1,
+                    errors::InvalidArgument("I128MatMul inner dimensions do not match: ", k0, " vs ", k1));
         Tensor* output;
-        long d0 = op0.shape().dim_size(0);
-        long d1 = op1.shape().dim_size(1);
         OP_REQUIRES_OK(ctx, ctx->allocate_output(0, TensorShape({d0, d1, tf_i128::N_LIMBS}), &output));
         tf_i128::I128TensorView view0(op0);
         tf_i128::I128TensorView view1(op1);
-        tf_i128::i128TensorMatmul(*output, view0, view1);
+
+        //! every row of the output costs k0 * d1 multiply-adds of three 64-bit products
+        auto worker_threads = *(ctx->device()->tensorflow_cpu_worker_threads());
+        const int64 cost_per_row = 8 * k0 * d1;
+        Shard(worker_threads.num_threads, worker_threads.workers, d0, cost_per_row,
+              [&](int64 begin, int64 end) {
+                  tf_i128::i128TensorMatmulRows(*output, view0, view1, transpose_a_, transpose_b_, begin, end);
+              });
     }
+
+private:
+    bool transpose_a_;
+    bool transpose_b_;
 };
 
 class ToI128Op : public OpKernel {
@@ -361,11 +382,16 @@ REGISTER_OP("I128MatMul")
     .Input("op0: int64")
     .Input("op1: int64")
     .Output("output: int64")
+    .Attr("transpose_a: bool = false")
+    .Attr("transpose_b: bool = false")
     .SetShapeFn([](shape_inference::InferenceContext* c) {
         if (!c) return errors::Internal("empty shape_inference::InferenceContext pointer");
+        bool transpose_a, transpose_b;
+        TF_RETURN_IF_ERROR(c->GetAttr("transpose_a", &transpose_a));
+        TF_RETURN_IF_ERROR(c->GetAttr("transpose_b", &transpose_b));
         std::vector<shape_inference::DimensionHandle> dims;
-        dims.push_back(c->Dim(c->input(0), 0));
-        dims.push_back(c->Dim(c->input(1), 1));
+        dims.push_back(c->Dim(c->input(0), transpose_a ? 1 : 0));
+        dims.push_back(c->Dim(c->input(1), transpose_b ? 0 : 1));
         dims.push_back(c->MakeDim(tf_i128::N_LIMBS));
         c->set_output(0, c->MakeShape(dims));
         return Status::OK();
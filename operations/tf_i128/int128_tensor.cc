@@ -1,6 +1,8 @@
 #include "./int128_tensor.h"
+#include <algorithm>
 #include <mutex>
 #include <exception>
+#include <vector>
 #include "tensorflow/core/util/bcast.h"
 
 namespace tf_i128 {
@@ -579,6 +581,94 @@ bool i128TensorMatmul(tf::Tensor& out, I128TensorView const& lhs, I128TensorView
     return true;
 }
 
+//! Panel sizes of the blocked matmul. A (kMatmulBlockK x kMatmulBlockN) panel
+//! of the right-hand side takes 256KB and stays in L2, the current row of the
+//! left-hand side takes 4KB of L1.
+constexpr long kMatmulBlockK = 256;
+constexpr long kMatmulBlockN = 64;
+
+//! Dot products modulo 2^128 of `a` with the two vectors `b0` and `b1`. Only
+//! the low halves need a full 64x64->128 bit product, the cross terms only
+//! contribute to the high half of the result.
+static inline void dot2I128(const Scalar* a, const Scalar* b0, const Scalar* b1, long n, Scalar* c) {
+    const uint64_t* a64  = reinterpret_cast<const uint64_t*>(a);
+    const uint64_t* b064 = reinterpret_cast<const uint64_t*>(b0);
+    const uint64_t* b164 = reinterpret_cast<const uint64_t*>(b1);
+    u128_t low0 = 0, low1 = 0;
+    uint64_t high0 = 0, high1 = 0;
+    for (long k = 0; k < n; ++k) {
+        const uint64_t a_lo = a64[2 * k], a_hi = a64[2 * k + 1];
+        low0 += (u128_t)a_lo * b064[2 * k];
+        high0 += a_lo * b064[2 * k + 1] + a_hi * b064[2 * k];
+        low1 += (u128_t)a_lo * b164[2 * k];
+        high1 += a_lo * b164[2 * k + 1] + a_hi * b164[2 * k];
+    }
+    c[0] += (Scalar)(low0 + ((u128_t)high0 << 64));
+    c[1] += (Scalar)(low1 + ((u128_t)high1 << 64));
+}
+
+static inline Scalar dotI128(const Scalar* a, const Scalar* b, long n) {
+    Scalar acc = 0;
+    for (long k = 0; k < n; ++k) acc += a[k] * b[k];
+    return acc;
+}
+
+bool i128TensorMatmulRows(tf::Tensor& out, I128TensorView const& lhs, I128TensorView const& rhs,
+                          bool transpose_a, bool transpose_b, long row_begin, long row_end) {
+    const auto& lhs_shape = lhs.shape();
+    const auto& rhs_shape = rhs.shape();
+    CHECK_EQ(lhs_shape.dims(), 2);
+    CHECK_EQ(rhs_shape.dims(), 2);
+    const long M = lhs_shape.dim_size(transpose_a ? 1 : 0);
+    const long K = lhs_shape.dim_size(transpose_a ? 0 : 1);
+    const long N = rhs_shape.dim_size(transpose_b ? 0 : 1);
+    CHECK_EQ(K, rhs_shape.dim_size(transpose_b ? 1 : 0));
+    CHECK_EQ(out.shape().dim_size(0), M);
+    CHECK_EQ(out.shape().dim_size(1), N);
+    CHECK(0 <= row_begin && row_begin <= row_end && row_end <= M);
+
+    const Scalar* A = lhs.data();
+    const Scalar* B = rhs.data();
+    Scalar* C       = (Scalar*)out.flat<tf::int64>().data();
+    std::fill(C + row_begin * N, C + row_end * N, Scalar(0));
+
+    //! the panel of B is packed column by column, so that every output is a
+    //! dot product of two contiguous vectors accumulated in registers
+    std::vector<Scalar> b_panel(kMatmulBlockK * kMatmulBlockN);
+    std::vector<Scalar> a_row(kMatmulBlockK);
+    for (long k0 = 0; k0 < K; k0 += kMatmulBlockK) {
+        const long kc = std::min(kMatmulBlockK, K - k0);
+        for (long j0 = 0; j0 < N; j0 += kMatmulBlockN) {
+            const long nc = std::min(kMatmulBlockN, N - j0);
+            for (long j = 0; j < nc; ++j) {
+                Scalar* dst = b_panel.data() + j * kc;
+                if (transpose_b) {
+                    std::copy(B + (j0 + j) * K + k0, B + (j0 + j) * K + k0 + kc, dst);
+                } else {
+                    for (long k = 0; k < kc; ++k) dst[k] = B[(k0 + k) * N + j0 + j];
+                }
+            }
+
+            for (long i = row_begin; i < row_end; ++i) {
+                const Scalar* a = a_row.data();
+                if (transpose_a) {
+                    for (long k = 0; k < kc; ++k) a_row[k] = A[(k0 + k) * M + i];
+                } else {
+                    a = A + i * K + k0;
+                }
+                Scalar* c = C + i * N + j0;
+                long j = 0;
+                for (; j + 1 < nc; j += 2) {
+                    const Scalar* b0 = b_panel.data() + j * kc;
+                    const Scalar* b1 = b0 + kc;
+                    dot2I128(a, b0, b1, kc, c + j);
+                }
+                for (; j < nc; ++j) c[j] += dotI128(a, b_panel.data() + j * kc, kc);
+            }
+        }
+    }
+    return true;
+}
 
 bool i128TensorNegate(tf::Tensor& out, tf::Tensor const& in) {
     I128TensorView out_view(out), in_view(in);
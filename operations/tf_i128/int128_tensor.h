@@ -78,6 +78,10 @@ struct I128TensorView {
 
 bool i128TensorMatmul(tf::Tensor &out, I128TensorView const &lhs, I128TensorView const &rhs);
 
+// Compute the rows [row_begin, row_end) of the product of the (optionally transposed) 2D operands.
+bool i128TensorMatmulRows(tf::Tensor &out, I128TensorView const &lhs, I128TensorView const &rhs,
+                          bool transpose_a, bool transpose_b, long row_begin, long row_end);
+
 bool i128TensorGatherBits(tf::Tensor &out, I128TensorView const &in, int start, int stride);
 
 bool i128TensorEqual(tf::Tensor &out, I128TensorView const &lhs, I128TensorView const &rhs);
@@ -21,6 +21,7 @@ from .config import RemoteConfig
 from .config import get_config
 from .player import player
 from .protocol import ABY3
+from .protocol import communication_stats
 from .protocol import function
 
 try:
@@ -106,6 +107,7 @@ __all__ = [
     "get_config",
     "set_config",
     "function",
+    "communication_stats",
     "set_protocol",
     "player",
     "primitives",
@@ -2,6 +2,7 @@
 their corresponding TF Model.
 
 See README.md for details on usage and extension."""
+import collections
 import functools
 from typing import Any
 from typing import List
@@ -12,6 +13,7 @@ import numpy as np
 import onnx
 import tensorflow as tf
 import tf2onnx
+from onnx import numpy_helper
 from onnx.mapping import TENSOR_TYPE_TO_NP_TYPE
 from onnx.onnx_ml_pb2 import ModelProto
 from tf2onnx import optimizer
@@ -53,6 +55,7 @@ class Converter:
         model: Any,
         input_shapes: Union[List[int], List[List[int]]],
         model_provider: Optional[Union[str, Player]] = None,
+        fold_batchnorm: bool = True,
     ) -> Any:
         """Convert a plaintext model to a TFE model.
 
@@ -61,6 +64,9 @@ class Converter:
             input_shapes: model's input shapes
             model_provider: The Player who will act as the model provider, or a string
             identifier for the Player.
+            fold_batchnorm: Fold BatchNormalization nodes into the Conv or Gemm
+            node feeding them before building the TFE graph. Normalization has no
+            backward, so this only affects models that are used for inference.
         """
         if not isinstance(input_shapes[0], list):
             input_shapes = [input_shapes]
@@ -106,6 +112,8 @@ class Converter:
         else:
             raise ValueError("Unknow model")
         assert isinstance(model_proto, ModelProto)
+        if fold_batchnorm:
+            model_proto = self._fold_batchnorm(model_proto)
 
         class DefinedModel(BaseModel):
             """Model defined by a plain model."""
@@ -168,6 +176,102 @@ class Converter:
         model = DefinedModel(tfe_nodes, forward_func, backward_builder)
         return model
 
+    def _fold_batchnorm(self, model_proto):
+        """Return a copy of `model_proto` with every BatchNormalization that
+        directly follows a Conv or Gemm node absorbed into that node's weight
+        and bias initializers, in plaintext before the weights get shared."""
+        folded = ModelProto()
+        folded.CopyFrom(model_proto)
+        graph = folded.graph
+
+        params = {}
+        for initializer in graph.initializer:
+            params[initializer.name] = numpy_helper.to_array(initializer)
+        graph_outputs = {output.name for output in graph.output}
+        consumers = collections.Counter(
+            input for node in graph.node for input in node.input
+        )
+        producers = {output: node for node in graph.node for output in node.output}
+
+        removed = []
+        replaced = set()
+        for index, node in enumerate(graph.node):
+            if node.op_type != "BatchNormalization" or len(node.output) != 1:
+                continue
+            prev = producers.get(node.input[0])
+            if prev is None or prev.op_type not in ("Conv", "Gemm"):
+                continue
+            if consumers[node.input[0]] != 1 or node.input[0] in graph_outputs:
+                continue
+            if not all(input in params for input in node.input[1:]):
+                continue
+            if not all(input in params for input in prev.input[1:]):
+                continue
+
+            attrs = {attr.name: attr for attr in node.attribute}
+            epsilon = attrs["epsilon"].f if "epsilon" in attrs else 1e-5
+            gamma, beta, mean, var = [params[input] for input in node.input[1:5]]
+            scale = gamma / np.sqrt(var + epsilon)
+
+            kernel = params[prev.input[1]]
+            prev_attrs = {attr.name: attr for attr in prev.attribute}
+            alpha, bias_scale = 1.0, 1.0
+            if prev.op_type == "Conv":
+                channels = kernel.shape[0]
+                scale_shape = [-1] + [1] * (kernel.ndim - 1)
+            else:
+                trans_b = prev_attrs["transB"].i if "transB" in prev_attrs else 0
+                channels = kernel.shape[0] if trans_b else kernel.shape[1]
+                scale_shape = [-1, 1] if trans_b else [1, -1]
+                if "alpha" in prev_attrs:
+                    alpha = prev_attrs["alpha"].f
+                if "beta" in prev_attrs:
+                    bias_scale = prev_attrs["beta"].f
+
+            if len(prev.input) > 2:
+                bias = params[prev.input[2]]
+                if bias.size not in (1, channels):
+                    continue
+                bias = np.broadcast_to(bias.reshape(-1), [channels]) * bias_scale
+            else:
+                bias = np.zeros([channels], dtype=kernel.dtype)
+
+            # alpha and beta of a Gemm are folded in as well
+            for name in ("alpha", "beta"):
+                if name in prev_attrs:
+                    prev_attrs[name].f = 1.0
+            folded_kernel = kernel * alpha * scale.reshape(scale_shape)
+            folded_bias = (bias - mean) * scale + beta
+            kernel = folded_kernel.astype(kernel.dtype)
+            bias = folded_bias.astype(kernel.dtype)
+
+            kernel_name = node.output[0] + "/folded_kernel"
+            bias_name = node.output[0] + "/folded_bias"
+            graph.initializer.append(numpy_helper.from_array(kernel, kernel_name))
+            graph.initializer.append(numpy_helper.from_array(bias, bias_name))
+            replaced.update(prev.input[1:])
+            replaced.update(node.input[1:])
+            prev.input[1] = kernel_name
+            if len(prev.input) > 2:
+                prev.input[2] = bias_name
+            else:
+                prev.input.append(bias_name)
+            prev.output[0] = node.output[0]
+            removed.append(index)
+
+        for index in reversed(removed):
+            del graph.node[index]
+
+        # drop initializers that only fed the folded nodes
+        used = {input for node in graph.node for input in node.input}
+        used.update(input.name for input in graph.input)
+        for index in reversed(range(len(graph.initializer))):
+            name = graph.initializer[index].name
+            if name in replaced and name not in used:
+                del graph.initializer[index]
+
+        return folded
+
     def _build_initializer(self, model_proto) -> None:
         initializers = {}
 
@@ -7,6 +7,9 @@ from typing import List
 import numpy as np
 import tensorflow as tf
 import tf2onnx
+from onnx import TensorProto
+from onnx import helper
+from onnx import numpy_helper
 
 import tf_encrypted as tfe
 from tf_encrypted.convert import Converter
@@ -91,7 +94,7 @@ class TestConvertNodes(unittest.TestCase):
 
     def test_depthwise_conv2d(self):
         test_input = [tf.random.uniform([1, 28, 28, 3])]
-        self._build_test("depthwise_conv2d", test_input, backward=False)
+        self._build_test("depthwise_conv2d", test_input)
 
     def test_batchnorm(self):
         test_input = [tf.random.uniform([1, 1, 28, 28])]
@@ -189,6 +192,27 @@ class TestConvertNodes(unittest.TestCase):
         test_input = [tf.random.uniform([1, 8, 8, 1])]
         self._build_test("multilayer", test_input)
 
+    def test_fold_batchnorm(self):
+        x = np.random.uniform(size=[1, 3, 8, 8]).astype(np.float32)
+        onnx_model, expected = fold_batchnorm_model(x)
+
+        for fold in (False, True):
+            c = Converter(config=tfe.get_config())
+            tfe_model = c.convert(
+                onnx_model,
+                [list(x.shape)],
+                model_provider="weights-provider",
+                fold_batchnorm=fold,
+            )
+            node_types = [type(node).__name__ for node in tfe_model.tfe_nodes.values()]
+            assert ("BatchnormalizationNode" in node_types) != fold
+
+            tfe_x = tfe.define_private_input(
+                "prediction-client", lambda: tf.constant(x)
+            )
+            actual = tfe_model.predict(tfe_x, reveal=True)
+            np.testing.assert_array_almost_equal(actual, expected, decimal=2)
+
 
 def add_model(inputs: List[tf.Tensor]) -> tf.Module:
     x = tf.keras.layers.Input(shape=inputs[0].shape[1:])
@@ -470,6 +494,82 @@ def multilayer_model(inputs: List[tf.Tensor]) -> tf.Module:
     return model
 
 
+def fold_batchnorm_model(x: np.ndarray):
+    """Conv -> BatchNorm -> Relu -> Flatten -> Gemm -> BatchNorm as an onnx model,
+    along with its output on `x` computed in plaintext."""
+    initializers = {
+        "kernel": np.random.normal(size=[4, 3, 3, 3]),
+        "dense_kernel": np.random.normal(size=[3, 144]) / 12.0,
+        "dense_bias": np.random.normal(size=[3]),
+    }
+    for name, channels in [("bn1", 4), ("bn2", 3)]:
+        initializers[name + "_gamma"] = np.random.uniform(0.5, 1.5, size=[channels])
+        initializers[name + "_beta"] = np.random.normal(size=[channels])
+        initializers[name + "_mean"] = np.random.normal(size=[channels])
+        initializers[name + "_var"] = np.random.uniform(0.5, 1.5, size=[channels])
+
+    def bn_inputs(name):
+        return [name + "_" + param for param in ("gamma", "beta", "mean", "var")]
+
+    nodes = [
+        helper.make_node(
+            "Conv", ["x", "kernel"], ["conv"], name="conv", strides=[1, 1], group=1
+        ),
+        helper.make_node(
+            "BatchNormalization",
+            ["conv"] + bn_inputs("bn1"),
+            ["bn1"],
+            name="bn1",
+            epsilon=1e-5,
+        ),
+        helper.make_node("Relu", ["bn1"], ["relu"], name="relu"),
+        helper.make_node("Flatten", ["relu"], ["flatten"], name="flatten"),
+        helper.make_node(
+            "Gemm",
+            ["flatten", "dense_kernel", "dense_bias"],
+            ["dense"],
+            name="dense",
+            transA=0,
+            transB=1,
+        ),
+        helper.make_node(
+            "BatchNormalization",
+            ["dense"] + bn_inputs("bn2"),
+            ["y"],
+            name="bn2",
+            epsilon=1e-5,
+        ),
+    ]
+    graph = helper.make_graph(
+        nodes,
+        "fold_batchnorm",
+        [helper.make_tensor_value_info("x", TensorProto.FLOAT, x.shape)],
+        [helper.make_tensor_value_info("y", TensorProto.FLOAT, [1, 3])],
+        [
+            numpy_helper.from_array(value.astype(np.float32), name)
+            for name, value in initializers.items()
+        ],
+    )
+    onnx_model = helper.make_model(graph)
+
+    def batchnorm(y, name, shape):
+        gamma, beta, mean, var = [
+            initializers[param].reshape(shape) for param in bn_inputs(name)
+        ]
+        return gamma * (y - mean) / np.sqrt(var + 1e-5) + beta
+
+    y = tf.nn.conv2d(
+        np.transpose(x, [0, 2, 3, 1]),
+        np.transpose(initializers["kernel"], [2, 3, 1, 0]),
+        strides=1,
+        padding="VALID",
+    ).numpy()
+    y = np.transpose(y, [0, 3, 1, 2])
+    y = np.maximum(batchnorm(y, "bn1", [1, 4, 1, 1]), 0.0)
+    y = y.reshape([1, -1]) @ initializers["dense_kernel"].T + initializers["dense_bias"]
+    y = batchnorm(y, "bn2", [1, 3])
+    return onnx_model, y
+
 if __name__ == "__main__":
 
     if len(sys.argv) == 3:
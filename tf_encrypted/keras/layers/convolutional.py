@@ -71,6 +71,11 @@ class Conv2D(Layer):
             the output of the layer (its "activation")..
         kernel_constraint: Constraint function applied to the kernel matrix.
         bias_constraint: Constraint function applied to the bias vector.
+        cache_patches: Boolean, whether to keep the patches of the input
+            extracted in the forward pass for `backward`, which then computes
+            the gradient of the kernel with a single matrix multiplication.
+            If `False`, they are extracted again in `backward`, saving memory
+            between the two passes.
     Input shape:
         4D tensor with shape:
         `(samples, channels, rows, cols)` if data_format='channels_first'
@@ -102,6 +107,7 @@ class Conv2D(Layer):
         activity_regularizer=None,
         kernel_constraint=None,
         bias_constraint=None,
+        cache_patches=True,
         **kwargs,
     ):
 
@@ -131,6 +137,7 @@ class Conv2D(Layer):
         self.use_bias = use_bias
         self.kernel_initializer = initializers.get(kernel_initializer)
         self.bias_initializer = initializers.get(bias_initializer)
+        self.cache_patches = cache_patches
 
         # Not implemented arguments
         default_args_check(dilation_rate, "dilation_rate", "Conv2D")
@@ -174,6 +181,11 @@ class Conv2D(Layer):
         if self.data_format != "channels_first":
             inputs = tfe.transpose(inputs, perm=[0, 3, 1, 2])
 
+        self._layer_patches = None
+        if self.cache_patches:
+            # protocols building conv2d from memoized patches reuse these
+            self._layer_patches = self._patches(inputs)
+
         outputs = tfe.conv2d(
             inputs, self.kernel.read_value(), self.strides, self.padding
         )
@@ -190,10 +202,16 @@ class Conv2D(Layer):
         self._layer_output = outputs
         return outputs
 
+    def _patches(self, x):
+        return tfe.im2col(
+            x, self.kernel_size[0], self.kernel_size[1], self.strides, self.padding
+        )
+
     def backward(self, d_y):
         x = self._layer_input
         y = self._layer_output
         kernel = self.weights[0].read_value()
+        h_filter, w_filter, in_filters, out_filters = self.kernel_shape
         grad_weights = []
 
         # Convert to NCHW format
@@ -239,21 +257,22 @@ class Conv2D(Layer):
                 pad_top : (d_x.shape[2] - pad_bottom),
                 pad_left : (d_x.shape[3] - pad_right),
             ]
-            x = tfe.pad(
-                x, [[0, 0], [0, 0], [pad_top, pad_bottom], [pad_left, pad_right]]
-            )
 
         if self.data_format != "channels_first":
             d_x = tfe.transpose(d_x, perm=[0, 2, 3, 1])
 
-        # Convert to CNHW
-        x = tfe.transpose(x, perm=[1, 0, 2, 3])
-        # Back prop for dw:
-        # https://medium.com/@mayank.utexas/backpropagation-for-convolution-with-strides-fb2f2efc4faa
-        # Output is in IOHW format
-        d_kernel = tfe.conv2d(x, inner_padded_d_y, [1, 1], "VALID")
-        # Convert to HWIO
-        d_kernel = tfe.transpose(d_kernel, perm=[2, 3, 0, 1])
+        # Back prop for dw: the gradient of the output, one row per filter,
+        # times the patches of the input, one column per output position
+        patches = self._layer_patches
+        if patches is None:
+            patches = self._patches(x)
+        d_y_col = tfe.reshape(tfe.transpose(d_y, perm=[3, 0, 1, 2]), [out_filters, -1])
+        d_kernel = tfe.matmul(d_y_col, patches, transpose_b=True)
+        # Convert from OIHW to HWIO
+        d_kernel = tfe.transpose(
+            tfe.reshape(d_kernel, [out_filters, in_filters, h_filter, w_filter]),
+            perm=[2, 3, 1, 0],
+        )
         if self.lazy_normalization:
             d_kernel = d_kernel / n_x
         grad_weights.append(d_kernel)
@@ -476,7 +495,6 @@ class DepthwiseConv2D(Conv2D):
         self.kernel_shape = self.kernel_size + (self.input_dim, self.depth_multiplier)
 
         kernel = self.depthwise_initializer(self.kernel_shape)
-        kernel = self.rearrange_kernel(kernel)
         self.kernel = self.add_weight(kernel)
 
         if self.use_bias:
@@ -490,66 +508,13 @@ class DepthwiseConv2D(Conv2D):
 
         self.built = True
 
-    def rearrange_kernel(self, kernel):
-        """Rearrange kernel to match normal convolution kernels
-
-        Arguments:
-          kernel: kernel to be rearranged
-        """
-        mask = self.get_mask(self.input_dim)
-
-        if isinstance(kernel, tf.Tensor):
-            mask = tf.constant(
-                mask.tolist(),
-                dtype=tf.float32,
-                shape=(
-                    self.kernel_size[0],
-                    self.kernel_size[1],
-                    self.input_dim,
-                    self.input_dim * self.depth_multiplier,
-                ),
-            )
-
-            if self.depth_multiplier > 1:
-                # rearrange kernel
-                kernel = tf.reshape(
-                    kernel,
-                    self.kernel_size + (1, self.input_dim * self.depth_multiplier),
-                )
-
-            kernel = tf.multiply(kernel, mask)
-
-        elif isinstance(kernel, np.ndarray):
-            if self.depth_multiplier > 1:
-                # rearrange kernel
-                kernel = np.reshape(
-                    kernel,
-                    self.kernel_size + (1, self.input_dim * self.depth_multiplier),
-                )
-
-            kernel = np.multiply(kernel, mask)
-
-        elif isinstance(kernel, TFEPrivateTensor):
-            mask = tfe.define_public_variable(mask)
-            if self.depth_multiplier > 1:
-                # rearrange kernel
-                kernel = tfe.reshape(
-                    kernel,
-                    self.kernel_size + (1, self.input_dim * self.depth_multiplier),
-                )
-
-            kernel = tfe.mul(kernel, mask)
-        else:
-            raise ValueError("Invalid kernel type")
-
-        return kernel
-
     def call(self, inputs):
+        self._layer_input = inputs
 
         if self.data_format != "channels_first":
             inputs = tfe.transpose(inputs, perm=[0, 3, 1, 2])
 
-        outputs = tfe.conv2d(
+        outputs = tfe.depthwise_conv2d(
             inputs, self.kernel.read_value(), self.strides, self.padding
         )
 
@@ -560,15 +525,97 @@ class DepthwiseConv2D(Conv2D):
             outputs = tfe.transpose(outputs, perm=[0, 2, 3, 1])
 
         if self.activation is not None:
-            return self.activation(outputs)
+            outputs = self.activation(outputs)
+
+        self._layer_output = outputs
         return outputs
 
     def backward(self, d_y):
-        raise NotImplementedError("Depthwise conv backward not implemented")
+        x = self._layer_input
+        y = self._layer_output
+        kernel = self.weights[0].read_value()
+        h_filter, w_filter, in_filters, multiplier = self.kernel_shape
+        grad_weights = []
+
+        # Convert to NCHW format
+        if self.data_format != "channels_first":
+            x = tfe.transpose(x, perm=[0, 3, 1, 2])
+        n_x, _, h_x, w_x = x.shape.as_list()
+
+        if self.activation is not None:
+            self._activation_deriv = activations.get_deriv(self.activation.__name__)
+            d_y = self._activation_deriv(y, d_y)
+
+        # Convert to HWNC format
+        if self.data_format == "channels_first":
+            d_y = tfe.transpose(d_y, perm=[2, 3, 0, 1])
+        else:
+            d_y = tfe.transpose(d_y, perm=[1, 2, 0, 3])
+
+        inner_padded_d_y = tfe.expand(d_y, self.strides[0])
+        padded_d_y = tfe.pad(
+            inner_padded_d_y,
+            [
+                [h_filter - 1, h_filter - 1],
+                [w_filter - 1, w_filter - 1],
+            ],
+        )
+
+        # Recover the NCHW format
+        padded_d_y = tfe.transpose(padded_d_y, perm=[2, 3, 0, 1])
+
+        # Every output channel only flows back to its own input channel, so
+        # dx is a depthwise convolution with the flipped filters, summed over
+        # the outputs of each input channel
+        flipped_kernel = tfe.reshape(
+            tfe.reverse(kernel, [0, 1]),
+            [h_filter, w_filter, in_filters * multiplier, 1],
+        )
+        d_x = tfe.depthwise_conv2d(padded_d_y, flipped_kernel, [1, 1], "VALID")
+        d_x = tfe.reshape(
+            d_x, [n_x, in_filters, multiplier] + d_x.shape.as_list()[2:]
+        ).reduce_sum(axis=2)
+
+        # Remove padding, if any
+        if self.padding == "SAME":
+            [[pad_top, pad_bottom], [pad_left, pad_right]] = self.pad_size(h_x, w_x)
+            d_x = d_x[
+                :,
+                :,
+                pad_top : (d_x.shape[2] - pad_bottom),
+                pad_left : (d_x.shape[3] - pad_right),
+            ]
+
+        if self.data_format != "channels_first":
+            d_x = tfe.transpose(d_x, perm=[0, 2, 3, 1])
+
+        d_kernel = tfe.depthwise_conv2d_backprop_filter(
+            x,
+            tfe.transpose(d_y, perm=[2, 3, 0, 1]),
+            self.kernel_shape,
+            self.strides,
+            self.padding,
+        )
+        if self.lazy_normalization:
+            d_kernel = d_kernel / n_x
+        grad_weights.append(d_kernel)
+
+        if self.use_bias:
+            d_bias = d_y.reduce_sum(axis=[0, 1, 2]).reshape(self.bias.shape)
+            if self.lazy_normalization:
+                d_bias = d_bias / n_x
+            grad_weights.append(d_bias)
+
+        assert (
+            d_x.shape == self._layer_input.shape
+        ), "Different shapes: {} vs {}".format(d_x.shape, self._layer_input.shape)
+
+        return grad_weights, d_x
 
     def compute_output_shape(self, input_shape):
         """Compute output_shape for the layer."""
-        h_filter, w_filter, _, n_filters = self.kernel_shape
+        h_filter, w_filter, in_filters, multiplier = self.kernel_shape
+        n_filters = in_filters * multiplier
 
         if self.data_format == "channels_first":
             n_x, _, h_x, w_x = input_shape
@@ -582,21 +629,10 @@ class DepthwiseConv2D(Conv2D):
             h_out = int(np.ceil(float(h_x - h_filter + 1) / float(self.strides[0])))
             w_out = int(np.ceil(float(w_x - w_filter + 1) / float(self.strides[0])))
 
-        return [n_x, n_filters, h_out, w_out]
-
-    def get_mask(self, in_channels):
-        mask = np.zeros(
-            (
-                self.kernel_size[0],
-                self.kernel_size[1],
-                in_channels,
-                in_channels * self.depth_multiplier,
-            )
-        )
-        for d in range(self.depth_multiplier):
-            for i in range(in_channels):
-                mask[:, :, i, d + (i * self.depth_multiplier)] = 1.0
-        return mask
+        if self.data_format == "channels_first":
+            return [n_x, n_filters, h_out, w_out]
+        else:
+            return [n_x, h_out, w_out, n_filters]
 
     def set_weights(self, weights):
         """
@@ -623,11 +659,7 @@ class DepthwiseConv2D(Conv2D):
         for i, w in enumerate(self.weights):
             shape = w.shape.as_list()
             new_weight = weights[i]
-            if i == 0:
-                # kernel
-                new_weight = self.rearrange_kernel(new_weight)
-            else:
-                # bias
-                new_weight = new_weight.reshape(shape)
+            # the kernel may come as [h, w, 1, in_channels * multiplier]
+            new_weight = new_weight.reshape(shape)
 
             tfe.assign(w, new_weight)
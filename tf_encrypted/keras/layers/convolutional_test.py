@@ -26,6 +26,51 @@ class TestConv2d(unittest.TestCase):
     def test_conv2d_kernelsize_tuple(self):
         self._core_conv2d(kernel_size=(2, 2))
 
+    def test_conv2d_backward(self):
+        tfe.set_protocol(tfe.protocol.ABY3())
+
+        input_shape = [2, 6, 6, 3]
+        input_data = np.random.normal(size=input_shape)
+        kernel = np.random.normal(size=(2, 2, 3, 4))
+        d_y = np.random.normal(size=(2, 3, 3, 4))
+
+        with tf.name_scope("TF"):
+            tf_layer = tf.keras.layers.Conv2D(
+                4,
+                2,
+                strides=2,
+                padding="same",
+                kernel_initializer=tf.keras.initializers.Constant(kernel),
+            )
+            x = tf.Variable(input_data, dtype=tf.float32)
+            with tf.GradientTape() as tape:
+                y = tf_layer(x) * d_y
+                k, b = tf_layer.trainable_weights
+                d_x, d_k, d_b = tape.gradient(y, [x, k, b])
+
+        for cache_patches in [True, False]:
+            with tf.name_scope("TFE"):
+                tfe_layer = tfe.keras.layers.Conv2D(
+                    4,
+                    2,
+                    strides=2,
+                    padding="same",
+                    kernel_initializer=tf.keras.initializers.Constant(kernel),
+                    cache_patches=cache_patches,
+                )
+                tfe_layer(tfe.define_private_variable(input_data))
+                grad, tfe_d_x = tfe_layer.backward(tfe.define_private_variable(d_y))
+
+            np.testing.assert_array_almost_equal(
+                grad[0].reveal().to_native(), d_k, decimal=2
+            )
+            np.testing.assert_array_almost_equal(
+                np.reshape(grad[1].reveal().to_native(), [-1]), d_b, decimal=2
+            )
+            np.testing.assert_array_almost_equal(
+                tfe_d_x.reveal().to_native(), d_x, decimal=2
+            )
+
     def _core_conv2d(self, **layer_kwargs):
         filters_in = 3
         batch_input_shape = [2, 6, 6, filters_in]  # channels last
@@ -128,8 +128,8 @@ class Dense(Layer):
             self._activation_deriv = activations.get_deriv(self.activation_identifier)
             d_y = self._activation_deriv(y, d_y)
 
-        d_x = tfe.matmul(d_y, kernel.transpose())
-        d_weights = tfe.matmul(x.transpose(), d_y)
+        d_x = tfe.matmul(d_y, kernel, transpose_b=True)
+        d_weights = tfe.matmul(x, d_y, transpose_a=True)
         if self.lazy_normalization:
             d_weights = d_weights / batch_size
         grad_weights.append(d_weights)
@@ -4,7 +4,11 @@ import tensorflow as tf
 from tensorflow.python.keras import initializers
 
 import tf_encrypted as tfe
+from tf_encrypted.keras import activations
 from tf_encrypted.keras.engine import Layer
+from tf_encrypted.keras.layers.convolutional import Conv2D
+from tf_encrypted.keras.layers.convolutional import DepthwiseConv2D
+from tf_encrypted.keras.layers.dense import Dense
 from tf_encrypted.keras.layers.layers_utils import default_args_check
 from tf_encrypted.protocol import TFEPublicTensor
 from tf_encrypted.protocol import TFEPublicVariable
@@ -215,6 +219,64 @@ class BatchNormalization(Layer):
     def compute_output_shape(self, input_shape):
         return input_shape
 
+    def fold_into(self, layer):
+        """Fold this layer into the layer feeding it, for inference.
+
+        At inference the normalization is an affine map per channel, so it can
+        be absorbed into the kernel and bias of a preceding `Conv2D`,
+        `DepthwiseConv2D` or `Dense` layer without activation. The folded
+        layer then computes `gamma * (layer(x) - mean) * denom + beta` on
+        its own and this layer can be dropped from the model. A bias is added
+        to `layer` if it had none.
+
+        Arguments:
+          layer: The built layer whose outputs this layer normalizes.
+
+        Returns:
+          True if this layer was folded into `layer`, False if `layer` cannot
+          absorb it.
+        """
+        if not isinstance(layer, (Conv2D, Dense)):
+            return False
+        if layer.activation not in (None, activations.linear):
+            return False
+
+        if isinstance(layer, Dense):
+            channel_axis, rank = 1, 2
+        elif layer.data_format == "channels_first":
+            channel_axis, rank = 1, 4
+        else:
+            channel_axis, rank = 3, 4
+        param_shape = self.moving_mean.shape.as_list()
+        if self.axis != channel_axis or len(param_shape) != rank:
+            return False
+
+        channels = param_shape[self.axis]
+        bias_shape = [channels] if rank == 2 else [channels, 1, 1]
+        if isinstance(layer, DepthwiseConv2D):
+            kernel_scale_shape = [layer.input_dim, layer.depth_multiplier]
+        else:
+            kernel_scale_shape = [channels]
+
+        scale = self.denom.read_value()
+        if self.gamma is not None:
+            scale = self.gamma.read_value() * scale
+
+        if layer.bias is None:
+            layer.bias = layer.add_weight(np.zeros(bias_shape))
+            layer.use_bias = True
+
+        kernel = layer.kernel.read_value() * scale.reshape(kernel_scale_shape)
+        bias = (
+            layer.bias.read_value() - self.moving_mean.read_value().reshape(bias_shape)
+        ) * scale.reshape(bias_shape)
+        if self.beta is not None:
+            bias = bias + self.beta.read_value().reshape(bias_shape)
+
+        tfe.assign(layer.kernel, kernel)
+        tfe.assign(layer.bias, bias)
+        return True
+
     def set_weights(self, weights):
         """Update layer weights from numpy array or Public Tensors including denom.
 
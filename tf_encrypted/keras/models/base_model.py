@@ -1,3 +1,5 @@
+import queue
+import threading
 import time
 from abc import abstractmethod
 from typing import Iterator
@@ -74,7 +76,14 @@ class BaseModel(Layer):
         return train_step
 
     def fit(
-        self, x=None, y=None, batch_size=32, epochs=1, verbose=1, steps_per_epoch=None
+        self,
+        x=None,
+        y=None,
+        batch_size=32,
+        epochs=1,
+        verbose=1,
+        steps_per_epoch=None,
+        prefetch=0,
     ):
         """Trains the model for a fixed number of epochs (iterations on a dataset).
 
@@ -107,21 +116,31 @@ class BaseModel(Layer):
                 When training with input tensors, the default `None` is equal to
                 the number of samples in your dataset divided by
                 the batch size, or 1 if that cannot be determined.
+            prefetch: Integer. Number of batches prepared ahead by a background
+                thread, which shares or slices the next batches while the
+                current step runs. 0 disables prefetching. Batches fetched ahead
+                of the last step are dropped.
         """
 
-        data_iter = data_wrap(x, y, batch_size)
+        data_iter = data_wrap(x, y, batch_size, prefetch=prefetch)
         if self.train_function is None:
             self.train_function = self.make_train_function()
-        for e in range(epochs):
-            print("Epoch {}/{}".format(e + 1, epochs))
-            progbar = utils.Progbar(steps_per_epoch, verbose=verbose)
-            for index, (input_x, input_y) in enumerate(data_iter):
-                start = time.time()
-                current_loss = self.train_function(input_x, input_y)
-                end = time.time()
-                progbar.add(1, values=[("loss", current_loss), ("time", end - start)])
-                if steps_per_epoch is not None and index + 1 >= steps_per_epoch:
-                    break
+        try:
+            for e in range(epochs):
+                print("Epoch {}/{}".format(e + 1, epochs))
+                progbar = utils.Progbar(steps_per_epoch, verbose=verbose)
+                for index, (input_x, input_y) in enumerate(data_iter):
+                    start = time.time()
+                    current_loss = self.train_function(input_x, input_y)
+                    end = time.time()
+                    progbar.add(
+                        1, values=[("loss", current_loss), ("time", end - start)]
+                    )
+                    if steps_per_epoch is not None and index + 1 >= steps_per_epoch:
+                        break
+        finally:
+            if isinstance(data_iter, Prefetcher):
+                data_iter.close()
 
     def make_predict_function(self, reveal=True):
         @tfe.function
@@ -136,15 +155,19 @@ class BaseModel(Layer):
 
         return predict_step
 
-    def predict(self, x, batch_size=32, reveal=True):
+    def predict(self, x, batch_size=32, reveal=True, prefetch=0):
         y_preds = []
-        data_iter = data_wrap(x, None, batch_size)
+        data_iter = data_wrap(x, None, batch_size, prefetch=prefetch)
         if self.predict_function is None:
             self.predict_function = self.make_predict_function(reveal)
 
-        for input_x in data_iter:
-            y_pred = self.predict_function(input_x)
-            y_preds.append(y_pred)
+        try:
+            for input_x in data_iter:
+                y_pred = self.predict_function(input_x)
+                y_preds.append(y_pred)
+        finally:
+            if isinstance(data_iter, Prefetcher):
+                data_iter.close()
 
         if reveal:
             concat = np.concatenate
@@ -169,7 +192,9 @@ class BaseModel(Layer):
 
         return test_step
 
-    def evaluate(self, x=None, y=None, batch_size=None, steps=None, metrics=None):
+    def evaluate(
+        self, x=None, y=None, batch_size=None, steps=None, metrics=None, prefetch=0
+    ):
 
         if self.test_function is None:
             self.test_function = self.make_test_function()
@@ -188,13 +213,17 @@ class BaseModel(Layer):
                 )
         y_preds = []
         y_trues = []
-        data_iter = data_wrap(x, y, batch_size)
-        for index, (input_x, input_y) in enumerate(data_iter):
-            y_pred = self.test_function(input_x)
-            y_preds.append(y_pred)
-            y_trues.append(input_y.reveal().to_native())
-            if steps is not None and index + 1 >= steps:
-                break
+        data_iter = data_wrap(x, y, batch_size, prefetch=prefetch)
+        try:
+            for index, (input_x, input_y) in enumerate(data_iter):
+                y_pred = self.test_function(input_x)
+                y_preds.append(y_pred)
+                y_trues.append(input_y.reveal().to_native())
+                if steps is not None and index + 1 >= steps:
+                    break
+        finally:
+            if isinstance(data_iter, Prefetcher):
+                data_iter.close()
 
         y_pred = np.concatenate(y_preds)
         y_true = np.concatenate(y_trues)
@@ -204,7 +233,88 @@ class BaseModel(Layer):
         return result
 
 
-def data_wrap(x, y=None, batch_size=32):
+_END_OF_DATA = object()
+
+
+class Prefetcher:
+    """
+    Iterates over `data_iter` from a background thread, keeping up to `depth`
+    items ready.
+
+    Getting the next batches from a generator of private inputs or slicing them
+    from private tensors then runs while the current step is computed. Items
+    are returned in order, and an exception raised by `data_iter` is raised
+    again by `next` once the items before it are consumed.
+
+    Arguments:
+        data_iter: Iterable of batches.
+        depth: Number of items fetched ahead.
+    """
+
+    def __init__(self, data_iter, depth=1):
+        if depth < 1:
+            raise ValueError("Prefetch depth must be positive, got {}".format(depth))
+        self._iter = iter(data_iter)
+        self._queue = queue.Queue(maxsize=depth)
+        self._stopped = threading.Event()
+        self._exhausted = False
+        self._thread = threading.Thread(target=self._fetch, daemon=True)
+        self._thread.start()
+
+    def _fetch(self):
+        try:
+            for item in self._iter:
+                if not self._put((True, item)):
+                    return
+            self._put((True, _END_OF_DATA))
+        except Exception as e:  # pylint: disable=broad-except
+            self._put((False, e))
+
+    def _put(self, entry):
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._exhausted:
+            raise StopIteration
+        ok, item = self._queue.get()
+        if not ok:
+            self._exhausted = True
+            raise item
+        if item is _END_OF_DATA:
+            self._exhausted = True
+            raise StopIteration
+        return item
+
+    def close(self):
+        """Stops the background thread, dropping the items fetched ahead."""
+        self._exhausted = True
+        self._stopped.set()
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+
+def data_wrap(x, y=None, batch_size=32, prefetch=0):
+    """Iterates over batches of `x` and `y`, prefetching `prefetch` batches in
+    a background thread if positive."""
+    data_iter = _data_iter(x, y, batch_size)
+    if prefetch > 0:
+        return Prefetcher(data_iter, depth=prefetch)
+    return data_iter
+
+
+def _data_iter(x, y=None, batch_size=32):
     if isinstance(x, Iterator):
         return x
     elif isinstance(x, TFEPrivateTensor) and isinstance(y, TFEPrivateTensor):
@@ -212,7 +322,7 @@ def data_wrap(x, y=None, batch_size=32):
         def iter_over_data(x_data, y_data, batch_size):
             start_index = 0
             end_index = batch_size
-            while start_index < x_data[0].shape[0]:
+            while start_index < x_data.shape[0]:
                 yield (x_data[start_index:end_index], y_data[start_index:end_index])
                 start_index += batch_size
                 end_index += batch_size
@@ -0,0 +1,82 @@
+# pylint: disable=missing-docstring
+import unittest
+
+import numpy as np
+import tensorflow as tf
+
+import tf_encrypted as tfe
+from tf_encrypted.keras import Sequential
+from tf_encrypted.keras.layers import Dense
+from tf_encrypted.keras.models.base_model import Prefetcher
+
+tf.keras.utils.set_random_seed(42)
+
+
+class TestPrefetcher(unittest.TestCase):
+    def test_order(self):
+        data_iter = Prefetcher(iter(range(10)), depth=3)
+        assert list(data_iter) == list(range(10))
+        assert list(data_iter) == []
+
+    def test_error(self):
+        def gen():
+            yield 0
+            yield 1
+            raise ValueError("broken batch")
+
+        data_iter = Prefetcher(gen(), depth=2)
+        assert next(data_iter) == 0
+        assert next(data_iter) == 1
+        with self.assertRaises(ValueError):
+            next(data_iter)
+
+    def test_close(self):
+        data_iter = Prefetcher(iter(range(100)), depth=2)
+        assert next(data_iter) == 0
+        data_iter.close()
+        assert list(data_iter) == []
+
+
+class TestPrefetchFit(unittest.TestCase):
+    def test_fit_prefetch(self):
+        shape = (128, 3)
+        x_np = np.random.normal(size=shape)
+        y_np = np.random.normal(size=(shape[0], 1))
+
+        with tfe.protocol.ABY3():
+            x = tfe.define_private_variable(x_np)
+            y = tfe.define_private_variable(y_np)
+
+            weights = None
+            updated = []
+            for prefetch in (0, 2):
+                model = Sequential()
+                model.add(Dense(2, batch_input_shape=(32, 3), activation="sigmoid"))
+                model.add(Dense(1))
+                if weights is None:
+                    weights = [
+                        w.read_value().reveal().to_native()
+                        for layer in model.layers
+                        for w in layer.weights
+                    ]
+                model.set_weights([np.copy(w) for w in weights])
+
+                optimizer = tfe.keras.optimizers.SGD(learning_rate=0.01)
+                loss = tfe.keras.losses.MeanSquaredError()
+                model.compile(optimizer, loss)
+                model.fit(x, y, batch_size=32, verbose=0, prefetch=prefetch)
+
+                updated.append(
+                    [
+                        w.read_value().reveal().to_native()
+                        for layer in model.layers
+                        for w in layer.weights
+                    ]
+                )
+
+        for w_plain, w_prefetched in zip(*updated):
+            np.testing.assert_allclose(w_prefetched, w_plain, rtol=1e-3, atol=1e-3)
+
+
+if __name__ == "__main__":
+    unittest.main()
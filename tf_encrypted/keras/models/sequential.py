@@ -6,6 +6,7 @@ from tf_encrypted.keras import optimizers
 from tf_encrypted.keras.engine import Layer
 from tf_encrypted.keras.engine.input_layer import Input
 from tf_encrypted.keras.engine.input_layer import InputLayer
+from tf_encrypted.keras.layers import BatchNormalization
 
 from .base_model import BaseModel
 
@@ -129,6 +130,32 @@ class Sequential(BaseModel):
                 grad_weights, d_y = self.layers[i].backward(d_y)
                 self._optimizer.apply_gradients(self.layers[i].weights, grad_weights)
 
+    def fold_batchnorm(self):
+        """Folds `BatchNormalization` layers into the layers feeding them.
+
+        For inference only: every normalization directly following a
+        `Conv2D`, `DepthwiseConv2D` or `Dense` layer without activation is
+        absorbed into that layer's kernel and bias and removed from the model,
+        so prediction no longer pays for its per-activation multiplications.
+        Call it once the weights are set; normalization layers that cannot be
+        folded are kept as they are.
+        """
+        layers = []
+        for layer in self._layers:
+            if (
+                isinstance(layer, BatchNormalization)
+                and layers
+                and layer.fold_into(layers[-1])
+            ):
+                continue
+            layers.append(layer)
+
+        self._layers = layers
+        self.weights = [layer.weights for layer in layers]
+        # previously traced functions still run the removed layers
+        self.predict_function = None
+        self.test_function = None
+
     def compile(self, optimizer, loss):
         """Configures the model for training.
 
@@ -193,6 +193,57 @@ class TestSequentialABY3(unittest.TestCase):
                 weights1_updated[i], expected_weights1_updated[i], rtol=1e-3, atol=1e-3
             )
 
+    def test_fold_batchnorm(self):
+        input_shape = (2, 8, 8, 3)
+        input_data = np.random.normal(size=input_shape)
+
+        # a ResNet-style stem: conv + batchnorm + relu, twice, then a dense head
+        model = tf.keras.models.Sequential()
+        model.add(
+            tf.keras.layers.Conv2D(
+                4, (3, 3), use_bias=False, batch_input_shape=input_shape
+            )
+        )
+        model.add(tf.keras.layers.BatchNormalization())
+        model.add(tf.keras.layers.ReLU())
+        model.add(tf.keras.layers.Conv2D(4, (3, 3), padding="same"))
+        model.add(tf.keras.layers.BatchNormalization())
+        model.add(tf.keras.layers.ReLU())
+        model.add(tf.keras.layers.Flatten())
+        model.add(tf.keras.layers.Dense(3))
+        model.add(tf.keras.layers.BatchNormalization())
+        for layer in model.layers:
+            if isinstance(layer, tf.keras.layers.BatchNormalization):
+                shape = layer.weights[0].shape
+                layer.set_weights(
+                    [
+                        np.random.uniform(0.5, 1.5, size=shape),
+                        np.random.normal(size=shape),
+                        np.random.normal(size=shape),
+                        np.random.uniform(0.5, 1.5, size=shape),
+                    ]
+                )
+        expected = model.predict(input_data)
+
+        with tfe.protocol.ABY3():
+            x = tfe.define_private_input(
+                "inputter", lambda: tf.convert_to_tensor(input_data)
+            )
+
+            tfe_model = tfe.keras.models.clone_model(model)
+            unfolded = tfe_model(x).reveal().to_native()
+
+            tfe_model.fold_batchnorm()
+            assert not any(
+                isinstance(layer, tfe.keras.layers.BatchNormalization)
+                for layer in tfe_model.layers
+            )
+            assert len(tfe_model.weights) == len(tfe_model.layers)
+            folded = tfe_model(x).reveal().to_native()
+
+            np.testing.assert_allclose(unfolded, expected, rtol=1e-2, atol=1e-2)
+            np.testing.assert_allclose(folded, expected, rtol=1e-2, atol=1e-2)
+
 
 def _model_predict_keras(input_data, input_shape):
     model = tf.keras.models.Sequential()
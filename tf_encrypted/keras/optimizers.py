@@ -5,6 +5,81 @@ import tensorflow as tf
 import tf_encrypted as tfe
 
 
+class FusedWeights:
+    """
+    The weights of all the layers of a model, updated together by a fused
+    optimizer.
+
+    Layers report their gradients one at a time through `apply_gradients`;
+    with a fused optimizer they are only collected until every compiled layer
+    has reported, after which the weights, gradients and optimizer moments are
+    updated as one flat tensor per share type and backing dtype. Each step then
+    costs the same number of rounds whatever the number of layers, and the
+    updated buffer is split and reshaped back into the weight variables.
+
+    Arguments:
+        weights: The weights of the model, as one list of variables per layer.
+    """
+
+    def __init__(self, weights):
+        self.layers = {id(W): W for W in weights}
+        self.variables = {}
+        for W in weights:
+            for w in W:
+                key = (w.share_type, w.backing_dtype)
+                self.variables.setdefault(key, []).append(w)
+        self.gradients = {}
+        self.reported = set()
+
+    def keys(self):
+        return list(self.variables.keys())
+
+    def zeros(self, key):
+        """A flat private variable of zeros the size of the weights of `key`."""
+        share_type, factory = key
+        size = sum(self._sizes(key))
+        return tfe.define_private_variable(
+            np.zeros([size]),
+            apply_scaling=True,
+            share_type=share_type,
+            factory=factory,
+        )
+
+    def add(self, W, G):
+        """Collect the gradients of one layer, returns True once all layers
+        reported theirs."""
+        if id(W) not in self.layers:
+            raise RuntimeError("Unregonized layer weights")
+        for w, g in zip(W, G):
+            self.gradients[id(w)] = g
+        self.reported.add(id(W))
+        return len(self.reported) == len(self.layers)
+
+    def flush(self):
+        """Returns the flattened weights and gradients of every key, and
+        forgets the collected gradients."""
+        flat = []
+        for key, variables in self.variables.items():
+            W = tfe.concat([tfe.reshape(w.read_value(), [-1]) for w in variables], 0)
+            G = tfe.concat(
+                [tfe.reshape(self.gradients[id(w)], [-1]) for w in variables], 0
+            )
+            flat.append((key, W, G))
+        self.gradients = {}
+        self.reported = set()
+        return flat
+
+    def assign(self, key, value):
+        """Assign the flat `value` back to the weight variables of `key`."""
+        variables = self.variables[key]
+        parts = tfe.split(value, self._sizes(key), axis=0)
+        for w, part in zip(variables, parts):
+            tfe.assign(w, tfe.reshape(part, w.shape.as_list()))
+
+    def _sizes(self, key):
+        return [int(np.prod(w.shape.as_list())) for w in self.variables[key]]
+
+
 class SGD:
     """
     Stochastic gradient descent optimizer.
@@ -12,15 +87,25 @@ class SGD:
     V = bV + aG
     W = W - V
 
+    With `fused=True` the update runs once per step over all the weights of the
+    model flattened together, see `FusedWeights`.
+
     Reference: https://paperswithcode.com/method/sgd-with-momentum
     """
 
-    def __init__(self, learning_rate=0.01, momentum=0.0):
+    def __init__(self, learning_rate=0.01, momentum=0.0, fused=False):
         self.learning_rate = learning_rate
         self.momentum = momentum
+        self.fused = fused
         self.Vs = {}
 
     def compile(self, weights):
+        if self.fused:
+            self.fused_weights = FusedWeights(weights)
+            for key in self.fused_weights.keys():
+                self.Vs[key] = self.fused_weights.zeros(key)
+            return
+
         for W in weights:
             self.Vs[id(W)] = [
                 tfe.define_private_variable(
@@ -33,6 +118,11 @@ class SGD:
             ]
 
     def apply_gradients(self, W, G):
+        if self.fused:
+            if self.fused_weights.add(W, G):
+                self._apply_fused_gradients()
+            return
+
         if id(W) not in self.Vs:
             raise RuntimeError("Unregonized layer weights")
 
@@ -43,6 +133,14 @@ class SGD:
                 tfe.assign(W[i], W[i].read_value() - (diff + self.learning_rate * G[i]))
                 tfe.assign(V[i], diff + self.learning_rate * G[i])
 
+    def _apply_fused_gradients(self):
+        with tf.name_scope("SGD-apply-fused-gradients"):
+            for key, W, G in self.fused_weights.flush():
+                V = self.Vs[key]
+                diff = self.momentum * V.read_value()
+                self.fused_weights.assign(key, W - (diff + self.learning_rate * G))
+                tfe.assign(V, diff + self.learning_rate * G)
+
 
 class AMSgrad:
     """
@@ -51,19 +149,31 @@ class AMSgrad:
     V_hat = max(V_hat, V)
     W = W - r * M / sqrt(V_hat)
 
+    With `fused=True` the update runs once per step over all the weights of the
+    model flattened together, see `FusedWeights`.
+
     Reference: https://paperswithcode.com/method/amsgrad
     """
 
-    def __init__(self, learning_rate=0.001, beta1=0.9, beta2=0.999):
+    def __init__(self, learning_rate=0.001, beta1=0.9, beta2=0.999, fused=False):
         self.learning_rate = learning_rate
         self.beta1 = beta1
         self.beta2 = beta2
+        self.fused = fused
         self.Ms = {}
         self.Vs = {}
         self.Vhats = {}
         self.epsilon = 2 ** -tfe.get_protocol().fixedpoint_config.precision_fractional
 
     def compile(self, weights):
+        if self.fused:
+            self.fused_weights = FusedWeights(weights)
+            for key in self.fused_weights.keys():
+                self.Vs[key] = self.fused_weights.zeros(key)
+                self.Ms[key] = self.fused_weights.zeros(key)
+                self.Vhats[key] = self.fused_weights.zeros(key)
+            return
+
         for W in weights:
             self.Vs[id(W)] = [
                 tfe.define_private_variable(
@@ -94,6 +204,11 @@ class AMSgrad:
             ]
 
     def apply_gradients(self, W, G):
+        if self.fused:
+            if self.fused_weights.add(W, G):
+                self._apply_fused_gradients()
+            return
+
         if id(W) not in self.Vs:
             raise RuntimeError("Unregonized layer weights")
 
@@ -115,6 +230,19 @@ class AMSgrad:
                 diff = self.learning_rate * M[i].read_value() * tfe.inv_sqrt(vhat_add_e)
                 tfe.assign(W[i], W[i].read_value() - diff)
 
+    def _apply_fused_gradients(self):
+        with tf.name_scope("AMSgard-apply-fused-gradients"):
+            for key, W, G in self.fused_weights.flush():
+                M = self.Ms[key]
+                V = self.Vs[key]
+                Vhat = self.Vhats[key]
+                tfe.assign(M, self.beta1 * M.read_value() + (1 - self.beta1) * G)
+                tfe.assign(V, self.beta2 * V.read_value() + (1 - self.beta2) * G * G)
+                tfe.assign(Vhat, tfe.maximum(Vhat.read_value(), V.read_value()))
+                vhat_add_e = Vhat.read_value() + self.epsilon
+                diff = self.learning_rate * M.read_value() * tfe.inv_sqrt(vhat_add_e)
+                self.fused_weights.assign(key, W - diff)
+
 
 class Adam:
     """
@@ -124,13 +252,17 @@ class Adam:
     V_hat = V / (1 - beta2**t)
     W = W - r * M_hat / sqrt(V_hat)
 
+    With `fused=True` the update runs once per step over all the weights of the
+    model flattened together, see `FusedWeights`.
+
     https://paperswithcode.com/method/adam
     """
 
-    def __init__(self, learning_rate=0.001, beta1=0.9, beta2=0.999):
+    def __init__(self, learning_rate=0.001, beta1=0.9, beta2=0.999, fused=False):
         self.learning_rate = learning_rate
         self.beta1 = beta1
         self.beta2 = beta2
+        self.fused = fused
         self.Ms = {}
         self.Vs = {}
         self.beta1_pow = {}
@@ -138,6 +270,20 @@ class Adam:
         self.epsilon = 2 ** -tfe.get_protocol().fixedpoint_config.precision_fractional
 
     def compile(self, weights):
+        if self.fused:
+            self.fused_weights = FusedWeights(weights)
+            for key in self.fused_weights.keys():
+                self.Vs[key] = self.fused_weights.zeros(key)
+                self.Ms[key] = self.fused_weights.zeros(key)
+                _, factory = key
+                self.beta1_pow[key] = tfe.define_public_variable(
+                    np.array(1), apply_scaling=True, factory=factory
+                )
+                self.beta2_pow[key] = tfe.define_public_variable(
+                    np.array(1), apply_scaling=True, factory=factory
+                )
+            return
+
         for W in weights:
             self.Vs[id(W)] = [
                 tfe.define_private_variable(
@@ -166,6 +312,11 @@ class Adam:
             )
 
     def apply_gradients(self, W, G):
+        if self.fused:
+            if self.fused_weights.add(W, G):
+                self._apply_fused_gradients()
+            return
+
         if id(W) not in self.Vs:
             raise RuntimeError("Unregonized layer weights")
 
@@ -190,6 +341,23 @@ class Adam:
                 diff = self.learning_rate * mhat * tfe.inv_sqrt(vhat + self.epsilon)
                 tfe.assign(W[i], W[i].read_value() - diff)
 
+    def _apply_fused_gradients(self):
+        with tf.name_scope("adam-apply-fused-gradients"):
+            for key, W, G in self.fused_weights.flush():
+                beta1_pow = self.beta1_pow[key]
+                beta2_pow = self.beta2_pow[key]
+                tfe.assign(beta1_pow, beta1_pow.read_value() * self.beta1)
+                tfe.assign(beta2_pow, beta2_pow.read_value() * self.beta2)
+
+                M = self.Ms[key]
+                V = self.Vs[key]
+                tfe.assign(M, self.beta1 * M.read_value() + (1 - self.beta1) * G)
+                tfe.assign(V, self.beta2 * V.read_value() + (1 - self.beta2) * G * G)
+                mhat = M.read_value() / (1 - beta1_pow.read_value())
+                vhat = V.read_value() / (1 - beta2_pow.read_value())
+                diff = self.learning_rate * mhat * tfe.inv_sqrt(vhat + self.epsilon)
+                self.fused_weights.assign(key, W - diff)
+
 
 _known_optimizers = {
     "sgd": SGD,
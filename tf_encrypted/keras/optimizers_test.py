@@ -0,0 +1,68 @@
+# pylint: disable=missing-docstring
+import unittest
+
+import numpy as np
+import tensorflow as tf
+
+import tf_encrypted as tfe
+from tf_encrypted.keras import Sequential
+from tf_encrypted.keras.layers import Dense
+
+tf.keras.utils.set_random_seed(42)
+
+
+class TestFusedOptimizers(unittest.TestCase):
+    def test_fused_sgd(self):
+        self._core_fused(tfe.keras.optimizers.SGD, learning_rate=0.01, momentum=0.9)
+
+    def test_fused_amsgrad(self):
+        self._core_fused(tfe.keras.optimizers.AMSgrad, learning_rate=0.01)
+
+    def test_fused_adam(self):
+        self._core_fused(tfe.keras.optimizers.Adam, learning_rate=0.01)
+
+    def _core_fused(self, optimizer_cls, **optimizer_kwargs):
+        shape = (32, 4)
+        x_np = np.random.normal(size=shape)
+        y_np = np.random.normal(size=(shape[0], 1))
+
+        with tfe.protocol.ABY3():
+            x = tfe.define_private_variable(x_np)
+            y = tfe.define_private_variable(y_np)
+
+            weights = None
+            updated = []
+            for fused in (False, True):
+                model = Sequential()
+                model.add(Dense(3, batch_input_shape=shape, activation="sigmoid"))
+                model.add(Dense(3, activation="sigmoid"))
+                model.add(Dense(1))
+                if weights is None:
+                    weights = [
+                        w.read_value().reveal().to_native()
+                        for layer in model.layers
+                        for w in layer.weights
+                    ]
+                model.set_weights([np.copy(w) for w in weights])
+
+                optimizer = optimizer_cls(fused=fused, **optimizer_kwargs)
+                loss = tfe.keras.losses.MeanSquaredError()
+                model.compile(optimizer, loss)
+                for _ in range(2):
+                    model.fit_batch(x, y)
+
+                updated.append(
+                    [
+                        w.read_value().reveal().to_native()
+                        for layer in model.layers
+                        for w in layer.weights
+                    ]
+                )
+
+        for w_unfused, w_fused, w_init in zip(updated[0], updated[1], weights):
+            assert not np.allclose(w_fused, w_init)
+            np.testing.assert_allclose(w_fused, w_unfused, rtol=1e-3, atol=1e-3)
+
+
+if __name__ == "__main__":
+    unittest.main()
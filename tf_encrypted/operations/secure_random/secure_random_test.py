@@ -105,6 +105,29 @@ class TestSeededRandom(unittest.TestCase):
 
         np.testing.assert_array_equal(out0, out1)
 
+    def test_thread_count(self):
+        # a quarter of the values get rejected for this range, the values
+        # below were produced by the single-threaded generator
+        for threads in [1, 4]:
+            config = tf.compat.v1.ConfigProto(intra_op_parallelism_threads=threads)
+            with tf.Graph().as_default():
+                output = secure_random.seeded_random_uniform(
+                    [300001],
+                    seed=[1, 2, 3, 4, 5, 6, 7, 8],
+                    maxval=2 ** 30 + 1,
+                    dtype=tf.int32,
+                )
+                with tf.compat.v1.Session(config=config) as sess:
+                    output = sess.run(output)
+
+            np.testing.assert_array_equal(
+                output[:3], [814867112, 985317071, 143003503]
+            )
+            np.testing.assert_array_equal(
+                output[-3:], [456833420, 178579524, 944106353]
+            )
+            self.assertEqual(output.astype(np.int64).sum(), 161138127821433)
+
 
 @unittest.skipUnless(dontskip, disabled_msg)
 class TestRandomUniform(unittest.TestCase):
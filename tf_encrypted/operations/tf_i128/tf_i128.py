@@ -59,6 +59,83 @@ def _try_load_tf_i128_module():
 tf_i128 = _try_load_tf_i128_module()
 
 
+_TWO_POW_64 = 2.0**64
+_TWO_POW_63 = 2.0**63
+_TWO_POW_53 = 2**53
+
+
+def _encode_exact(A: np.ndarray):
+    """
+    Per-element encoding through Python ints, used for `object` arrays that
+    may hold integers wider than what NumPy's fixed-width types can represent.
+    """
+
+    def _encode(tupl):
+        integer = int(tupl[0]) & ((1 << 128) - 1)
+        return np.frombuffer(integer.to_bytes(16, "little"), dtype=np.int64)
+
+    A = np.expand_dims(A, axis=-1)
+    A = np.concatenate((A, np.zeros(A.shape, dtype=object)), axis=-1)
+    return np.apply_along_axis(_encode, -1, A)
+
+
+def _wrap_int64(A: np.ndarray):
+    """
+    Reduce integral float64 values modulo 2^64 into int64 (two's complement).
+
+    Magnitudes below 2^63 are converted directly. Anything larger is a
+    multiple of 2^11, so its remainder modulo 2^64 is exactly representable
+    in float64 and can be converted through uint64 without rounding.
+    """
+    result = np.empty(A.shape, dtype=np.int64)
+    small = np.abs(A) < _TWO_POW_63
+    result[small] = A[small].astype(np.int64)
+    if not np.all(small):
+        large = A[~small]
+        large = large - np.floor(large / _TWO_POW_64) * _TWO_POW_64
+        result[~small] = large.astype(np.uint64).view(np.int64)
+    return result
+
+
+def _encode_float(A: np.ndarray):
+    """
+    Vectorized encoding of a flat float64 array into (N, 2) int64 limbs.
+
+    Values are truncated towards zero and reduced modulo 2^128, matching
+    `int(x) & (2^128 - 1)` of the per-element path.
+    """
+    if not np.all(np.isfinite(A)):
+        raise ValueError("Cannot encode non-finite values into int128")
+
+    A = np.trunc(A)
+    lo = np.empty(A.shape, dtype=np.int64)
+    hi = np.empty(A.shape, dtype=np.int64)
+
+    small = np.abs(A) < _TWO_POW_63
+    lo[small] = A[small].astype(np.int64)
+    hi[small] = lo[small] >> 63
+
+    if not np.all(small):
+        large = A[~small]
+        hi_f = np.floor(large / _TWO_POW_64)
+        lo[~small] = _wrap_int64(large - hi_f * _TWO_POW_64)
+        hi[~small] = _wrap_int64(hi_f)
+
+    return np.stack([lo, hi], axis=-1)
+
+
+def _encode_int(A: np.ndarray):
+    """
+    Vectorized encoding of a flat integer array into (N, 2) int64 limbs.
+    """
+    lo = A.astype(np.int64)
+    if A.dtype.kind == "u":
+        hi = np.zeros(A.shape, dtype=np.int64)
+    else:
+        hi = lo >> 63
+    return np.stack([lo, hi], axis=-1)
+
+
 def encode(A: np.ndarray):
     """
     A: (N, D) 2D array
@@ -69,15 +146,14 @@ def encode(A: np.ndarray):
 
     shape = A.shape
     A = A.reshape([-1])
-    A = A.astype(object)  # cast to object to hold enough precision
-    A = np.expand_dims(A, axis=-1)
-    A = np.concatenate((A, np.zeros(A.shape, dtype=object)), axis=-1)
 
-    def _encode(tupl):
-        integer = int(tupl[0]) & ((1 << 128) - 1)
-        return np.frombuffer(integer.to_bytes(16, "little"), dtype=np.int64)
+    if A.dtype.kind in ("i", "u", "b"):
+        A = _encode_int(A)
+    elif A.dtype.kind == "f":
+        A = _encode_float(A.astype(np.float64))
+    else:
+        A = _encode_exact(A.astype(object))
 
-    A = np.apply_along_axis(_encode, -1, A)
     A = A.reshape(shape + (2,))
     return A
 
@@ -104,7 +180,25 @@ def decode(A: np.ndarray, scale: int):
             int(two[0].astype(np.uint64)) + (int(two[1].astype(np.int64)) << 64)
         ) / scale
 
-    return np.apply_along_axis(_decode_i128, n_dims - 1, A).astype(np.float64)
+    A = A.astype(np.int64)
+    lo = A[..., 0]
+    hi = A[..., 1]
+
+    # Values that fit in an int64 are decoded with NumPy. Dividing by a power
+    # of two is exact, otherwise we also require the value to be exactly
+    # representable as float64 so only one rounding happens, as in the
+    # reference Python int path below.
+    fast = hi == (lo >> 63)
+    if scale & (scale - 1) != 0:
+        fast &= np.abs(lo) <= _TWO_POW_53
+
+    result = np.empty(lo.shape, dtype=np.float64)
+    result[fast] = lo[fast].astype(np.float64) / scale
+    if not np.all(fast):
+        result[~fast] = np.array(
+            [_decode_i128(two) for two in A[~fast]], dtype=np.float64
+        )
+    return result
 
 
 def __is_tf_tensor(x):
@@ -197,9 +291,11 @@ def sub(x: tf.Tensor, y: tf.Tensor):
     return tf_i128.i128_sub(x, y)
 
 
-def matmul(x: tf.Tensor, y: tf.Tensor):
+def matmul(
+    x: tf.Tensor, y: tf.Tensor, transpose_a: bool = False, transpose_b: bool = False
+):
     assert __is_tf_tensor(x) and __is_tf_tensor(y)
-    return tf_i128.i128_mat_mul(x, y)
+    return tf_i128.i128_mat_mul(x, y, transpose_a=transpose_a, transpose_b=transpose_b)
 
 
 def right_shift(x: tf.Tensor, shmt: int):
@@ -0,0 +1,126 @@
+# pylint: disable=missing-docstring
+import unittest
+
+import numpy as np
+import tensorflow as tf
+
+from tf_encrypted.operations import tf_i128
+
+
+def _reference_encode(x):
+    integer = int(x) & ((1 << 128) - 1)
+    return np.frombuffer(integer.to_bytes(16, "little"), dtype=np.int64)
+
+
+def _reference_decode(two, scale):
+    return (int(np.uint64(two[0])) + (int(np.int64(two[1])) << 64)) / scale
+
+
+class TestI128Encoding(unittest.TestCase):
+    def _check_encode(self, values):
+        actual = tf_i128.encode(values)
+        expected = np.array(
+            [_reference_encode(v) for v in values.reshape([-1]).tolist()]
+        ).reshape(values.shape + (2,))
+        np.testing.assert_array_equal(actual, expected)
+        return actual
+
+    def test_encode_small_floats(self):
+        x = np.random.uniform(-1.0, 1.0, size=(20, 30)) * 2**40
+        self._check_encode(x)
+
+    def test_encode_large_floats(self):
+        for magnitude in [2**63, 2**64, 2**100, 2**127, 2**140]:
+            x = np.random.standard_normal(size=1000) * magnitude
+            self._check_encode(x)
+
+    def test_encode_boundaries(self):
+        x = np.array(
+            [
+                0.0,
+                -0.5,
+                0.7,
+                -1.0,
+                2.0**53 + 2,
+                2.0**63,
+                -(2.0**63),
+                2.0**64,
+                -(2.0**64),
+                2.0**127,
+                -(2.0**127),
+                2.0**128,
+            ]
+        )
+        self._check_encode(x)
+
+    def test_encode_integers(self):
+        x = np.random.randint(-(2**63), 2**63 - 1, size=(10, 10), dtype=np.int64)
+        self._check_encode(x)
+        x = np.random.randint(0, 2**64 - 1, size=100, dtype=np.uint64)
+        self._check_encode(x)
+        x = np.array([2**100, -(2**90), 5], dtype=object)
+        self._check_encode(x)
+
+    def test_encode_scalar(self):
+        actual = tf_i128.encode(np.array(-3.0))
+        np.testing.assert_array_equal(actual, np.array([-3, -1]))
+
+    def test_encode_non_finite(self):
+        with self.assertRaises(ValueError):
+            tf_i128.encode(np.array([1.0, np.nan]))
+
+    def test_decode(self):
+        x = np.concatenate(
+            [
+                np.random.standard_normal(size=500) * 2**40,
+                np.random.standard_normal(size=500) * 2**70,
+            ]
+        )
+        encoded = tf_i128.encode(x)
+        for scale in [1, 3, 2**40, 10**6]:
+            actual = tf_i128.decode(encoded, scale)
+            expected = np.array([_reference_decode(two, scale) for two in encoded])
+            np.testing.assert_array_equal(actual, expected)
+
+    def test_round_trip(self):
+        scale = 2**40
+        x = np.random.uniform(-1000.0, 1000.0, size=(4, 5, 6))
+        actual = tf_i128.decode(tf_i128.encode(x * scale), scale)
+        np.testing.assert_allclose(actual, x, rtol=0.0, atol=1.0 / scale)
+
+
+def _to_ints(two):
+    two = two.astype(object)
+    return two[..., 0] % (1 << 64) + (two[..., 1] << 64)
+
+
+class TestI128MatMul(unittest.TestCase):
+    def _random_i128(self, shape):
+        info = np.iinfo(np.int64)
+        return np.random.randint(info.min, info.max, size=shape + (2,), dtype=np.int64)
+
+    def test_matmul(self):
+        # larger than one panel of the blocked kernel in every dimension
+        x = self._random_i128((70, 130))
+        y = self._random_i128((130, 150))
+        expected = _to_ints(x).dot(_to_ints(y)) % (1 << 128)
+
+        cases = [
+            (x, y, False, False),
+            (np.transpose(x, [1, 0, 2]), y, True, False),
+            (x, np.transpose(y, [1, 0, 2]), False, True),
+            (np.transpose(x, [1, 0, 2]), np.transpose(y, [1, 0, 2]), True, True),
+        ]
+        for a, b, transpose_a, transpose_b in cases:
+            actual = tf_i128.matmul(
+                tf.constant(a),
+                tf.constant(b),
+                transpose_a=transpose_a,
+                transpose_b=transpose_b,
+            )
+            actual = _to_ints(actual.numpy()) % (1 << 128)
+            np.testing.assert_array_equal(actual, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
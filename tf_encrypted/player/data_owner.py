@@ -47,7 +47,7 @@ class DataOwner:
         def share(plain_iter):
 
             if isinstance(self.first_element, (list, tuple)):
-                yield (
+                yield tuple(
                     tfe.define_private_input(self.player.name, lambda: data)
                     for data in self.first_element
                 )
@@ -58,7 +58,7 @@ class DataOwner:
 
             for plain_data in plain_iter:
                 if isinstance(plain_data, (list, tuple)):
-                    yield (
+                    yield tuple(
                         tfe.define_private_input(self.player.name, lambda: data)
                         for data in plain_data
                     )
@@ -5,6 +5,8 @@ from __future__ import absolute_import
 import inspect
 
 from .aby3 import ABY3
+from .communication import CommunicationReport
+from .communication import communication_stats
 from .pond import Pond
 from .protocol import Protocol
 from .protocol import TFEPrivateTensor
@@ -36,6 +38,8 @@ __all__ = [
     "Protocol",
     "memoize",
     "function",
+    "communication_stats",
+    "CommunicationReport",
     "Pond",
     "SecureNN",
     "TFEVariable",
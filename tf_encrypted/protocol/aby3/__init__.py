@@ -4,6 +4,14 @@ from .aby3 import ABY3
 from .aby3_tensors import ABY3PrivateTensor
 from .aby3_tensors import ABY3PublicTensor
 from .aby3_tensors import ABY3Tensor
+from .aby3_tensors import ABY3UntruncatedTensor
 from .aby3_tensors import ShareType
 
-__all__ = ["ABY3", "ABY3Tensor", "ABY3PublicTensor", "ABY3PrivateTensor", "ShareType"]
+__all__ = [
+    "ABY3",
+    "ABY3Tensor",
+    "ABY3PublicTensor",
+    "ABY3PrivateTensor",
+    "ABY3UntruncatedTensor",
+    "ShareType",
+]
@@ -3,12 +3,14 @@
 """
 Implementation of the ABY3 framework.
 """
+
 from __future__ import absolute_import
 
 import math
 import random
 import string
 import sys
+from collections import OrderedDict
 from functools import reduce
 from functools import wraps
 from math import ceil
@@ -37,9 +39,16 @@ from ...tensor.fixed import fixed64_heuristic
 from ...tensor.fixed import fixed128_heuristic
 from ...tensor.shared import out_size
 from ..protocol import Protocol
+from ..protocol import dispatch_table
 from ..protocol import memoize
 from . import fp
 from .aby3_tensors import *
+from .ppa_cost import HYBRID_DENSE_WIDTH
+from .ppa_cost import select_ppa_topology
+from .randomness_pool import EDABIT
+from .randomness_pool import RANDOM_SHARING
+from .randomness_pool import ZERO_SHARING
+from .randomness_pool import RandomnessPool
 
 TFEInputter = Callable[[], Union[List[tf.Tensor], tf.Tensor]]
 TF_NATIVE_TYPES = [tf.bool, tf.int8, tf.int16, tf.int32, tf.int64]
@@ -63,10 +72,38 @@ def is_power_of_two(x):
 
 
 class ABY3(Protocol):
-    """ABY3 framework."""
+    """
+    ABY3 framework.
+
+    With `lazy_truncation=True`, products of scaled private tensors are not
+    truncated right away: sums, differences and negations of them are computed
+    at double precision, and truncated once when the result is used by any other
+    operation, e.g. a multiplication, a comparison or `reveal`.
+
+    `link_rtt`, in seconds, and `link_bandwidth`, in bytes per second, describe
+    the links between the servers. When both are set, the adders used by e.g.
+    `a2b` and `b2a`, and the OTs of `mul_ab` and `b2a_single`, pick the method
+    that is the fastest over such links for the size of their inputs; otherwise
+    they use the one with the fewest rounds.
+
+    With `edabits=True`, comparisons and the heuristic truncation consume
+    edabits, random values shared both arithmetically and bitwise, see
+    `_gen_edabits`: online, they only open the masked input and evaluate their
+    circuit on its public bits. Use `preprocess_randomness` to generate the
+    edabits ahead of the online phase.
+    """
 
     def __init__(
-        self, server_0=None, server_1=None, server_2=None, fixedpoint_config=None
+        self,
+        server_0=None,
+        server_1=None,
+        server_2=None,
+        fixedpoint_config=None,
+        bool_factory=None,
+        lazy_truncation=False,
+        link_rtt=None,
+        link_bandwidth=None,
+        edabits=False,
     ):
         config = get_config()
         self.servers = [None, None, None]
@@ -93,10 +130,20 @@ class ABY3(Protocol):
             raise ValueError("Don't know how to handle {}".format(fixedpoint_config))
         self.default_nbits = self.fixedpoint_config.nbits
         self.default_factory = factories[self.default_nbits]
+        # Factory of single-bit boolean sharings, e.g. results of comparisons.
+        # Use `tfe.tensor.int1packedfactory` to pack 64 bits per word.
+        self.bool_factory = bool_factory or factories[tf.bool]
+        self.lazy_truncation = lazy_truncation
+        self.link_rtt = link_rtt
+        self.link_bandwidth = link_bandwidth
+        self.edabits = edabits
+        self.randomness_pool = None
+        self._randomness_requests = None
 
         self.reset()
 
     def reset(self):
+        super().reset()
         self.pairwise_keys_ = None
         self.pairwise_nonces_ = None
         self.b2a_keys_1_ = None
@@ -136,6 +183,28 @@ class ABY3(Protocol):
     def _update_b2a_nonce(self):
         self.b2a_nonce_ += 1
 
+    def preprocess_randomness(self, func, *args, **kwargs) -> RandomnessPool:
+        """
+        Offline phase for `func(*args, **kwargs)`: generates the zero sharings
+        and random sharings it needs in bulk and installs them as
+        `randomness_pool`, so the online computation only slices them.
+
+        .. code-block:: python
+
+            pool = prot.preprocess_randomness(predict, x)
+            y = predict(x)
+            pool.fill()  # fresh randomness before the next execution
+            y = predict(x)
+
+        Call this before `func` is first traced, and call `fill` on the
+        returned pool before every further execution of `func`; set
+        `randomness_pool` back to None to sample inline again.
+        """
+        pool = RandomnessPool.plan(self, func, *args, **kwargs)
+        pool.fill()
+        self.randomness_pool = pool
+        return pool
+
     def initialize_keys(self):
         self._setup_pairwise_randomness()
         self._setup_b2a_generator()
@@ -398,6 +467,7 @@ class ABY3(Protocol):
         share_type=ShareType.ARITHMETIC,
         name: Optional[str] = None,
         factory: Optional[AbstractFactory] = None,
+        player: Optional[Union[str, Player]] = None,
     ):
         """
         Define a private variable.
@@ -414,24 +484,26 @@ class ABY3(Protocol):
         :param bool apply_scaling: Whether or not to scale the value.
         :param str name: What name to give to this node in the graph.
         :param AbstractFactory factory: Which tensor type to represent this value with.
+        :param Union[str,Player] player: Who holds the initial value, the value is
+            shared on this player's device. If it is one of the servers, only one
+            full-size share leaves it.
         """
         init_val_types = (np.ndarray, tf.Tensor, ABY3PrivateTensor)
         assert isinstance(initial_value, init_val_types), type(initial_value)
 
         factory = factory or self.default_factory
         suffix = "-" + name if name else ""
+        if isinstance(player, str):
+            player = get_config().get_player(player)
+        device = player.device_name if player is not None else None
 
         with tf.name_scope("private-var{}".format(suffix)):
 
-            if isinstance(initial_value, np.ndarray):
-                initial_value = self._encode(initial_value, apply_scaling)
-                v = factory.tensor(initial_value)
-                shares = self._share(v, share_type=share_type)
-
-            elif isinstance(initial_value, tf.Tensor):
-                initial_value = self._encode(initial_value, apply_scaling)
-                v = factory.tensor(initial_value)
-                shares = self._share(v, share_type=share_type)
+            if isinstance(initial_value, (np.ndarray, tf.Tensor)):
+                with tf.device(device):
+                    initial_value = self._encode(initial_value, apply_scaling)
+                    v = factory.tensor(initial_value)
+                    shares = self._share(v, share_type=share_type, player=player)
 
             elif isinstance(initial_value, ABY3PrivateTensor):
                 shares = initial_value.unwrapped
@@ -756,7 +828,10 @@ class ABY3(Protocol):
         )
 
     def from_bone(self, tensor_bone: ABY3TensorBone) -> ABY3Tensor:
-        factory = factories[tensor_bone.factory]
+        if tensor_bone.factory == self.bool_factory.nbits:
+            factory = self.bool_factory
+        else:
+            factory = factories[tensor_bone.factory]
         if isinstance(tensor_bone, ABY3PublicTensorBone):
             values = [None, None, None]
             for i in range(3):
@@ -842,11 +917,18 @@ class ABY3(Protocol):
     def _share(self, secret: AbstractTensor, share_type: str, player=None):
         """Secret-share an AbstractTensor.
 
+        Two of the three shares are expanded from fresh seeds by the servers
+        holding them, so only the remaining share, the correction, is sent in
+        full. If `player`, the owner of the secret, is one of the servers, the
+        correction is one of the shares it holds itself and is sent to a single
+        other server.
+
         Args:
           secret: `AbstractTensor`, the tensor to share.
+          player: `Player`, where the secret is located.
 
         Returns:
-          A pair of `AbstractTensor`, the shares.
+          The replicated shares.
         """
 
         with tf.name_scope("share"):
@@ -854,33 +936,35 @@ class ABY3(Protocol):
                 secret_shape = secret.shape
                 if isinstance(secret_shape, tf.TensorShape):
                     secret_shape = secret_shape.as_list()
-                seed0 = crypto.secure_seed()
-                seed1 = crypto.secure_seed()
-                share0 = secret.factory.sample_seeded_uniform(secret_shape, seed0)
-                share1 = secret.factory.sample_seeded_uniform(secret_shape, seed1)
+
+                # server i holds shares i and i + 1
+                owner = self.servers.index(player) if player in self.servers else None
+                corrected = owner if owner is not None else 2
+                seeded = [(corrected + 1) % 3, (corrected + 2) % 3]
+
+                seeds = [None, None, None]
+                values = [None, None, None]
+                for k in seeded:
+                    seeds[k] = crypto.secure_seed()
+                    values[k] = secret.factory.sample_seeded_uniform(
+                        secret_shape, seeds[k]
+                    )
                 if share_type == ShareType.ARITHMETIC:
-                    share2 = secret - share0 - share1
+                    values[corrected] = secret - values[seeded[0]] - values[seeded[1]]
                 elif share_type == ShareType.BOOLEAN:
-                    share2 = secret ^ share0 ^ share1
+                    values[corrected] = secret ^ values[seeded[0]] ^ values[seeded[1]]
+
                 # Replicated sharing
                 shares = [[None, None], [None, None], [None, None]]
-                with tf.device(self.servers[0].device_name):
-                    shares[0][0] = secret.factory.sample_seeded_uniform(
-                        secret_shape, seed0
-                    )
-                    shares[0][1] = secret.factory.sample_seeded_uniform(
-                        secret_shape, seed1
-                    )
-                with tf.device(self.servers[1].device_name):
-                    shares[1][0] = secret.factory.sample_seeded_uniform(
-                        secret_shape, seed1
-                    )
-                    shares[1][1] = share2.identity()
-                with tf.device(self.servers[2].device_name):
-                    shares[2][0] = share2.identity()
-                    shares[2][1] = secret.factory.sample_seeded_uniform(
-                        secret_shape, seed0
-                    )
+                for i in range(3):
+                    with tf.device(self.servers[i].device_name):
+                        for j, k in enumerate([i, (i + 1) % 3]):
+                            if k == corrected or i == owner:
+                                shares[i][j] = values[k].identity()
+                            else:
+                                shares[i][j] = secret.factory.sample_seeded_uniform(
+                                    secret_shape, seeds[k]
+                                )
                 return shares
 
             else:
@@ -936,6 +1020,67 @@ class ABY3(Protocol):
                 raise NotImplementedError("Unknown share type.")
 
     def _gen_zero_sharing(self, shape, share_type=ShareType.ARITHMETIC, factory=None):
+        factory = factory or self.default_factory
+        pooled = self._pooled_randomness(ZERO_SHARING, shape, share_type, factory)
+        if pooled is not None:
+            return pooled
+        return self._sample_zero_sharing(shape, share_type, factory)
+
+    def _gen_random_sharing(self, shape, share_type=ShareType.ARITHMETIC, factory=None):
+        factory = factory or self.default_factory
+        pooled = self._pooled_randomness(RANDOM_SHARING, shape, share_type, factory)
+        if pooled is not None:
+            return pooled
+        return self._sample_random_sharing(shape, share_type, factory)
+
+    def _gen_edabits(self, shape, factory=None, amount=None):
+        """
+        Edabits of the given shape: a random arithmetic sharing `r` and the
+        boolean sharing of the same value, or, with `amount`, the arithmetic
+        sharings of `r`, of its most significant bit and of
+        `(r mod 2^(l-1)) >> amount`, as used by the truncation.
+        """
+        factory = factory or self.default_factory
+        pooled = self._pooled_randomness(EDABIT, shape, amount, factory)
+        if pooled is not None:
+            return pooled
+        return self._sample_edabits(shape, amount, factory)
+
+    def _sample_edabits(self, shape, amount=None, factory=None):
+        factory = factory or self.default_factory
+        # The conversions sample their own randomness: they must neither take
+        # it from the pool nor be planned into it.
+        pool, requests = self.randomness_pool, self._randomness_requests
+        self.randomness_pool, self._randomness_requests = None, None
+        try:
+            with tf.name_scope("edabits"):
+                r_bits = self._sample_random_sharing(
+                    shape, ShareType.BOOLEAN, factory
+                )
+                r_bits.is_scaled = False
+                r = self.b2a(r_bits)
+                if amount is None:
+                    return r, r_bits
+                r_msb = self.b2a(self.logical_rshift(r_bits, factory.nbits - 1))
+                s = self.b2a(self.logical_rshift(r_bits << 1, amount + 1))
+                return r, r_msb, s
+        finally:
+            self.randomness_pool, self._randomness_requests = pool, requests
+
+    def _pooled_randomness(self, kind, shape, share_type, factory):
+        shape = tf.TensorShape(shape)
+        if not shape.is_fully_defined():
+            return None
+        shape = tuple(shape.as_list())
+        if self._randomness_requests is not None:
+            self._randomness_requests.append((kind, shape, share_type, factory))
+        if self.randomness_pool is None:
+            return None
+        return self.randomness_pool.take(kind, shape, share_type, factory)
+
+    def _sample_zero_sharing(
+        self, shape, share_type=ShareType.ARITHMETIC, factory=None
+    ):
         def helper(f0, f1):
             if share_type == ShareType.ARITHMETIC:
                 return f0 - f1
@@ -982,7 +1127,9 @@ class ABY3(Protocol):
         self._update_pairwise_nonces()
         return a0, a1, a2
 
-    def _gen_random_sharing(self, shape, share_type=ShareType.ARITHMETIC, factory=None):
+    def _sample_random_sharing(
+        self, shape, share_type=ShareType.ARITHMETIC, factory=None
+    ):
 
         r = [[None] * 2 for _ in range(3)]
         factory = factory or self.default_factory
@@ -1066,6 +1213,56 @@ class ABY3(Protocol):
         self._update_b2a_nonce()
         return x_on_0, x_on_1, x_on_2, shares
 
+    def _forwarded_ot(
+        self,
+        sender,
+        receiver,
+        helper,
+        m0,
+        m1,
+        c_on_receiver,
+        c_on_helper,
+        key_on_sender,
+        key_on_helper,
+        nonce,
+    ):
+        """
+        Three-party OT protocol whose output is learnt by both the receiver and
+        the helper.
+
+        The arguments are the same as for `_ot`. The receiver forwards the masked
+        message it selected to the helper, which unmasks it. Returns the chosen
+        message located on the receiver and on the helper.
+        """
+        assert m0.shape == m1.shape, "m0 shape {}, m1 shape {}".format(
+            m0.shape, m1.shape
+        )
+        assert c_on_receiver.factory.native_type == tf.bool
+        assert c_on_helper.factory.native_type == tf.bool
+        assert m0.factory == m1.factory
+
+        factory = m0.factory
+
+        with tf.name_scope("forwarded-OT"):
+            with tf.device(sender.device_name):
+                w_on_sender = factory.sample_seeded_uniform(
+                    shape=[2] + m0.shape.as_list(), seed=key_on_sender + nonce
+                )
+                masked_m0 = m0 ^ w_on_sender[0]
+                masked_m1 = m1 ^ w_on_sender[1]
+            with tf.device(helper.device_name):
+                w_on_helper = factory.sample_seeded_uniform(
+                    shape=[2] + m0.shape.as_list(), seed=key_on_helper + nonce
+                )
+                w_c = factory.where(c_on_helper.value, w_on_helper[1], w_on_helper[0])
+            with tf.device(receiver.device_name):
+                masked_m_c = factory.where(c_on_receiver.value, masked_m1, masked_m0)
+                m_c_on_receiver = masked_m_c ^ w_c
+            with tf.device(helper.device_name):
+                m_c_on_helper = masked_m_c ^ w_c
+
+        return m_c_on_receiver, m_c_on_helper
+
     def _ot(
         self,
         sender,
@@ -1090,8 +1287,8 @@ class ABY3(Protocol):
         assert m0.shape == m1.shape, "m0 shape {}, m1 shape {}".format(
             m0.shape, m1.shape
         )
-        assert c_on_receiver.factory == factories[tf.bool]
-        assert c_on_helper.factory == factories[tf.bool]
+        assert c_on_receiver.factory.native_type == tf.bool
+        assert c_on_helper.factory.native_type == tf.bool
         assert m0.factory == m1.factory
 
         factory = m0.factory
@@ -1175,7 +1372,11 @@ class ABY3(Protocol):
         :param ABY3Tensor x: The first operand.
         :param ABY3Tensor y: The second operand.
         """
+        bounded = self._is_single_precision(x) and self._is_single_precision(y)
         x, y = self.lift(x, y)
+        z = self._untruncated_linear("add", x, y) if bounded else None
+        if z is not None:
+            return z
         return self.dispatch("add", x, y)
 
     def lift(self, x, y=None):
@@ -1240,14 +1441,92 @@ class ABY3(Protocol):
 
     @memoize
     def sub(self, x, y):
+        bounded = self._is_single_precision(x) and self._is_single_precision(y)
         x, y = self.lift(x, y)
+        z = self._untruncated_linear("sub", x, y) if bounded else None
+        if z is not None:
+            return z
         return self.dispatch("sub", x, y)
 
     @memoize
     def negative(self, x):
         x = self.lift(x)
+        if isinstance(x, ABY3UntruncatedTensor):
+            z = self.dispatch("negative", x.untruncated)
+            return ABY3UntruncatedTensor(self, z, x.scale, x.terms)
         return self.dispatch("negative", x)
 
+    def _truncate_product(self, z):
+        """
+        Truncate the product `z` of two scaled tensors, or defer its truncation
+        when `lazy_truncation` is enabled.
+        """
+        if (
+            self.lazy_truncation
+            and isinstance(z, ABY3PrivateTensor)
+            and z.is_arithmetic()
+            and z.backing_dtype.native_type != tf.bool
+        ):
+            scale = self.fixedpoint_config.precision_fractional
+            return ABY3UntruncatedTensor(self, z, scale, 1)
+        return self.truncate(z)
+
+    def _is_single_precision(self, x):
+        """
+        Whether `x` may be scaled up to double precision when added to an
+        `ABY3UntruncatedTensor`. Tensors are assumed to be bounded, like for
+        any multiplication, but constants are checked.
+        """
+        if isinstance(x, (int, float, np.ndarray)):
+            bound = self.fixedpoint_config.bound_single_precision
+            return np.max(np.abs(x)) * self.fixedpoint_config.scaling_factor < bound
+        return True
+
+    def _fits_untruncated(self, terms):
+        """
+        Overflow check for deferred truncation: a sum of `terms` values of double
+        precision must stay within `bound_intermediate_results`.
+        """
+        config = self.fixedpoint_config
+        return (
+            terms * config.bound_double_precision <= config.bound_intermediate_results
+        )
+
+    def _untruncated_linear(self, op, x, y):
+        """
+        Add or subtract `x` and `y` without truncating when one of them is an
+        `ABY3UntruncatedTensor`, scaling up the other one locally. Returns None
+        when this is not possible, in which case both operands are truncated.
+        """
+        untruncated = [t for t in (x, y) if isinstance(t, ABY3UntruncatedTensor)]
+        if not untruncated:
+            return None
+        if not all(t.is_scaled and not t.is_boolean() for t in (x, y)):
+            return None
+
+        scale = max(t.scale for t in untruncated)
+        terms = sum(
+            t.terms if isinstance(t, ABY3UntruncatedTensor) and t.scale == scale else 1
+            for t in (x, y)
+        )
+        if not self._fits_untruncated(terms):
+            return None
+
+        operands = []
+        for t in (x, y):
+            if isinstance(t, ABY3UntruncatedTensor) and t.scale == scale:
+                operands.append(t.untruncated)
+            else:
+                factor = self.define_constant(
+                    np.array(self.fixedpoint_config.scaling_base**scale),
+                    apply_scaling=False,
+                    factory=t.backing_dtype,
+                )
+                operands.append(self.mul(t, factor))
+
+        z = self.dispatch(op, *operands)
+        return ABY3UntruncatedTensor(self, z, scale, terms)
+
     @memoize
     def square(self, x):
         return self.mul(x, x)
@@ -1259,7 +1538,9 @@ class ABY3(Protocol):
             return self.mul_pow2(x, int(math.log2(y)))
         elif isinstance(x, (int, float)) and is_power_of_two(x):
             return self.mul_pow2(y, int(math.log2(x)))
-        elif isinstance(y, ABY3PrivateTensor) and y.backing_dtype == factories[tf.bool]:
+        elif (
+            isinstance(y, ABY3PrivateTensor) and y.backing_dtype.native_type == tf.bool
+        ):
             return self.mul_ab(x, y)
 
         x, y = self.lift(x, y)
@@ -1354,9 +1635,50 @@ class ABY3(Protocol):
         return self.dispatch("exp", x, approx_type, sign)
 
     @memoize
-    def matmul(self, x, y):
+    def matmul(self, x, y, transpose_a=False, transpose_b=False):
+        """
+        See tf.matmul. The transposes are fused into the matrix multiplication of
+        the shares instead of being materialized.
+        """
+        x, y = self.lift(x, y)
+        return self.dispatch(
+            "matmul", x, y, transpose_a=transpose_a, transpose_b=transpose_b
+        )
+
+    @memoize
+    def fused_products(self, products):
+        """
+        Compute independent products, resharing all those between private
+        tensors in a single round instead of one round per product.
+
+        .. code-block:: python
+
+            xy, uv = prot.fused_products([("mul", x, y), ("matmul", u, v)])
+
+        @param products: List of `(op, x, y)` where `op` is "mul" or "matmul".
+            The operands of one product may not depend on the result of another.
+        @return: The list of products, in the same order.
+        """
+        lifted = []
+        for op, x, y in products:
+            if op not in ("mul", "matmul"):
+                raise ValueError("Don't know how to fuse '{}'".format(op))
+            lifted.append((op,) + tuple(self.lift(x, y)))
+        return _fused_products(self, lifted)
+
+    @memoize
+    def dot(self, x, y, axis=None, keepdims=False):
+        """
+        Computes `reduce_sum(x * y, axis, keepdims)`, summing the untruncated
+        products and truncating once at the end. Compared to the unfused
+        expression this saves a truncation per product, only truncates the
+        (smaller) sum, and avoids accumulating one rounding error per term.
+
+        Like `matmul`, the sum is held at double scale before truncation, so
+        it must stay within the bounds of the fixedpoint configuration.
+        """
         x, y = self.lift(x, y)
-        return self.dispatch("matmul", x, y)
+        return self.dispatch("dot", x, y, axis=axis, keepdims=keepdims)
 
     def gather_bit(self, x, even):
         assert x.share_type is ShareType.BOOLEAN
@@ -1427,6 +1749,15 @@ class ABY3(Protocol):
     @memoize
     def reduce_sum(self, x, axis=None, keepdims=False):
         x = self.lift(x)
+        if isinstance(x, ABY3UntruncatedTensor):
+            axes = range(len(x.shape)) if axis is None else np.atleast_1d(axis)
+            dims = [x.shape[a] for a in axes]
+            terms = x.terms * int(np.prod(dims)) if None not in dims else None
+            if terms is not None and self._fits_untruncated(terms):
+                z = self.dispatch(
+                    "reduce_sum", x.untruncated, axis=axis, keepdims=keepdims
+                )
+                return ABY3UntruncatedTensor(self, z, x.scale, terms)
         return self.dispatch("reduce_sum", x, axis=axis, keepdims=keepdims)
 
     @memoize
@@ -1442,14 +1773,25 @@ class ABY3(Protocol):
             an assumption of the maximum plain value and will not fail if this assumption
             holds.
         """
+        if isinstance(x, ABY3UntruncatedTensor):
+            # fold the deferred truncation into this one
+            amount = (
+                self.fixedpoint_config.precision_fractional
+                if amount is None
+                else amount
+            )
+            return self.truncate(x.untruncated, method, amount + x.scale)
         return self.dispatch("truncate_" + method, x, amount)
 
     @memoize
     def truncate_msb0(self, x, method="secureq8", amount=None):
         """
-        @param method: "cheetah" or "secureq8". "secureq8" is a little more efficient.
+        @param method: "cheetah", "secureq8" or "edabit".
+            "secureq8" is a little more efficient than "cheetah".
             "cheetah" is a 3pc truncation protocol inspired by the Cheetah paper.
             "secureq8" is a 3pc truncation protocol inspired by the SequceQ8 paper.
+            "edabit" is the same protocol with the masks taken from `_gen_edabits`,
+            so that it takes a single round online.
         """
         return self.dispatch("truncate_msb0_" + method, x, amount)
 
@@ -1478,7 +1820,11 @@ class ABY3(Protocol):
         return self.dispatch("not", x)
 
     @memoize
-    def ppa(self, x, y, n_bits=None, topology="kogge_stone"):
+    def ppa(self, x, y, n_bits=None, topology="auto"):
+        """
+        @param topology: "kogge_stone", "sklansky", "brent_kung", "hybrid", or
+            "auto" to select one with `select_ppa_topology`.
+        """
         x, y = self.lift(x, y)
         return self.dispatch("ppa", x, y, n_bits, topology)
 
@@ -1516,17 +1862,26 @@ class ABY3(Protocol):
         return self.dispatch("b2a", x, nbits, method)
 
     @memoize
-    def b2a_single(self, x):
-        return self.dispatch("b2a_single", x)
+    def b2a_single(self, x, method="auto"):
+        """
+        @param method: see `mul_ab`.
+        """
+        return self.dispatch("b2a_single", x, method)
 
     @memoize
-    def mul_ab(self, x, y):
+    def mul_ab(self, x, y, method="auto"):
         """
         Callers should make sure y is boolean sharing whose backing TF native type is `tf.bool`.
         There is no automatic lifting for boolean sharing in the mixed-protocol multiplication.
+
+        @param method: "parallel_ot", "forwarded_ot", or "auto" to select one from the
+            number of elements and the `link_rtt` and `link_bandwidth` of the protocol.
+            "parallel_ot" runs two three-party OTs per bit in one round. "forwarded_ot"
+            runs one, whose receiver forwards its masked output to the helper: the sender
+            sends half as many messages, but this takes two rounds.
         """
         x = self.lift(x)
-        return self.dispatch("mul_ab", x, y)
+        return self.dispatch("mul_ab", x, y, method)
 
     @memoize
     def bit_extract(self, x, i):
@@ -1757,6 +2112,30 @@ class ABY3(Protocol):
         x, w = self.lift(x, w)
         return self.dispatch("conv2d", x, w, strides, padding)
 
+    @memoize
+    def depthwise_conv2d(self, x, w, strides, padding):
+        """
+        See tf.nn.depthwise_conv2d, with `x` in NCHW format and `w` of shape
+        `[h_filter, w_filter, in_channels, channel_multiplier]`.
+
+        Each channel is only multiplied with its own filters: the patches of
+        every channel are extracted separately and multiplied elementwise with
+        the filters, summing over the patch before a single truncation.
+        """
+        x, w = self.lift(x, w)
+        return self.dispatch("depthwise_conv2d", x, w, strides, padding)
+
+    @memoize
+    def depthwise_conv2d_backprop_filter(self, x, d_y, filter_shape, strides, padding):
+        """
+        The gradient of `depthwise_conv2d(x, w, strides, padding)` with respect
+        to `w` of shape `filter_shape`, given the gradient `d_y` of its output.
+        """
+        x, d_y = self.lift(x, d_y)
+        return self.dispatch(
+            "depthwise_conv2d_backprop_filter", x, d_y, filter_shape, strides, padding
+        )
+
     @memoize
     def expand(self, x, stride):
         """
@@ -1804,7 +2183,7 @@ class ABY3(Protocol):
             if (
                 x.share_type == ShareType.BOOLEAN
                 or y.share_type == ShareType.BOOLEAN
-                or x.backing_dtype == factories[tf.bool]
+                or x.backing_dtype.native_type == tf.bool
             ):
                 return ((x ^ y) & choice_bit) ^ x
             else:
@@ -1984,8 +2363,50 @@ class ABY3(Protocol):
         return self.dispatch("while_loop", cond, body, loop_vars)
 
     @memoize
-    def sort(self, x, axis, acc=True):
-        return self.dispatch("sort", x, axis, acc)
+    def sort(self, x, axis, acc=True, method="bitonic"):
+        """
+        @param method: "bitonic" or "shuffle". "bitonic" runs a bitonic sorting
+            network, O(n log^2 n) secure comparisons in O(log^2 n) layers.
+            "shuffle" shuffles `x` with `blinded_shuffle` and then quicksorts it
+            with revealed comparisons, O(n log n) comparisons in an expected
+            O(log n) layers. It only sorts 1-D tensors and reveals which of the
+            shuffled elements are equal.
+        """
+        return self.dispatch("sort", x, axis, acc, method)
+
+    @memoize
+    def sort_by_key(self, keys, payloads, axis=0, acc=True, method="bitonic"):
+        """
+        Sort `keys` along `axis` and apply the same permutation to each tensor
+        in `payloads`, whose shapes start with the shape of `keys`, e.g. columns
+        of a table sorted by one of them. Returns the sorted keys and the list
+        of sorted payloads.
+
+        @param method: see `sort`.
+        """
+        return self.dispatch("sort_by_key", keys, payloads, axis, acc, method)
+
+    @memoize
+    def argsort(self, x, axis, acc=True, method="bitonic"):
+        """
+        The private indices that sort `x` along `axis`, see `tf.argsort`.
+
+        @param method: see `sort`.
+        """
+        return self.dispatch("argsort", x, axis, acc, method)
+
+    @memoize
+    def top_k(self, x, k, axis=-1):
+        """
+        The `k` largest elements of `x` along `axis` in decreasing order, and
+        their private indices, see `tf.math.top_k`.
+
+        Blocks of `next_power_of_two(k)` elements are sorted with a bitonic
+        network, then merged pairwise in a tournament where each merge keeps
+        the larger half, for O(n log k) secure comparisons besides the block
+        sorts, batched over the other axes.
+        """
+        return self.dispatch("top_k", x, k, axis)
 
     @memoize
     def zeros(
@@ -2002,23 +2423,14 @@ class ABY3(Protocol):
 
     def dispatch(self, base_name, *args, container=None, **kwargs):
         """
-        Finds the correct protocol logicto perform based on the dispatch_id
+        Finds the correct protocol logic to perform based on the dispatch_id
         attribute of the input tensors in args.
         """
-        suffix = "_".join(
-            [arg.dispatch_id for arg in args if hasattr(arg, "dispatch_id")]
-        )
-        func_name = "_{}_{}".format(base_name, suffix)
-
         if container is None:
             container = _THISMODULE
 
-        func = getattr(container, func_name, None)
-        if func is not None:
-            return func(self, *args, **kwargs)  # pylint: disable=not-callable
-        raise TypeError(
-            ("Don't know how to {}: {}").format(base_name, [type(arg) for arg in args])
-        )
+        func = dispatch_table(container).resolve(base_name, args)
+        return func(self, *args, **kwargs)  # pylint: disable=not-callable
 
 
 #
@@ -2409,7 +2821,7 @@ def _mul_public_private(prot, x, y):
             z[2][1] = shares[2][1] * x_on_2
 
         z = ABY3PrivateTensor(prot, z, x.is_scaled or y.is_scaled, y.share_type)
-        z = prot.truncate(z) if x.is_scaled and y.is_scaled else z
+        z = prot._truncate_product(z) if x.is_scaled and y.is_scaled else z
         return z
 
 
@@ -2436,7 +2848,7 @@ def _mul_private_public(prot, x, y):
             z[2][1] = shares[2][1] * y_on_2
 
         z = ABY3PrivateTensor(prot, z, x.is_scaled or y.is_scaled, x.share_type)
-        z = prot.truncate(z) if x.is_scaled and y.is_scaled else z
+        z = prot._truncate_product(z) if x.is_scaled and y.is_scaled else z
         return z
 
 
@@ -2485,6 +2897,164 @@ def _mul_private_private(prot, x, y):
             z[2][1] = z0.identity()
 
         z = ABY3PrivateTensor(prot, z, x.is_scaled or y.is_scaled, x.share_type)
+        z = prot._truncate_product(z) if x.is_scaled and y.is_scaled else z
+        return z
+
+
+def _fused_products(prot, products):
+    def fusable(x, y):
+        return (
+            isinstance(x, ABY3PrivateTensor)
+            and isinstance(y, ABY3PrivateTensor)
+            and x.is_arithmetic()
+            and y.is_arithmetic()
+            and x.backing_dtype == y.backing_dtype
+            and x.backing_dtype.native_type != tf.bool
+        )
+
+    results = [None] * len(products)
+
+    # products are fused when their results share a factory and a scale
+    groups = OrderedDict()
+    for i, (op, x, y) in enumerate(products):
+        if not fusable(x, y):
+            results[i] = prot.mul(x, y) if op == "mul" else prot.matmul(x, y)
+            continue
+        key = (x.backing_dtype, x.is_scaled or y.is_scaled, x.is_scaled and y.is_scaled)
+        groups.setdefault(key, []).append(i)
+
+    with tf.name_scope("fused-products"):
+        for (factory, is_scaled, truncate), indices in groups.items():
+            z = [[], [], []]
+            for i in indices:
+                op, x, y = products[i]
+                x_shares = x.unwrapped
+                y_shares = y.unwrapped
+                for j in range(3):
+                    with tf.device(prot.servers[j].device_name):
+                        if op == "mul":
+                            zj = (
+                                x_shares[j][0] * y_shares[j][0]
+                                + x_shares[j][0] * y_shares[j][1]
+                                + x_shares[j][1] * y_shares[j][0]
+                            )
+                        else:
+                            zj = (
+                                x_shares[j][0].matmul(y_shares[j][0])
+                                + x_shares[j][0].matmul(y_shares[j][1])
+                                + x_shares[j][1].matmul(y_shares[j][0])
+                            )
+                        z[j].append(zj)
+
+            shapes = [zi.shape for zi in z[0]]
+            sizes = [shape.num_elements() for shape in shapes]
+            a = prot._gen_zero_sharing([sum(sizes)], factory=factory)
+            for j in range(3):
+                with tf.device(prot.servers[j].device_name):
+                    flat = [zj.reshape([-1]) for zj in z[j]]
+                    z[j] = factory.concat(flat, axis=0) if len(flat) > 1 else flat[0]
+                    z[j] = z[j] + a[j]
+
+            # Re-sharing
+            shares = [[None, None], [None, None], [None, None]]
+            for j in range(3):
+                with tf.device(prot.servers[j].device_name):
+                    shares[j][0] = z[j]
+                    shares[j][1] = z[(j + 1) % 3].identity()
+            zs = ABY3PrivateTensor(prot, shares, is_scaled, ShareType.ARITHMETIC)
+            zs = prot.truncate(zs) if truncate else zs
+
+            zs = prot.split(zs, sizes, axis=0) if len(indices) > 1 else [zs]
+            for i, zi, shape in zip(indices, zs, shapes):
+                results[i] = prot.reshape(zi, shape.as_list())
+
+    return results
+
+
+#
+# dot helpers
+#
+
+
+def _dot_public_public(prot, x, y, axis=None, keepdims=False):
+    assert isinstance(x, ABY3PublicTensor), type(x)
+    assert isinstance(y, ABY3PublicTensor), type(y)
+
+    x_on = x.unwrapped
+    y_on = y.unwrapped
+
+    z = [None, None, None]
+    with tf.name_scope("dot"):
+        for i in range(3):
+            with tf.device(prot.servers[i].device_name):
+                z[i] = (x_on[i] * y_on[i]).reduce_sum(axis, keepdims)
+
+        z = ABY3PublicTensor(prot, z, x.is_scaled or y.is_scaled)
+        z = prot.truncate(z, method="local") if x.is_scaled and y.is_scaled else z
+        return z
+
+
+def _dot_public_private(prot, x, y, axis=None, keepdims=False):
+    return _dot_private_public(prot, y, x, axis=axis, keepdims=keepdims)
+
+
+def _dot_private_public(prot, x, y, axis=None, keepdims=False):
+    assert isinstance(x, ABY3PrivateTensor), type(x)
+    assert isinstance(y, ABY3PublicTensor), type(y)
+
+    if not x.is_arithmetic():
+        return prot.reduce_sum(prot.mul(x, y), axis=axis, keepdims=keepdims)
+
+    shares = x.unwrapped
+    y_on = y.unwrapped
+
+    z = [[None, None], [None, None], [None, None]]
+    with tf.name_scope("dot"):
+        for i in range(3):
+            with tf.device(prot.servers[i].device_name):
+                z[i][0] = (shares[i][0] * y_on[i]).reduce_sum(axis, keepdims)
+                z[i][1] = (shares[i][1] * y_on[i]).reduce_sum(axis, keepdims)
+
+        z = ABY3PrivateTensor(prot, z, x.is_scaled or y.is_scaled, x.share_type)
+        z = prot.truncate(z) if x.is_scaled and y.is_scaled else z
+        return z
+
+
+def _dot_private_private(prot, x, y, axis=None, keepdims=False):
+    assert isinstance(x, ABY3PrivateTensor), type(x)
+    assert isinstance(y, ABY3PrivateTensor), type(y)
+
+    if not (x.is_arithmetic() and y.is_arithmetic()):
+        return prot.reduce_sum(prot.mul(x, y), axis=axis, keepdims=keepdims)
+
+    x_shares = x.unwrapped
+    y_shares = y.unwrapped
+
+    with tf.name_scope("dot"):
+        # local products are summed before adding the zero sharing, so only
+        # the reduced tensor is reshared
+        z = [None, None, None]
+        for i in range(3):
+            with tf.device(prot.servers[i].device_name):
+                z[i] = (
+                    x_shares[i][0] * y_shares[i][0]
+                    + x_shares[i][0] * y_shares[i][1]
+                    + x_shares[i][1] * y_shares[i][0]
+                ).reduce_sum(axis, keepdims)
+
+        a = prot._gen_zero_sharing(z[0].shape, factory=x.backing_dtype)
+        for i in range(3):
+            with tf.device(prot.servers[i].device_name):
+                z[i] = z[i] + a[i]
+
+        # Re-sharing
+        shares = [[None, None], [None, None], [None, None]]
+        for i in range(3):
+            with tf.device(prot.servers[i].device_name):
+                shares[i][0] = z[i]
+                shares[i][1] = z[(i + 1) % 3].identity()
+
+        z = ABY3PrivateTensor(prot, shares, x.is_scaled or y.is_scaled, x.share_type)
         z = prot.truncate(z) if x.is_scaled and y.is_scaled else z
         return z
 
@@ -2562,10 +3132,13 @@ def _mul_trunc2_private_private(prot, x, y):
         return z
 
 
-def _matmul_public_private(prot, x, y):
+def _matmul_public_private(prot, x, y, transpose_a=False, transpose_b=False):
     assert isinstance(x, ABY3PublicTensor), type(x)
     assert isinstance(y, ABY3PrivateTensor), type(y)
 
+    def matmul(a, b):
+        return a.matmul(b, transpose_a=transpose_a, transpose_b=transpose_b)
+
     x_on_0, x_on_1, x_on_2 = x.unwrapped
     shares = y.unwrapped
 
@@ -2573,26 +3146,29 @@ def _matmul_public_private(prot, x, y):
     with tf.name_scope("matmul"):
 
         with tf.device(prot.servers[0].device_name):
-            z[0][0] = x_on_0.matmul(shares[0][0])
-            z[0][1] = x_on_0.matmul(shares[0][1])
+            z[0][0] = matmul(x_on_0, shares[0][0])
+            z[0][1] = matmul(x_on_0, shares[0][1])
 
         with tf.device(prot.servers[1].device_name):
-            z[1][0] = x_on_1.matmul(shares[1][0])
-            z[1][1] = x_on_1.matmul(shares[1][1])
+            z[1][0] = matmul(x_on_1, shares[1][0])
+            z[1][1] = matmul(x_on_1, shares[1][1])
 
         with tf.device(prot.servers[2].device_name):
-            z[2][0] = x_on_2.matmul(shares[2][0])
-            z[2][1] = x_on_2.matmul(shares[2][1])
+            z[2][0] = matmul(x_on_2, shares[2][0])
+            z[2][1] = matmul(x_on_2, shares[2][1])
 
         z = ABY3PrivateTensor(prot, z, x.is_scaled or y.is_scaled, y.share_type)
         z = prot.truncate(z) if x.is_scaled and y.is_scaled else z
         return z
 
 
-def _matmul_private_public(prot, x, y):
+def _matmul_private_public(prot, x, y, transpose_a=False, transpose_b=False):
     assert isinstance(x, ABY3PrivateTensor), type(x)
     assert isinstance(y, ABY3PublicTensor), type(y)
 
+    def matmul(a, b):
+        return a.matmul(b, transpose_a=transpose_a, transpose_b=transpose_b)
+
     shares = x.unwrapped
     y_on_0, y_on_1, y_on_2 = y.unwrapped
 
@@ -2600,32 +3176,37 @@ def _matmul_private_public(prot, x, y):
     with tf.name_scope("matmul"):
 
         with tf.device(prot.servers[0].device_name):
-            z[0][0] = shares[0][0].matmul(y_on_0)
-            z[0][1] = shares[0][1].matmul(y_on_0)
+            z[0][0] = matmul(shares[0][0], y_on_0)
+            z[0][1] = matmul(shares[0][1], y_on_0)
 
         with tf.device(prot.servers[1].device_name):
-            z[1][0] = shares[1][0].matmul(y_on_1)
-            z[1][1] = shares[1][1].matmul(y_on_1)
+            z[1][0] = matmul(shares[1][0], y_on_1)
+            z[1][1] = matmul(shares[1][1], y_on_1)
 
         with tf.device(prot.servers[2].device_name):
-            z[2][0] = shares[2][0].matmul(y_on_2)
-            z[2][1] = shares[2][1].matmul(y_on_2)
+            z[2][0] = matmul(shares[2][0], y_on_2)
+            z[2][1] = matmul(shares[2][1], y_on_2)
 
         z = ABY3PrivateTensor(prot, z, x.is_scaled or y.is_scaled, x.share_type)
         z = prot.truncate(z) if x.is_scaled and y.is_scaled else z
         return z
 
 
-def _matmul_private_private(prot, x, y):
+def _matmul_private_private(prot, x, y, transpose_a=False, transpose_b=False):
     assert isinstance(x, ABY3PrivateTensor), type(x)
     assert isinstance(y, ABY3PrivateTensor), type(y)
 
+    def matmul(a, b):
+        return a.matmul(b, transpose_a=transpose_a, transpose_b=transpose_b)
+
     x_shares = x.unwrapped
     y_shares = y.unwrapped
 
     # Tensorflow supports matmul for more than 2 dimensions,
     # with the inner-most 2 dimensions specifying the 2-D matrix multiplication
-    result_shape = tf.TensorShape((*x.shape[:-1], y.shape[-1]))
+    rows = x.shape[-1] if transpose_a else x.shape[-2]
+    cols = y.shape[-2] if transpose_b else y.shape[-1]
+    result_shape = tf.TensorShape((*x.shape[:-2], rows, cols))
 
     z = [[None, None], [None, None], [None, None]]
     with tf.name_scope("matmul"):
@@ -2633,25 +3214,25 @@ def _matmul_private_private(prot, x, y):
 
         with tf.device(prot.servers[0].device_name):
             z0 = (
-                x_shares[0][0].matmul(y_shares[0][0])
-                + x_shares[0][0].matmul(y_shares[0][1])
-                + x_shares[0][1].matmul(y_shares[0][0])
+                matmul(x_shares[0][0], y_shares[0][0])
+                + matmul(x_shares[0][0], y_shares[0][1])
+                + matmul(x_shares[0][1], y_shares[0][0])
                 + a0
             )
 
         with tf.device(prot.servers[1].device_name):
             z1 = (
-                x_shares[1][0].matmul(y_shares[1][0])
-                + x_shares[1][0].matmul(y_shares[1][1])
-                + x_shares[1][1].matmul(y_shares[1][0])
+                matmul(x_shares[1][0], y_shares[1][0])
+                + matmul(x_shares[1][0], y_shares[1][1])
+                + matmul(x_shares[1][1], y_shares[1][0])
                 + a1
             )
 
         with tf.device(prot.servers[2].device_name):
             z2 = (
-                x_shares[2][0].matmul(y_shares[2][0])
-                + x_shares[2][0].matmul(y_shares[2][1])
-                + x_shares[2][1].matmul(y_shares[2][0])
+                matmul(x_shares[2][0], y_shares[2][0])
+                + matmul(x_shares[2][0], y_shares[2][1])
+                + matmul(x_shares[2][1], y_shares[2][0])
                 + a2
             )
         # Re-sharing
@@ -2684,7 +3265,8 @@ def _truncate_heuristic_private(
 
         heuristic_bound_bits = x.backing_dtype.nbits - 2
         y = x + (1 << (heuristic_bound_bits - scale))  # Lifted to make msb 0
-        z = prot.truncate_msb0(y, method="secureq8", amount=amount)
+        method = "edabit" if prot.edabits else "secureq8"
+        z = prot.truncate_msb0(y, method=method, amount=amount)
         z = z - (
             1 << (heuristic_bound_bits - (scale + amount))
         )  # Reverse the effect of lifting
@@ -2766,7 +3348,7 @@ def _truncate_msb0_cheetah_private(
 ) -> ABY3PrivateTensor:
     assert x.share_type == ShareType.ARITHMETIC, x.share_type
 
-    bfactory = factories[tf.bool]
+    bfactory = prot.bool_factory
 
     if amount is None:
         amount = prot.fixedpoint_config.precision_fractional
@@ -2848,6 +3430,42 @@ def _truncate_msb0_cheetah_private(
     return z
 
 
+def _truncate_msb0_edabit_private(
+    prot: ABY3, x: ABY3PrivateTensor, amount
+) -> ABY3PrivateTensor:
+
+    assert isinstance(x, ABY3PrivateTensor), type(x)
+    assert x.share_type == ShareType.ARITHMETIC, x.share_type
+
+    with tf.name_scope("trunc-msb0-edabit"):
+
+        if amount is None:
+            amount = prot.fixedpoint_config.precision_fractional
+        nbits = x.backing_dtype.nbits
+        mod_mask = (1 << (nbits - amount - 1)) - 1
+
+        r, r_msb, s = prot._gen_edabits(x.shape, x.backing_dtype, amount)
+        c = prot.reveal(x + r).unwrapped
+
+        # As in secureq8, y = c' - s + (c_msb XOR r_msb) * 2^(l-f-1), where
+        # c' = (c >> f) mod 2^(l-f-1) and s = (r mod 2^(l-1)) >> f. The XOR
+        # is linear in r_msb since c_msb is public.
+        r_msb, s = r_msb.unwrapped, s.unwrapped
+        y = [[None, None], [None, None], [None, None]]
+        for i in range(3):
+            with tf.device(prot.servers[i].device_name):
+                c_prime = (c[i] >> amount) & mod_mask
+                c_msb = c[i].logical_rshift(nbits - 1)
+                for j in range(2):
+                    y[i][j] = r_msb[i][j] * ((1 - c_msb * 2) * (mod_mask + 1))
+                    y[i][j] = y[i][j] - s[i][j]
+                    if (i + j) % 3 == 0:
+                        y[i][j] = y[i][j] + c_prime + c_msb * (mod_mask + 1)
+
+        y = ABY3PrivateTensor(prot, y, x.is_scaled, ShareType.ARITHMETIC)
+    return y
+
+
 def _truncate_msb0_secureq8_private(
     prot: ABY3, x: ABY3PrivateTensor, amount
 ) -> ABY3PrivateTensor:
@@ -2858,7 +3476,7 @@ def _truncate_msb0_secureq8_private(
     with tf.name_scope("trunc-msb0-secureq8"):
 
         ifactory = x.backing_dtype
-        bfactory = factories[tf.bool]
+        bfactory = prot.bool_factory
 
         if amount is None:
             amount = prot.fixedpoint_config.precision_fractional
@@ -3334,21 +3952,35 @@ def _b_sub_private_private(prot, x, y):
     )
 
 
-def _ppa_private_private(prot, x, y, n_bits, topology="kogge_stone"):
+def _ppa_private_private(prot, x, y, n_bits, topology="auto"):
     """
     Parallel prefix adder (PPA). This adder can be used for addition of boolean sharings.
 
     `n_bits` can be passed as an optimization to constrain the computation for least significant
     `n_bits` bits.
 
-    AND Depth: log(k)
-    Total gates: klog(k)
+    See `ppa_cost` for the rounds, AND gates and bytes of each topology. With
+    `topology="auto"`, the topology is selected from the number of elements and
+    the `link_rtt` and `link_bandwidth` of the protocol.
     """
 
+    if topology == "auto":
+        topology = select_ppa_topology(
+            x.shape.num_elements(),
+            n_bits,
+            x.backing_dtype.nbits,
+            rtt=prot.link_rtt,
+            bandwidth=prot.link_bandwidth,
+        )
+
     if topology == "kogge_stone":
         return _ppa_kogge_stone_private_private(prot, x, y, n_bits)
     elif topology == "sklansky":
         return _ppa_sklansky_private_private(prot, x, y, n_bits)
+    elif topology == "brent_kung":
+        return _ppa_sparse_private_private(prot, x, y, n_bits, 1)
+    elif topology == "hybrid":
+        return _ppa_sparse_private_private(prot, x, y, n_bits, HYBRID_DENSE_WIDTH)
     else:
         raise NotImplementedError("Unknown adder topology.")
 
@@ -3535,6 +4167,153 @@ def _ppa_kogge_stone_private_private(prot, x, y, n_bits):
     return z
 
 
+def _ppa_sparse_private_private(prot, x, y, n_bits, dense_width):
+    """
+    Parallel prefix adder (PPA), using a sparse tree topology.
+
+    The generate and propagate bits of neighbouring positions are combined and
+    gathered into words of half the width until they fit in `dense_width` bits,
+    where the Kogge-Stone topology is used. The carries of the remaining
+    positions are then computed on the way back up. This costs one more round
+    per level of the tree than Kogge-Stone, but most ANDs are on short words.
+    `dense_width=1` gives the Brent-Kung topology.
+    """
+
+    assert isinstance(x, ABY3PrivateTensor), type(x)
+    assert isinstance(y, ABY3PrivateTensor), type(y)
+    assert x.backing_dtype == y.backing_dtype
+
+    if x.backing_dtype.native_type != tf.int64 or x.backing_dtype.nbits != 64:
+        raise NotImplementedError(
+            "Backing type {} not supported".format(x.backing_dtype)
+        )
+
+    with tf.name_scope("ppa"):
+        nbits = x.backing_dtype.nbits
+        k = nbits if n_bits is None else next_power_of_two(n_bits)
+        xk, yk = x, y
+        if k != nbits:
+            xk = x.cast(factories[k])
+            yk = y.cast(factories[k])
+
+        G = _ppa_sparse_prefix(prot, xk & yk, xk ^ yk, k, dense_width)
+        if k != nbits:
+            G = G.cast(x.backing_dtype)
+
+        # G stores the carry-in to the next position
+        C = G << 1
+        P = x ^ y
+        z = C ^ P
+
+        if n_bits is not None and n_bits < nbits:
+            mask = prot.define_constant(
+                np.array((1 << n_bits) - 1).astype(np.int64), apply_scaling=False
+            )
+            z = z & mask
+    return z
+
+
+def _ppa_sparse_prefix(prot, G, P, k, dense_width):
+    """
+    Carries out of the `k` least significant positions, given their generate
+    and propagate bits in words of `factories[k]`. Higher bits are ignored.
+    """
+    if k <= dense_width:
+        return _ppa_dense_prefix(prot, G, P, k)
+
+    half = k // 2
+    Gs = _deinterleave_bits(prot, G, half)
+    Ps = _deinterleave_bits(prot, P, half)
+
+    # combine each odd position with the even position below it
+    G_pairs = Gs[1] ^ (Ps[1] & Gs[0])
+    P_pairs = Ps[1] & Ps[0] if half > 1 else None
+    C_odd = _ppa_sparse_prefix(prot, G_pairs, P_pairs, half, dense_width)
+
+    # the carry into an even position is the carry out of the odd one below it
+    C_even = Gs[0]
+    if half > 1:
+        C_even = C_even ^ (Ps[0] & (C_odd << 1))
+
+    return _interleave_bits(prot, C_even, C_odd, half)
+
+
+def _ppa_dense_prefix(prot, G, P, k):
+    """
+    Kogge-Stone prefix computation on the `k` least significant bits of words,
+    see `_ppa_kogge_stone_private_private`.
+    """
+    levels = ceil(log2(k))
+    for i in range(levels):
+        G1 = G << (2**i)
+        if i < levels - 1:
+            k_mask = prot.define_constant(
+                (1 << (2**i)) - 1, apply_scaling=False, factory=P.backing_dtype
+            )
+            P1 = (P << (2**i)) ^ k_mask
+            G, P = G ^ (P & G1), P & P1
+        else:
+            G = G ^ (P & G1)
+    return G
+
+
+def _bit_block_mask(width, nbits):
+    """Mask of the blocks of `width` bits at the even multiples of `width`."""
+    return sum(1 << i for i in range(nbits) if (i // width) % 2 == 0)
+
+
+def _deinterleave_bits(prot, x, width):
+    """
+    Gather the even and the odd bits among the `2 * width` least significant
+    bits of `x` into words of `factories[width]`. This is local, and computes
+    the same as `bit_split_and_gather(x, 2)` with shifts and masks.
+    """
+    factory = x.backing_dtype
+    masks = [
+        prot.define_constant(
+            _bit_block_mask(2**i, factory.nbits), apply_scaling=False, factory=factory
+        )
+        for i in range(ceil(log2(2 * width)))
+    ]
+
+    def compact(x):
+        # the masks keep the words non-negative, so `>>` shifts in zeros
+        x = x & masks[0]
+        for i in range(1, len(masks)):
+            s = 2 ** (i - 1)
+            x = (x ^ (x >> s)) & masks[i]
+        return x.cast(factories[width])
+
+    return compact(x), compact(x >> 1)
+
+
+def _interleave_bits(prot, even, odd, width):
+    """
+    Interleave the `width` least significant bits of `even` and `odd` into
+    words of `factories[2 * width]`, with the bits of `even` at the even
+    positions. This is local: the bits are spread out with shifts and masks.
+    """
+    factory = factories[2 * width]
+    low = prot.define_constant((1 << width) - 1, apply_scaling=False, factory=factory)
+    masks = [
+        prot.define_constant(
+            _bit_block_mask(2**i, factory.nbits), apply_scaling=False, factory=factory
+        )
+        for i in range(ceil(log2(2 * width)))
+    ]
+
+    def spread(x):
+        if x.backing_dtype != factory:
+            x = x.cast(factory)
+        x = x & low
+        for i in reversed(range(len(masks) - 1)):
+            s = 2**i
+            x = (x ^ (x << s)) & masks[i]
+        return x
+
+    return spread(even) ^ (spread(odd) << 1)
+
+
 def _carry_private_public(prot, x, y, pos=None):
     assert x.share_type == ShareType.BOOLEAN, x.share_type
     return _carry_computation(prot, x, y, pos)
@@ -3574,19 +4353,25 @@ def _carry_computation(prot, x, y, pos=None):
             x = x.cast(factories[k])
             y = y.cast(factories[k])
 
-        G = x & y
-        P = x ^ y
-        while k > 1:
-            Gs = prot.bit_split_and_gather(G, 2).cast(factories[k // 2])
-            Ps = prot.bit_split_and_gather(P, 2).cast(factories[k // 2])
-            G = Gs[1] ^ (Gs[0] & Ps[1])
-            P = Ps[0] & Ps[1]
-            k = k // 2
+        return _carry_tree(prot, x & y, x ^ y, k)
 
-        # G stores the carry-in to the next position
-        G = G & prot.define_constant(1, apply_scaling=False, factory=G.backing_dtype)
-        G.is_scaled = False
-        return G
+
+def _carry_tree(prot, G, P, k):
+    """
+    Kogge-Stone tree combining the generate bits `G` and propagate bits `P` of
+    words of `k` bits into the carry out of the most significant bit.
+    """
+    while k > 1:
+        Gs = prot.bit_split_and_gather(G, 2).cast(factories[k // 2])
+        Ps = prot.bit_split_and_gather(P, 2).cast(factories[k // 2])
+        G = Gs[1] ^ (Gs[0] & Ps[1])
+        P = Ps[0] & Ps[1]
+        k = k // 2
+
+    # G stores the carry-in to the next position
+    G = G & prot.define_constant(1, apply_scaling=False, factory=G.backing_dtype)
+    G.is_scaled = False
+    return G
 
 
 def _while_loop_(prot, cond, body, loop_vars):
@@ -3835,7 +4620,10 @@ def _bit_extract_private(prot, x, i):
 
         if x.share_type == ShareType.BOOLEAN:
             z = (x >> i) & mask
-            z = z.cast(factories[tf.bool])
+            z = z.cast(prot.bool_factory)
+
+        elif x.share_type == ShareType.ARITHMETIC and prot.edabits:
+            z = _bit_extract_edabit_private(prot, x, i)
 
         elif x.share_type == ShareType.ARITHMETIC:
             x_shares = x.unwrapped
@@ -3879,13 +4667,51 @@ def _bit_extract_private(prot, x, i):
             # Step 2: Carry circuit that requires log(i+1) rounds of communication
             carry = prot.carry(operand1, operand2, pos=i - 1)
             P = (((operand1 ^ operand2) >> i) & mask).cast(carry.backing_dtype)
-            z = (carry ^ P).cast(factories[tf.bool])
+            z = (carry ^ P).cast(prot.bool_factory)
 
         z.is_scaled = False
 
     return z
 
 
+def _bit_extract_edabit_private(prot, x, i):
+    """
+    Bit extraction from an arithmetic sharing with an edabit `r`: the `i`-th
+    bit of x = c - r = c + ~r + 1 is computed with the carry circuit on the
+    public c = x + r and the boolean sharing of ~r. The generate and propagate
+    bits are then local, which saves the resharing of x and the first AND.
+    """
+    factory = x.backing_dtype
+    with tf.name_scope("bit_extract_edabit"):
+        r, r_bits = prot._gen_edabits(x.shape, factory)
+        c = prot.reveal(x + r)
+        c = ABY3PublicTensor(prot, c.unwrapped, False)
+
+        ones = prot.define_constant(-1, apply_scaling=False, factory=factory)
+        mask = prot.define_constant(1, apply_scaling=False, factory=factory)
+        G = (r_bits & c) ^ c
+        P = r_bits ^ c ^ ones
+        if i == 0:
+            # the carry-in of 1 is the only carry into the least significant bit
+            z = (P & mask) ^ mask
+            return z.cast(prot.bool_factory)
+
+        # the carry-in of 1 generates a carry wherever the first bit propagates
+        G = G ^ (P & mask)
+        H = P
+        k = next_power_of_two(i)
+        if k != i:
+            G = G << (k - i)
+            P = P << (k - i)
+        if k != factory.nbits:
+            G = G.cast(factories[k])
+            P = P.cast(factories[k])
+        carry = _carry_tree(prot, G, P, k)
+
+        z = ((H >> i) & mask).cast(carry.backing_dtype) ^ carry
+        return z.cast(prot.bool_factory)
+
+
 def _msb_private(prot, x):
 
     with tf.name_scope("msb"):
@@ -3973,17 +4799,15 @@ def _b2a_private(prot, x, nbits, method="ppa"):
     return result
 
 
-def _b2a_single_private(prot, x):
+def _b2a_single_private(prot, x, method="auto"):
     assert x.share_type == ShareType.BOOLEAN
-    assert x.backing_dtype == factories[tf.bool]
-
-    # TODO: this can be improved with 3pc COT
+    assert x.backing_dtype.native_type == tf.bool
 
     a = prot.define_constant(np.ones(x.shape), apply_scaling=False)
-    return _mul_ab_public_private(prot, a, x)
+    return _mul_ab_public_private(prot, a, x, method)
 
 
-def _mul_ab_public_private(prot, x, y):
+def _mul_ab_public_private(prot, x, y, method="auto"):
     assert isinstance(x, ABY3PublicTensor), type(x)
     assert isinstance(y, ABY3PrivateTensor), type(x)
     assert y.is_boolean(), y.share_type
@@ -3991,13 +4815,13 @@ def _mul_ab_public_private(prot, x, y):
     x_on_0, x_on_1, x_on_2 = x.unwrapped
 
     with tf.name_scope("mul_ab"):
-        z = __mul_ab_routine(prot, x_on_2, y, 2)
+        z = __mul_ab_routine(prot, x_on_2, y, 2, method)
         z = ABY3PrivateTensor(prot, z, x.is_scaled, ShareType.ARITHMETIC)
 
     return z
 
 
-def _mul_ab_private_private(prot, x, y):
+def _mul_ab_private_private(prot, x, y, method="auto"):
     assert isinstance(x, ABY3PrivateTensor), type(x)
     assert isinstance(y, ABY3PrivateTensor), type(y)
     assert x.is_arithmetic(), x.share_type
@@ -4007,20 +4831,37 @@ def _mul_ab_private_private(prot, x, y):
 
     with tf.name_scope("mul_ab"):
         with tf.name_scope("term0"):
-            w = __mul_ab_routine(prot, x_shares[0][0], y, 0)
+            w = __mul_ab_routine(prot, x_shares[0][0], y, 0, method)
             w = ABY3PrivateTensor(prot, w, x.is_scaled, ShareType.ARITHMETIC)
 
         with tf.name_scope("term1"):
             with tf.device(prot.servers[1].device_name):
                 a = x_shares[1][0] + x_shares[1][1]
-            z = __mul_ab_routine(prot, a, y, 1)
+            z = __mul_ab_routine(prot, a, y, 1, method)
             z = ABY3PrivateTensor(prot, z, x.is_scaled, ShareType.ARITHMETIC)
         z = w + z
 
     return z
 
 
-def __mul_ab_routine(prot, a, b, sender_idx):
+def _select_mul_ab_method(prot, size, factory):
+    """
+    The OT method of `__mul_ab_routine` that is the fastest for `size` elements
+    of `factory` over the links of the protocol, estimated as `rounds * rtt`
+    plus the bytes sent by the sender divided by the bandwidth. Two parallel
+    OTs take one round and the sender sends four messages per element, a
+    forwarded OT two rounds and two messages.
+    """
+    rtt, bandwidth = prot.link_rtt, prot.link_bandwidth
+    if size is None or rtt is None or bandwidth is None:
+        return "parallel_ot"
+    message = size * factory.nbits / 8 / bandwidth
+    if 2 * rtt + 2 * message < rtt + 4 * message:
+        return "forwarded_ot"
+    return "parallel_ot"
+
+
+def __mul_ab_routine(prot, a, b, sender_idx, method="auto"):
     """
     A sub routine for multiplying a value 'a' (located at servers[sender_idx]) with a boolean sharing 'b'.
     """
@@ -4028,6 +4869,10 @@ def __mul_ab_routine(prot, a, b, sender_idx):
     assert isinstance(b, ABY3PrivateTensor), type(b)
 
     shape = tf.broadcast_static_shape(a.shape, b.shape).as_list()
+    if method == "auto":
+        method = _select_mul_ab_method(prot, int(np.prod(shape)), a.factory)
+    if method not in ("parallel_ot", "forwarded_ot"):
+        raise ValueError("Unknown OT method: {}".format(method))
 
     with tf.name_scope("__mul_ab_routine"):
         b_shares = b.unwrapped
@@ -4045,9 +4890,8 @@ def __mul_ab_routine(prot, a, b, sender_idx):
             m0 = tmp + s[idx0]
             m1 = -tmp + a + s[idx0]
 
-        with tf.device(prot.servers[idx1].device_name):
-            z[idx1][0] = s[idx1]
-            z[idx1][1] = prot._ot(
+        if method == "forwarded_ot":
+            m_c_on_1, m_c_on_2 = prot._forwarded_ot(
                 prot.servers[idx0],
                 prot.servers[idx1],
                 prot.servers[idx2],
@@ -4059,21 +4903,40 @@ def __mul_ab_routine(prot, a, b, sender_idx):
                 prot.pairwise_keys()[idx2][1],
                 prot.pairwise_nonces()[idx2],
             )
-
-        with tf.device(prot.servers[idx2].device_name):
-            z[idx2][0] = prot._ot(
-                prot.servers[idx0],
-                prot.servers[idx2],
-                prot.servers[idx1],
-                m0,
-                m1,
-                b_shares[idx2][0],
-                b_shares[idx1][1],
-                prot.pairwise_keys()[idx0][1],
-                prot.pairwise_keys()[idx1][0],
-                prot.pairwise_nonces()[idx0],
-            )
+            z[idx1][0] = s[idx1]
+            z[idx1][1] = m_c_on_1
+            z[idx2][0] = m_c_on_2
             z[idx2][1] = s[idx2]
+        else:
+            with tf.device(prot.servers[idx1].device_name):
+                z[idx1][0] = s[idx1]
+                z[idx1][1] = prot._ot(
+                    prot.servers[idx0],
+                    prot.servers[idx1],
+                    prot.servers[idx2],
+                    m0,
+                    m1,
+                    b_shares[idx1][1],
+                    b_shares[idx2][0],
+                    prot.pairwise_keys()[idx0][0],
+                    prot.pairwise_keys()[idx2][1],
+                    prot.pairwise_nonces()[idx2],
+                )
+
+            with tf.device(prot.servers[idx2].device_name):
+                z[idx2][0] = prot._ot(
+                    prot.servers[idx0],
+                    prot.servers[idx2],
+                    prot.servers[idx1],
+                    m0,
+                    m1,
+                    b_shares[idx2][0],
+                    b_shares[idx1][1],
+                    prot.pairwise_keys()[idx0][1],
+                    prot.pairwise_keys()[idx1][0],
+                    prot.pairwise_nonces()[idx0],
+                )
+                z[idx2][1] = s[idx2]
 
         prot._update_pairwise_nonces()
 
@@ -4106,6 +4969,7 @@ def _polynomial_private(prot, x, coeffs):
 
     with tf.name_scope("polynomial"):
         result = prot.define_constant(np.zeros(x.shape), apply_scaling=x.is_scaled)
+        fractional = []
         for i in range(len(coeffs)):
             if i == 0:
                 result = result + coeffs[i]
@@ -4118,8 +4982,20 @@ def _polynomial_private(prot, x, coeffs):
                 tmp = tmp * (x**i)
                 result = result + tmp
             else:
-                tmp = coeffs[i] * (x**i)
-                result = result + tmp
+                fractional.append(i)
+
+        if len(fractional) == 1:
+            i = fractional[0]
+            result = result + coeffs[i] * (x**i)
+        elif len(fractional) > 1:
+            # Optimization when several coefficients are fractional: the terms
+            # are summed as a dot product and truncated once
+            powers = prot.stack([x**i for i in fractional], axis=0)
+            weights = prot.define_constant(
+                np.reshape([coeffs[i] for i in fractional], [-1] + [1] * len(x.shape)),
+                factory=x.backing_dtype,
+            )
+            result = result + prot.dot(powers, weights, axis=0)
     return result
 
 
@@ -4927,68 +5803,94 @@ def _im2col_private(
     return ABY3PrivateTensor(prot, z, x.is_scaled, x.share_type)
 
 
-def _conv2d_public_private(prot, x, w, strides, padding):
-
-    xs = x.unwrapped
-    ws = w.unwrapped
+def _conv2d(prot, x, w, strides, padding):
+    """
+    Convolution as a matrix multiplication of the filters with the patches of
+    `x`. Patches are memoized, so the backward pass of a layer can multiply
+    the gradient with the same ones instead of extracting them again.
+    """
+    n_x, _, h_x, w_x = x.shape.as_list()
+    h_filter, w_filter, _, out_filters = w.shape.as_list()
+    h_out, w_out = out_size([h_x, w_x], [h_filter, w_filter], strides, padding)
 
     with tf.name_scope("conv2d"):
-        z = [[None, None], [None, None], [None, None]]
-        for i in range(3):
-            with tf.device(prot.servers[i].device_name):
-                z[i][0] = xs[i].conv2d(ws[i][0], strides, padding)
-                z[i][1] = xs[i].conv2d(ws[i][1], strides, padding)
+        x_col = prot.im2col(x, h_filter, w_filter, strides, padding)
+        w_col = prot.reshape(prot.transpose(w, perm=[3, 2, 0, 1]), [out_filters, -1])
+        y = prot.matmul(w_col, x_col)
+        y = prot.reshape(y, [out_filters, h_out, w_out, n_x])
+        return prot.transpose(y, perm=[3, 0, 1, 2])
 
-        z = ABY3PrivateTensor(prot, z, x.is_scaled or w.is_scaled, w.share_type)
-        z = prot.truncate(z) if x.is_scaled and w.is_scaled else z
-        return z
+
+def _conv2d_public_private(prot, x, w, strides, padding):
+    return _conv2d(prot, x, w, strides, padding)
 
 
 def _conv2d_private_public(prot, x, w, strides, padding):
+    return _conv2d(prot, x, w, strides, padding)
 
-    xs = x.unwrapped
-    ws = w.unwrapped
 
-    with tf.name_scope("conv2d"):
-        z = [[None, None], [None, None], [None, None]]
-        for i in range(3):
-            with tf.device(prot.servers[i].device_name):
-                z[i][0] = xs[i][0].conv2d(ws[i], strides, padding)
-                z[i][1] = xs[i][1].conv2d(ws[i], strides, padding)
+def _conv2d_private_private(prot, x, w, strides, padding):
+    return _conv2d(prot, x, w, strides, padding)
 
-        z = ABY3PrivateTensor(prot, z, x.is_scaled or w.is_scaled, x.share_type)
-        z = prot.truncate(z) if x.is_scaled and w.is_scaled else z
-        return z
+def _depthwise_patches(prot, x, h_filter, w_filter, strides, padding):
+    """
+    The patches of each channel of the NCHW image `x`, with shape
+    `[h_filter * w_filter, h_out * w_out * batch, channels, 1]`.
+    """
+    n_x, c_x, h_x, w_x = x.shape.as_list()
+    x = prot.reshape(x, [n_x * c_x, 1, h_x, w_x])
+    patches = prot.im2col(x, h_filter, w_filter, strides, padding)
+    return prot.reshape(patches, [h_filter * w_filter, -1, c_x, 1])
+
+
+def _depthwise_conv2d(prot, x, w, strides, padding):
+    n_x, c_x, h_x, w_x = x.shape.as_list()
+    h_filter, w_filter, in_filters, multiplier = w.shape.as_list()
+    if c_x != in_filters:
+        raise ValueError(
+            "Can't convolve {} channels with filters for {} channels".format(
+                c_x, in_filters
+            )
+        )
+    h_out, w_out = out_size([h_x, w_x], [h_filter, w_filter], strides, padding)
 
+    with tf.name_scope("depthwise-conv2d"):
+        patches = _depthwise_patches(prot, x, h_filter, w_filter, strides, padding)
+        w = prot.reshape(w, [h_filter * w_filter, 1, c_x, multiplier])
+        y = prot.dot(patches, w, axis=0)
+        y = prot.reshape(y, [h_out, w_out, n_x, c_x * multiplier])
+        return prot.transpose(y, perm=[2, 3, 0, 1])
 
-def _conv2d_private_private(prot, x, w, strides, padding):
 
-    xs = x.unwrapped
-    ws = w.unwrapped
+def _depthwise_conv2d_backprop_filter(prot, x, d_y, filter_shape, strides, padding):
+    h_filter, w_filter, in_filters, multiplier = filter_shape
 
-    with tf.name_scope("conv2d"):
-        y = [None, None, None]
-        for i in range(3):
-            with tf.device(prot.servers[i].device_name):
-                y[i] = (
-                    xs[i][0].conv2d(ws[i][0], strides, padding)
-                    + xs[i][0].conv2d(ws[i][1], strides, padding)
-                    + xs[i][1].conv2d(ws[i][0], strides, padding)
-                )
+    with tf.name_scope("depthwise-conv2d-backprop-filter"):
+        patches = _depthwise_patches(prot, x, h_filter, w_filter, strides, padding)
+        d_y = prot.transpose(d_y, perm=[2, 3, 0, 1])
+        d_y = prot.reshape(d_y, [1, -1, in_filters, multiplier])
+        d_w = prot.dot(patches, d_y, axis=1)
+        return prot.reshape(d_w, filter_shape)
 
-        a = prot._gen_zero_sharing(y[0].shape)
-        z = [[None, None], [None, None], [None, None]]
-        for i in range(3):
-            with tf.device(prot.servers[i].device_name):
-                z[i][0] = y[i] + a[i]
 
-        for i in range(3):
-            with tf.device(prot.servers[i].device_name):
-                z[i][1] = z[(i + 1) % 3][0].identity()
+def _depthwise_conv2d_public_private(prot, x, w, strides, padding):
+    return _depthwise_conv2d(prot, x, w, strides, padding)
 
-        z = ABY3PrivateTensor(prot, z, x.is_scaled or w.is_scaled, x.share_type)
-        z = prot.truncate(z) if x.is_scaled and w.is_scaled else z
-        return z
+
+def _depthwise_conv2d_private_public(prot, x, w, strides, padding):
+    return _depthwise_conv2d(prot, x, w, strides, padding)
+
+
+def _depthwise_conv2d_private_private(prot, x, w, strides, padding):
+    return _depthwise_conv2d(prot, x, w, strides, padding)
+
+
+def _depthwise_conv2d_backprop_filter_private_private(
+    prot, x, d_y, filter_shape, strides, padding
+):
+    return _depthwise_conv2d_backprop_filter(
+        prot, x, d_y, filter_shape, strides, padding
+    )
 
 
 def _reduce_max_public(
@@ -5142,7 +6044,7 @@ def _reduce_max_with_argmax_private(
                 prot.define_constant(
                     np.tile(np.reshape(np.eye(n)[i], idx_init_shape), tile_shape),
                     apply_scaling=False,
-                    factory=factories[tf.bool],
+                    factory=prot.bool_factory,
                 )
                 for i, _ in enumerate(tensors)
                 # prot.define_constant(np.reshape(np.eye(n)[i], idx_init_shape), apply_scaling=False, factory=factories[tf.bool])
@@ -5593,7 +6495,7 @@ def _pow2_from_bits_private(prot, bits):
 def _exp2_private(prot, x, approx_type="mp-spdz", sign=None):
     # TODO: is x scaled or not?
     nbits = x.backing_dtype.nbits
-    bfactory = factories[tf.bool]
+    bfactory = prot.bool_factory
     scale = prot.fixedpoint_config.precision_fractional
     # Only consider at most 5 bits on the exponent, we cannot represent any bigger number anyway.
     n_int_bits = 5
@@ -5695,7 +6597,7 @@ def _exp_private(prot, x, approx_type="mp-spdz", sign=None):
 
 def _bits_private(prot, x, bitsize=None):
     assert x.share_type == ShareType.BOOLEAN, x.share_type
-    bfactory = factories[tf.bool]
+    bfactory = prot.bool_factory
 
     x_shares = x.unwrapped
     y = [[None, None], [None, None], [None, None]]
@@ -5780,126 +6682,374 @@ def _scatter_nd_public_private(prot, indices, updates, shape):
         return ABY3PrivateTensor(prot, z, updates.is_scaled, updates.share_type)
 
 
-def _sort_private(
-    prot: ABY3,
-    x: ABY3PrivateTensor,
-    axis: int,
-    acc: bool = True,
-) -> ABY3PrivateTensor:
+def _sort_private(prot, x, axis, acc=True, method="bitonic"):
+    x, _ = _sort_by_key_private(prot, x, [], axis, acc, method)
+    return x
 
-    with tf.name_scope("sort"):
 
-        def bitonic_index(n, stage, sub_stage):
-            assert sub_stage <= stage, "The i-th stage can have at most i+1 sub stages."
-            # In bitonic sorting network, the 0-th sub stage in each stage has a different pattern from
-            # other sub stages.
-            if sub_stage == 0:
-                a = np.arange(n)
-                b = np.split(a, n / (2**stage))
-                left = np.concatenate(b[0::2])
-                right = np.concatenate([np.flip(x) for x in b[1::2]])
-                return (left, right)
-            else:
-                a = np.arange(n)
-                b = np.split(a, n / (2 ** (stage - sub_stage)))
-                left = np.concatenate(b[0::2])
-                right = np.concatenate(b[1::2])
-                return (left, right)
-
-        # def bitonic_sort(x):
-        # n = int(x.shape[0])
-        # n_stages = ceil(log2(n))
-        # for stage in range(n_stages):
-        # print("building stage: ", stage)
-        # for sub_stage in range(stage + 1):
-        # left_idx, right_idx = bitonic_index(n, stage, sub_stage)
-        # left = prot.gather(x, left_idx)
-        # right = prot.gather(x, right_idx)
-        # left, right = prot.cmp_swap(left, right)
-        # z0 = prot.scatter_nd(
-        # np.expand_dims(left_idx, axis=1),
-        # left,
-        # x.shape)
-        # z1 = prot.scatter_nd(
-        # np.expand_dims(right_idx, axis=1),
-        # right,
-        # x.shape)
-        # x = z0 + z1
-        # return x
-
-        # return bitonic_sort(x)
-
-        def build_bitonic_index(n):
-            indices = []
-            n_stages = ceil(log2(n))
-            for stage in range(n_stages):
-                for sub_stage in range(stage + 1):
-                    left_idx, right_idx = bitonic_index(n, stage, sub_stage)
-                    indices.append(np.stack([left_idx, right_idx]))
-            return np.stack(indices)
-
-        axis = axis % len(x.shape)
-        if axis < 0:
-            axis += len(x.shape)
-        if axis != 0:
-            x = prot.transpose(
-                x,
-                perm=[axis]
-                + list(range(0, axis))
-                + list(range(axis + 1, len(x.shape))),
+def _argsort_private(prot, x, axis, acc=True, method="bitonic"):
+    with tf.name_scope("argsort"):
+        shape = x.shape.as_list()
+        axis = axis % len(shape)
+        indices = np.arange(shape[axis]).reshape(
+            [-1 if i == axis else 1 for i in range(len(shape))]
+        )
+        indices = prot.define_constant(
+            np.broadcast_to(indices, shape), apply_scaling=False
+        ).to_private(ShareType.ARITHMETIC)
+        _, (indices,) = _sort_by_key_private(prot, x, [indices], axis, acc, method)
+    return indices
+
+
+def _top_k_private(prot, x, k, axis=-1):
+    with tf.name_scope("top-k"):
+        shape = x.shape.as_list()
+        axis = axis % len(shape)
+        n = shape[axis]
+        if not 0 < k <= n:
+            raise ValueError(
+                "Can't select the top {} of {} elements along axis {}".format(
+                    k, n, axis
+                )
             )
 
-        unpadded_n = int(x.shape[0])
-        n = next_power_of_two(unpadded_n)
-        if n > unpadded_n:
+        indices = np.arange(n).reshape(
+            [-1 if i == axis else 1 for i in range(len(shape))]
+        )
+        indices = prot.define_constant(
+            np.broadcast_to(indices, shape), apply_scaling=False
+        ).to_private(ShareType.ARITHMETIC)
+
+        perm = [axis] + [i for i in range(len(shape)) if i != axis]
+        if axis != 0:
+            x = prot.transpose(x, perm=perm)
+            indices = prot.transpose(indices, perm=perm)
+        rest = x.shape.as_list()[1:]
+
+        # blocks of `size` elements along the first axis, side by side along the
+        # second one
+        size = next_power_of_two(k)
+        blocks = -(-n // size)
+        if blocks * size > n:
             # We can only handle numbers of bit length k-2 for comparison
-            max_bound = (1 << (x.backing_dtype.nbits - 2)) - 1
+            min_bound = -((1 << (x.backing_dtype.nbits - 2)) - 1)
             pad = prot.define_constant(
-                np.ones([n - unpadded_n] + x.shape[1:]) * max_bound, apply_scaling=False
+                np.ones([blocks * size - n] + rest) * min_bound, apply_scaling=False
             )
             pad = pad.to_private(x.share_type)
             pad.is_scaled = x.is_scaled
             x = prot.concat([x, pad], axis=0)
+            indices = prot.concat(
+                [indices, _zeros_rows(prot, indices, blocks * size - n)], axis=0
+            )
+
+        def to_blocks(t):
+            t = prot.reshape(t, [blocks, size] + rest)
+            return prot.transpose(t, perm=[1, 0] + list(range(2, len(rest) + 2)))
+
+        x, (indices,) = _bitonic_sort(prot, to_blocks(x), [to_blocks(indices)], False)
+
+        while blocks > 1:
+            with tf.name_scope("tournament-round"):
+                carry = None
+                if blocks % 2 == 1:
+                    carry = (x[:, blocks - 1 :], indices[:, blocks - 1 :])
+                    x, indices = x[:, : blocks - 1], indices[:, : blocks - 1]
+                blocks //= 2
+
+                def halves(t):
+                    t = prot.reshape(t, [size, blocks, 2] + rest)
+                    first, second = prot.split(t, 2, axis=2)
+                    first = prot.reshape(first, [size, blocks] + rest)
+                    second = prot.reshape(second, [size, blocks] + rest)
+                    return first, prot.reverse(second, [0])
+
+                # Against the reversal of the other block, the larger elements
+                # of each pair are the top `size` of both blocks, in a bitonic
+                # order that only takes the merging half of a bitonic network.
+                (x0, x1), (i0, i1) = halves(x), halves(indices)
+                swap = x0 < x1
+                x = prot.select(swap, x0, x1)
+                indices = prot.select(swap, i0, i1)
+
+                half = size // 2
+                while half >= 1:
+                    x, (indices,) = _bitonic_layer(
+                        prot, x, [indices], half, False, False
+                    )
+                    half //= 2
+
+                if carry is not None:
+                    x = prot.concat([x, carry[0]], axis=1)
+                    indices = prot.concat([indices, carry[1]], axis=1)
+                    blocks += 1
+
+        x = prot.reshape(x, [size] + rest)[:k]
+        indices = prot.reshape(indices, [size] + rest)[:k]
+        if axis != 0:
+            inverse = np.argsort(perm).tolist()
+            x = prot.transpose(x, perm=inverse)
+            indices = prot.transpose(indices, perm=inverse)
+    return x, indices
+
+
+def _sort_by_key_private(prot, keys, payloads, axis=0, acc=True, method="bitonic"):
+    if method not in ("bitonic", "shuffle"):
+        raise ValueError("Unknown sorting method: {}".format(method))
+
+    with tf.name_scope("sort"):
+        axis = axis % len(keys.shape)
+
+        def move_axis(x, inverse=False):
+            if axis == 0:
+                return x
+            perm = [axis] + [i for i in range(len(x.shape)) if i != axis]
+            if inverse:
+                perm = np.argsort(perm).tolist()
+            return prot.transpose(x, perm=perm)
+
+        keys = move_axis(keys)
+        payloads = [move_axis(payload) for payload in payloads]
+        for payload in payloads:
+            if payload.shape[: len(keys.shape)] != keys.shape:
+                raise ValueError(
+                    "Payloads of shape {} can't be sorted with keys of shape {}".format(
+                        payload.shape, keys.shape
+                    )
+                )
 
-        n_stages = ceil(log2(n))
-        n_sub_stages = int((1 + n_stages) * n_stages / 2)
+        if method == "bitonic":
+            keys, payloads = _bitonic_sort(prot, keys, payloads, acc)
+        else:
+            if len(keys.shape) != 1:
+                raise ValueError("The shuffle method only sorts 1-D keys.")
+            keys, payloads = _shuffle_sort(prot, keys, payloads, acc)
 
-        indices = build_bitonic_index(n)
-        indices = prot.define_constant(indices, apply_scaling=False)
+        keys = move_axis(keys, inverse=True)
+        payloads = [move_axis(payload, inverse=True) for payload in payloads]
+    return keys, payloads
+
+
+def _bitonic_sort(prot, keys, payloads, acc):
+    """
+    Bitonic sorting network along the first axis of `keys`, padded to a power
+    of two. Each layer of comparators is a fixed public permutation: it pairs
+    the two halves of consecutive blocks, mirroring the second half in the first
+    layer of each stage, which only takes reshapes and reversals of the tensors.
+    """
+    unpadded_n = int(keys.shape[0])
+    n = next_power_of_two(unpadded_n)
+    if n > unpadded_n:
+        # We can only handle numbers of bit length k-2 for comparison
+        max_bound = (1 << (keys.backing_dtype.nbits - 2)) - 1
+        pad = prot.define_constant(
+            np.ones([n - unpadded_n] + keys.shape[1:]) * max_bound,
+            apply_scaling=False,
+        )
+        pad = pad.to_private(keys.share_type)
+        pad.is_scaled = keys.is_scaled
+        keys = prot.concat([keys, pad], axis=0)
+        payloads = [
+            prot.concat([payload, _zeros_rows(prot, payload, n - unpadded_n)], 0)
+            for payload in payloads
+        ]
 
-        def cond(i, x):
-            return i < n_sub_stages
+    for stage in range(ceil(log2(n))):
+        for sub_stage in range(stage + 1):
+            keys, payloads = _bitonic_layer(
+                prot, keys, payloads, 2 ** (stage - sub_stage), sub_stage == 0, acc
+            )
 
-        def body(i, x):
-            left_idx = indices[i][0]
-            right_idx = indices[i][1]
+    if n > unpadded_n:
+        rows = slice(0, unpadded_n) if acc else slice(n - unpadded_n, n)
+        keys = keys[rows]
+        payloads = [payload[rows] for payload in payloads]
+    return keys, payloads
 
-            left = prot.gather(x, left_idx, axis=0)
-            right = prot.gather(x, right_idx, axis=0)
-            min_, max_ = prot.cmp_swap(left, right)
 
-            if acc:
-                min_idx, max_idx = (left_idx, right_idx)
+def _bitonic_layer(prot, keys, payloads, half, mirror, acc):
+    """
+    One layer of comparators of a bitonic network along the first axis of
+    `keys`, comparing the two halves of consecutive blocks of `2 * half`
+    elements. With `mirror`, the second half of each block is compared in
+    reverse order.
+    """
+    n = int(keys.shape[0])
+
+    def pair(x):
+        x = prot.reshape(x, [n // (2 * half), 2, half] + x.shape[1:])
+        left, right = prot.split(x, 2, axis=1)
+        if mirror:
+            right = prot.reverse(right, [2])
+        return left, right
+
+    def unpair(low, high):
+        first, second = (low, high) if acc else (high, low)
+        if mirror:
+            second = prot.reverse(second, [2])
+        x = prot.concat([first, second], axis=1)
+        return prot.reshape(x, [n] + x.shape[3:])
+
+    with tf.name_scope("bitonic-layer"):
+        left, right = pair(keys)
+        swap = left > right
+        low = prot.select(swap, left, right)
+        keys = unpair(low, left + right - low)
+
+        payloads = list(payloads)
+        for j, payload in enumerate(payloads):
+            left, right = pair(payload)
+            choice = swap
+            for _ in range(len(left.shape) - len(swap.shape)):
+                choice = prot.expand_dims(choice, -1)
+            low = prot.select(choice, left, right)
+            if payload.is_boolean():
+                high = left ^ right ^ low
             else:
-                min_idx, max_idx = (right_idx, left_idx)
+                high = left + right - low
+            payloads[j] = unpair(low, high)
+    return keys, payloads
+
 
-            z0 = prot.scatter_nd(prot.expand_dims(min_idx, axis=1), min_, x.shape)
-            z1 = prot.scatter_nd(prot.expand_dims(max_idx, axis=1), max_, x.shape)
-            x = z0 + z1
+def _zeros_rows(prot, x, rows):
+    zeros = prot.define_constant(
+        np.zeros([rows] + x.shape[1:]), apply_scaling=False, factory=x.backing_dtype
+    ).to_private(x.share_type)
+    zeros.is_scaled = x.is_scaled
+    return zeros
 
-            return (i + 1, x)
 
-        _, x = prot.while_loop(cond, body, [tf.constant(0), x])
-        if n > unpadded_n:
-            if acc:
-                x = x[:unpadded_n]
+def _shuffle_sort(prot, keys, payloads, acc):
+    """
+    Quicksort of 1-D `keys` on revealed comparisons, after a blinded shuffle.
+    At every level, each element is compared with the first element of its
+    segment, the pivot, and the servers reveal whether it is smaller, equal or
+    larger. All segments are then partitioned at once by a public permutation,
+    until every segment only holds equal elements. As the elements are in a
+    random order, this reveals nothing but which of them are equal.
+    """
+    n = int(keys.shape[0])
+    tensors = _blinded_shuffle_rows(prot, [keys] + payloads)
+    index_factory = factories[tf.int64]
+
+    starts = [None, None, None]
+    for i in range(3):
+        with tf.device(prot.servers[i].device_name):
+            starts[i] = index_factory.tensor(tf.zeros([n], dtype=tf.int64))
+    starts = ABY3PublicTensor(prot, starts, False)
+
+    def cond(running, starts, *tensors):
+        return running
+
+    def body(running, starts, *tensors):
+        keys = tensors[0]
+        pivots = prot.gather(keys, starts)
+        diff = prot.concat([keys - pivots, pivots - keys], axis=0)
+        signs = prot.msb(diff).reveal().unwrapped
+
+        perms = [None, None, None]
+        new_starts = [None, None, None]
+        for i in range(3):
+            with tf.device(prot.servers[i].device_name):
+                smaller, larger = tf.split(tf.cast(signs[i].value, tf.bool), 2)
+                if not acc:
+                    smaller, larger = larger, smaller
+                group = tf.where(smaller, 0, tf.where(larger, 2, 1))
+                key = starts.unwrapped[i].value * 3 + tf.cast(group, tf.int64)
+                perm = tf.argsort(key, stable=True)
+                key = tf.gather(key, perm)
+                first = tf.concat([[True], key[1:] != key[:-1]], axis=0)
+                segment = tf.cumsum(tf.cast(first, tf.int64)) - 1
+                offsets = tf.where(first)[:, 0]
+                perms[i] = index_factory.tensor(tf.cast(perm, tf.int64))
+                new_starts[i] = index_factory.tensor(tf.gather(offsets, segment))
+                if i == 0:
+                    running = tf.reduce_any(tf.logical_or(smaller, larger))
+
+        perms = ABY3PublicTensor(prot, perms, False)
+        tensors = [prot.gather(x, perms) for x in tensors]
+        return [running, ABY3PublicTensor(prot, new_starts, False)] + tensors
+
+    with tf.name_scope("quicksort"):
+        loop_vars = [tf.constant(n > 1), starts] + tensors
+        results = prot.while_loop(cond, body, loop_vars)
+    return results[2], list(results[3:])
+
+
+def _blinded_shuffle_private(prot, x):
+    return _blinded_shuffle_rows(prot, [x])[0]
+
+
+def _blinded_shuffle_rows(prot, xs):
+    """
+    Shuffle the rows of the tensors in `xs` with the same random permutation,
+    the composition of three permutations each known to a pair of servers.
+
+    Each pair in turn holds a two-out-of-two sharing of the tensors, permutes
+    both shares and masks them again, before the server leaving the pair sends
+    its share to the server joining it. Finally, the sharing is converted back
+    to a replicated one.
+    """
+    n = int(xs[0].shape[0])
+    index_factory = factories[tf.int64]
+    # pair p is made of the servers p and p + 1
+    pairs = [(0, 1), (1, 2), (2, 0)]
+
+    def seed(i, p):
+        # the key that server i shares with the other server of pair p
+        j = 1 if pairs[p][0] == i else 0
+        return prot.pairwise_keys()[i][j] + prot.pairwise_nonces()[p]
+
+    with tf.name_scope("blinded-shuffle"):
+        perms = [dict() for _ in pairs]
+        for p, pair in enumerate(pairs):
+            for i in pair:
+                with tf.device(prot.servers[i].device_name):
+                    r = index_factory.sample_seeded_uniform([n], seed(i, p))
+                    perms[p][i] = tf.argsort(r.value)
+        prot._update_pairwise_nonces()
+
+        results = []
+        for x in xs:
+            if x.is_boolean():
+                add, sub = (lambda a, b: a ^ b), (lambda a, b: a ^ b)
             else:
-                x = x[(n - unpadded_n) :]
-        if axis != 0:
-            x = prot.transpose(
-                x,
-                perm=list(range(1, axis + 1))
-                + [0]
-                + list(range(axis + 1, len(x.shape))),
-            )
-        return x
+                add, sub = (lambda a, b: a + b), (lambda a, b: a - b)
+            factory = x.backing_dtype
+            shares = x.unwrapped
+
+            # two-out-of-two sharing between servers 0 and 1
+            held = dict()
+            with tf.device(prot.servers[0].device_name):
+                held[0] = add(shares[0][0], shares[0][1])
+            with tf.device(prot.servers[1].device_name):
+                held[1] = shares[1][1]
+
+            for p, (i, j) in enumerate(pairs):
+                with tf.device(prot.servers[i].device_name):
+                    mask = factory.sample_seeded_uniform(x.shape, seed(i, p))
+                    held[i] = add(held[i].gather(perms[p][i]), mask)
+                with tf.device(prot.servers[j].device_name):
+                    mask = factory.sample_seeded_uniform(x.shape, seed(j, p))
+                    held[j] = sub(held[j].gather(perms[p][j]), mask)
+                if p < len(pairs) - 1:
+                    k = pairs[p + 1][1]
+                    with tf.device(prot.servers[k].device_name):
+                        held[k] = held.pop(i).identity()
+            prot._update_pairwise_nonces()
+
+            # back to a replicated sharing of held[2] + held[0]
+            z = [[None, None], [None, None], [None, None]]
+            with tf.device(prot.servers[0].device_name):
+                z[0][0] = factory.sample_seeded_uniform(x.shape, seed(0, 2))
+                z[0][1] = sub(held[0], z[0][0])
+            with tf.device(prot.servers[2].device_name):
+                z[2][0] = held[2]
+                z[2][1] = factory.sample_seeded_uniform(x.shape, seed(2, 2))
+            with tf.device(prot.servers[1].device_name):
+                z[1][0] = z[0][1].identity()
+                z[1][1] = z[2][0].identity()
+            prot._update_pairwise_nonces()
+
+            results.append(ABY3PrivateTensor(prot, z, x.is_scaled, x.share_type))
+    return results
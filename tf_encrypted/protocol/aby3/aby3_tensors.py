@@ -15,6 +15,7 @@ from ..protocol import TFEPublicTensor
 from ..protocol import TFEPublicVariable
 from ..protocol import TFETensor
 from ..protocol import TFETensorBone
+from ..protocol import _current_scope
 
 
 class ShareType:
@@ -643,3 +644,50 @@ class ABY3PrivateVariable(ABY3PrivateTensor, TFEPrivateVariable):
             values[2][0] = self.shares[2][0].read_value()
             values[2][1] = self.shares[2][1].read_value()
         return ABY3PrivateTensor(self.prot, values, self.is_scaled, self.share_type)
+
+
+class ABY3UntruncatedTensor(ABY3PrivateTensor):
+    """
+    This class represents a scaled private value whose truncation has been
+    deferred, see the `lazy_truncation` option of ABY3.
+
+    The shares of `untruncated` carry `scale` more fractional digits than the
+    fixedpoint configuration and hold a sum of up to `terms` values of double
+    precision. Additions, subtractions, negations and sums are computed on these
+    shares; any other use of the tensor, e.g. through `unwrapped`, sees the
+    truncated shares, which are computed at most once per graph.
+    """
+
+    def __init__(self, prot, untruncated, scale, terms):
+        assert isinstance(untruncated, ABY3PrivateTensor), type(untruncated)
+        assert untruncated.is_scaled and untruncated.is_arithmetic()
+
+        super(ABY3PrivateTensor, self).__init__(
+            prot, untruncated.is_scaled, untruncated.share_type
+        )
+        self.untruncated = untruncated
+        self.scale = scale
+        self.terms = terms
+        self._truncated = {}
+
+    def __repr__(self) -> str:
+        return "ABY3UntruncatedTensor(shape={}, scale={}, terms={})".format(
+            self.shape, self.scale, self.terms
+        )
+
+    @property
+    def shares(self):
+        scope = _current_scope()
+        truncated = self._truncated.get(scope, None)
+        if truncated is None:
+            truncated = self.prot.truncate(self.untruncated, amount=self.scale)
+            self._truncated[scope] = truncated
+        return truncated.unwrapped
+
+    @property
+    def shape(self) -> List[int]:
+        return self.untruncated.shape
+
+    @property
+    def backing_dtype(self):
+        return self.untruncated.backing_dtype
@@ -13,8 +13,11 @@ import tensorflow as tf
 
 import tf_encrypted as tfe
 from tf_encrypted.protocol.aby3 import ABY3
+from tf_encrypted.protocol.aby3 import ABY3PrivateTensor
+from tf_encrypted.protocol.aby3 import ABY3UntruncatedTensor
 from tf_encrypted.protocol.aby3 import ShareType
 from tf_encrypted.tensor import factories
+from tf_encrypted.tensor import int1packedfactory
 
 
 @pytest.mark.aby3
@@ -49,6 +52,28 @@ class TestABY3(unittest.TestCase):
             result, np.array([[1.3, 1.3], [1.3, 1.3]]), rtol=0.0, atol=0.01
         )
 
+    def test_define_private_on_server(self):
+
+        prot = ABY3()
+        tfe.set_protocol(prot)
+
+        a = np.random.uniform(-1, 1, size=(3, 4))
+        b = np.random.randint(0, 2**20, size=(3, 4))
+
+        for owner in ["server0", "server1", "server2", "input-provider"]:
+            x = tfe.define_private_input(owner, lambda: tf.constant(a))
+            y = tfe.define_private_variable(a, player=owner)
+            z = tfe.define_private_variable(
+                b, apply_scaling=False, share_type=ShareType.BOOLEAN, player=owner
+            )
+
+            # reveal result
+            for w in [x, y]:
+                np.testing.assert_allclose(
+                    w.reveal().to_native(), a, rtol=0.0, atol=0.01
+                )
+            np.testing.assert_array_equal(z.reveal().to_native(), b)
+
     def test_add_private_private(self):
 
         prot = ABY3()
@@ -195,6 +220,178 @@ class TestABY3(unittest.TestCase):
             result, np.array([[2.6, 2.6], [2.6, 2.6]]), rtol=0.0, atol=0.01
         )
 
+    def test_matmul_transpose(self):
+        a = np.random.uniform(-1, 1, size=(4, 3))
+        b = np.random.uniform(-1, 1, size=(4, 5))
+
+        for fixedpoint_config in ["low", "high"]:
+            prot = ABY3(fixedpoint_config=fixedpoint_config)
+            tfe.set_protocol(prot)
+
+            x = tfe.define_private_variable(a)
+            y = tfe.define_private_variable(b)
+            w = tfe.define_constant(b)
+
+            z0 = tfe.matmul(x, y, transpose_a=True)
+            z1 = tfe.matmul(y, x, transpose_a=True)
+            z2 = tfe.matmul(x, w, transpose_a=True)
+            z3 = tfe.matmul(y, x.transpose(), transpose_a=True, transpose_b=True)
+
+            np.testing.assert_allclose(
+                z0.reveal().to_native(), a.T @ b, rtol=0.0, atol=0.01
+            )
+            np.testing.assert_allclose(
+                z1.reveal().to_native(), b.T @ a, rtol=0.0, atol=0.01
+            )
+            np.testing.assert_allclose(
+                z2.reveal().to_native(), a.T @ b, rtol=0.0, atol=0.01
+            )
+            np.testing.assert_allclose(
+                z3.reveal().to_native(), b.T @ a, rtol=0.0, atol=0.01
+            )
+
+    def test_fused_products(self):
+
+        prot = ABY3()
+        tfe.set_protocol(prot)
+
+        a = np.random.uniform(-1, 1, size=(2, 3))
+        b = np.random.uniform(-1, 1, size=(3, 4))
+        c = np.random.uniform(-1, 1, size=(2, 3))
+
+        # define inputs
+        x = tfe.define_private_variable(a)
+        y = tfe.define_private_variable(b)
+        z = tfe.define_private_variable(c)
+        w = tfe.define_constant(b)
+
+        # define computation
+        products = prot.fused_products(
+            [("matmul", x, y), ("mul", x, z), ("mul", x, 2.5), ("matmul", z, w)]
+        )
+
+        # reveal result
+        expected = [a @ b, a * c, a * 2.5, c @ b]
+        for product, e in zip(products, expected):
+            np.testing.assert_allclose(
+                product.reveal().to_native(), e, rtol=0.0, atol=0.01
+            )
+
+    def test_dot(self):
+
+        prot = ABY3()
+        tfe.set_protocol(prot)
+
+        a = np.random.uniform(-1, 1, size=(4, 50))
+        b = np.random.uniform(-1, 1, size=(4, 50))
+        c = np.random.uniform(-1, 1, size=(50,))
+
+        # define inputs
+        x = tfe.define_private_variable(a)
+        y = tfe.define_private_variable(b)
+        z = tfe.define_constant(c)
+
+        # define computation
+        cases = [
+            (prot.dot(x, y, axis=1), np.sum(a * b, axis=1)),
+            (prot.dot(x, y), np.sum(a * b)),
+            (prot.dot(x, y, axis=0, keepdims=True), np.sum(a * b, axis=0)[None]),
+            (prot.dot(x, z, axis=-1), a @ c),
+            (prot.dot(z, x, axis=-1), a @ c),
+            (prot.dot(z, z), c @ c),
+            (prot.dot(x, 0.5, axis=1), np.sum(a * 0.5, axis=1)),
+        ]
+
+        # reveal result
+        for result, expected in cases:
+            if isinstance(result, ABY3PrivateTensor):
+                result = result.reveal()
+            np.testing.assert_allclose(
+                result.to_native(), expected, rtol=0.0, atol=0.01
+            )
+
+        # a single truncation of the sum instead of one per product
+        fused = prot.dot(x, y, axis=1).reveal().to_native()
+        unfused = prot.reduce_sum(x * y, axis=1).reveal().to_native()
+        expected = np.sum(
+            x.reveal().to_native().numpy() * y.reveal().to_native().numpy(), axis=1
+        )
+        fused_error = np.abs(fused - expected).max()
+        unfused_error = np.abs(unfused - expected).max()
+        self.assertLessEqual(
+            fused_error, 2 * 2**-prot.fixedpoint_config.precision_fractional
+        )
+        self.assertLess(fused_error, unfused_error + 0.001)
+
+    def test_lazy_truncation(self):
+
+        prot = ABY3(lazy_truncation=True)
+        tfe.set_protocol(prot)
+
+        values = [np.random.uniform(-2, 2, size=(3, 4)) for _ in range(6)]
+        a, b, c, d, e, f = [tfe.define_private_variable(v) for v in values]
+        w = tfe.define_constant(values[5])
+
+        truncations = []
+        truncate = prot.truncate
+
+        def counting_truncate(*args, **kwargs):
+            truncations.append(args)
+            return truncate(*args, **kwargs)
+
+        prot.truncate = counting_truncate
+
+        # define computation
+        z = a * b + c * d - e * w + 1.5
+        self.assertIsInstance(z, ABY3UntruncatedTensor)
+        self.assertEqual(len(truncations), 0)
+
+        # reveal result
+        expected = values[0] * values[1] + values[2] * values[3]
+        expected = expected - values[4] * values[5] + 1.5
+        np.testing.assert_allclose(
+            z.reveal().to_native(), expected, rtol=0.0, atol=0.01
+        )
+        self.assertEqual(len(truncations), 1)
+
+        # the truncated shares are reused by any other operation
+        np.testing.assert_allclose(
+            (z * a).reveal().to_native(), expected * values[0], rtol=0.0, atol=0.05
+        )
+        self.assertEqual(len(truncations), 2)
+        np.testing.assert_allclose(
+            (z * 0.25).reveal().to_native(), expected * 0.25, rtol=0.0, atol=0.01
+        )
+        np.testing.assert_allclose(
+            tfe.reduce_sum(-(a * b), axis=1).reveal().to_native(),
+            -np.sum(values[0] * values[1], axis=1),
+            rtol=0.0,
+            atol=0.01,
+        )
+
+    def test_lazy_truncation_bound(self):
+
+        prot = ABY3(lazy_truncation=True)
+        tfe.set_protocol(prot)
+        threshold = prot.fixedpoint_config.matmul_threshold
+
+        a = np.random.uniform(-1, 1, size=(2, threshold + 1))
+        x = tfe.define_private_variable(a)
+
+        # sums of more products than the overflow check allows are truncated first
+        s = tfe.reduce_sum(x * x, axis=1)
+        self.assertNotIsInstance(s, ABY3UntruncatedTensor)
+        np.testing.assert_allclose(
+            s.reveal().to_native(), np.sum(a * a, axis=1), rtol=0.0, atol=0.05
+        )
+
+        s = tfe.reduce_sum(x[:, :threshold] * x[:, :threshold], axis=1)
+        self.assertIsInstance(s, ABY3UntruncatedTensor)
+
+        # constants beyond single precision are not scaled up
+        big = 2.0 ** (prot.fixedpoint_config.precision_integral + 1)
+        self.assertNotIsInstance(x * x + big, ABY3UntruncatedTensor)
+
     def test_pow2_mul_div(self):
 
         prot = ABY3()
@@ -733,6 +930,47 @@ class TestABY3(unittest.TestCase):
             result, np.array([[8, 10, 12], [14, 16, 18]]), rtol=0.0, atol=0.01
         )
 
+    def test_ppa_sparse_topologies(self):
+
+        prot = ABY3()
+        tfe.set_protocol(prot)
+
+        a = np.random.randint(-(2**62), 2**62, size=(2, 3), dtype=np.int64)
+        b = np.random.randint(-(2**62), 2**62, size=(2, 3), dtype=np.int64)
+        x = tfe.define_private_variable(
+            a, apply_scaling=False, share_type=ShareType.BOOLEAN
+        )
+        y = tfe.define_private_variable(
+            b, apply_scaling=False, share_type=ShareType.BOOLEAN
+        )
+
+        for topology in ["brent_kung", "hybrid"]:
+            for n_bits in [None, 1, 5, 16, 40]:
+                z = tfe.ppa(x, y, n_bits, topology=topology)
+                expected = a + b
+                if n_bits is not None:
+                    expected = expected & ((1 << n_bits) - 1)
+                np.testing.assert_array_equal(z.reveal().to_native(), expected)
+
+    def test_ppa_auto_topology(self):
+
+        x = np.random.randint(0, 2**40, size=(4, 100), dtype=np.int64)
+
+        def rounds(prot):
+            tfe.set_protocol(prot)
+            y = tfe.define_private_variable(
+                x, apply_scaling=False, share_type=ShareType.BOOLEAN
+            )
+            z = tfe.ppa(y, y)
+            np.testing.assert_array_equal(z.reveal().to_native(), x + x)
+            return tfe.communication_stats(lambda: tfe.ppa(y, y)).rounds
+
+        # low latency and bandwidth favour the sparse topologies
+        slow = rounds(ABY3(link_rtt=1e-4, link_bandwidth=1e6))
+        fast = rounds(ABY3(link_rtt=1e-1, link_bandwidth=1e9))
+        self.assertEqual(fast, rounds(ABY3()))
+        self.assertGreater(slow, fast)
+
     def test_a2b_private(self):
 
         prot = ABY3()
@@ -796,6 +1034,46 @@ class TestABY3(unittest.TestCase):
             result, np.array([[0, 1, 0], [1, 0, 1]]), rtol=0.0, atol=0.01
         )
 
+    def test_packed_bool_factory(self):
+
+        prot = ABY3(bool_factory=int1packedfactory)
+        tfe.set_protocol(prot)
+
+        data = np.array([[[[2, -1, 9, 1], [-7, 5, 0, 8], [5, 3, -1, 10]]]])
+        x = tfe.define_private_variable(data)
+
+        cmp = x > 0
+        assert cmp.backing_dtype == int1packedfactory
+        y = tfe.relu(x)
+        z, z_arg = tfe.maxpool2d_with_argmax(
+            x, pool_size=(2, 2), strides=(2, 2), padding="VALID"
+        )
+        w = tfe.b2a_single(
+            tfe.define_private_variable(
+                tf.constant([[0, 1, 0], [1, 0, 1]]),
+                share_type=ShareType.BOOLEAN,
+                apply_scaling=False,
+                factory=int1packedfactory,
+            )
+        )
+
+        np.testing.assert_array_equal(cmp.reveal().to_native(), data > 0)
+        np.testing.assert_allclose(
+            y.reveal().to_native(), np.maximum(data, 0), rtol=0.0, atol=0.01
+        )
+        np.testing.assert_allclose(
+            z.reveal().to_native(), np.array([[[[5, 9]]]]), rtol=0.0, atol=0.01
+        )
+        np.testing.assert_allclose(
+            z_arg.reveal().to_native(),
+            np.array([[[[[0, 0, 0, 1], [1, 0, 0, 0]]]]]),
+            rtol=0.0,
+            atol=0.01,
+        )
+        np.testing.assert_allclose(
+            w.reveal().to_native(), np.array([[0, 1, 0], [1, 0, 1]]), rtol=0.0
+        )
+
     def test_truncate_heuristic(self):
 
         prot = ABY3()
@@ -885,6 +1163,52 @@ class TestABY3(unittest.TestCase):
             result, np.array([[1, 2, 3], [4, 5, 6]]), rtol=0.00, atol=0.001
         )
 
+    def test_truncate_msb0_edabit(self):
+
+        prot = ABY3(edabits=True)
+        tfe.set_protocol(prot)
+
+        scale = prot.fixedpoint_config.precision_fractional
+        x = tfe.define_private_variable(
+            tf.constant([[1, 2, 3], [4, 5, 6]]), share_type=ShareType.ARITHMETIC
+        )
+        y = x << scale
+
+        z = tfe.truncate_msb0(y, method="edabit")
+
+        result = z.reveal().to_native()
+        np.testing.assert_allclose(
+            result, np.array([[1, 2, 3], [4, 5, 6]]), rtol=0.00, atol=0.001
+        )
+
+    def test_edabits(self):
+
+        x = np.random.uniform(-5, 5, size=(20, 10))
+        w = np.random.uniform(-1, 1, size=(10, 3))
+
+        @tfe.function
+        def compute(x, w):
+            y = tfe.relu(tfe.matmul(x, w)).reveal().to_native()
+            bits = [tfe.bit_extract(x, i).reveal().to_native() for i in [0, 1, 20]]
+            return y, tfe.msb(x).reveal().to_native(), bits
+
+        for pooled in [False, True]:
+            prot = ABY3(edabits=True)
+            tfe.set_protocol(prot)
+            x_var = tfe.define_private_variable(x)
+            w_var = tfe.define_private_variable(w)
+            scale = 2**prot.fixedpoint_config.precision_fractional
+            bits = np.round(x_var.reveal().to_native() * scale).astype(np.int64)
+            if pooled:
+                pool = prot.preprocess_randomness(compute, x_var, w_var)
+                self.assertTrue(any(g[0] == "edabit" for g in pool._sizes))
+
+            y, msb, extracted = compute(x_var, w_var)
+            np.testing.assert_allclose(y, np.maximum(x @ w, 0), rtol=0.0, atol=0.01)
+            np.testing.assert_array_equal(msb, bits < 0)
+            for i, z in zip([0, 1, 20], extracted):
+                np.testing.assert_array_equal(z, (bits >> i) & 1 == 1)
+
     def test_ot(self):
 
         prot = ABY3()
@@ -971,6 +1295,62 @@ class TestABY3(unittest.TestCase):
             result, np.array([[1, 0, 0], [0, 5, 0]]), rtol=0.0, atol=0.01
         )
 
+    def test_mul_ab_forwarded_ot(self):
+
+        prot = ABY3()
+        tfe.set_protocol(prot)
+
+        x = tfe.define_private_variable(
+            np.array([[1, 2, 3], [4, 5, 6]]),
+            share_type=ShareType.ARITHMETIC,
+        )
+        c = tfe.define_private_variable(
+            tf.constant([[1, 0, 0], [0, 1, 1]]),
+            apply_scaling=False,
+            share_type=ShareType.BOOLEAN,
+            factory=factories[tf.bool],
+        )
+
+        z = prot.mul_ab(x, c, method="forwarded_ot")
+        w = prot.mul_ab(tfe.define_constant(np.ones([2, 3])), c, "forwarded_ot")
+        y = prot.b2a_single(c, method="forwarded_ot")
+
+        np.testing.assert_allclose(
+            z.reveal().to_native(),
+            np.array([[1, 0, 0], [0, 5, 6]]),
+            rtol=0.0,
+            atol=0.01,
+        )
+        np.testing.assert_allclose(
+            w.reveal().to_native(),
+            np.array([[1, 0, 0], [0, 1, 1]]),
+            rtol=0.0,
+            atol=0.01,
+        )
+        np.testing.assert_array_equal(
+            y.reveal().to_native(), np.array([[1, 0, 0], [0, 1, 1]])
+        )
+
+    def test_mul_ab_auto_method(self):
+
+        x = np.random.uniform(-1, 1, size=(50, 20))
+
+        def rounds(prot):
+            tfe.set_protocol(prot)
+            y = tfe.define_private_variable(x)
+            z = tfe.relu(y)
+            np.testing.assert_allclose(
+                z.reveal().to_native(), np.maximum(x, 0), rtol=0.0, atol=0.01
+            )
+            c = y > 0
+            return tfe.communication_stats(lambda: prot.mul_ab(y, c)).rounds
+
+        # the bandwidth only favours forwarding when it is low
+        slow = rounds(ABY3(link_rtt=1e-4, link_bandwidth=1e6))
+        fast = rounds(ABY3(link_rtt=1e-1, link_bandwidth=1e9))
+        self.assertEqual(fast, rounds(ABY3()))
+        self.assertEqual(slow, fast + 1)
+
     def test_bit_extract(self):
 
         prot = ABY3()
@@ -1676,6 +2056,47 @@ class TestABY3(unittest.TestCase):
         np.testing.assert_allclose(output_tfe1, output_tensorflow, atol=0.01)
         np.testing.assert_allclose(output_tfe2, output_tensorflow, atol=0.01)
 
+    def test_depthwise_conv2d(self):
+
+        prot = ABY3()
+        tfe.set_protocol(prot)
+
+        input_shape = (2, 3, 9, 9)
+        filter_shape = (3, 3, 3, 2)
+        input_conv = np.random.normal(size=input_shape)
+        filter_values = np.random.normal(size=filter_shape)
+        d_y_values = np.random.normal(size=(2, 6, 5, 5))
+
+        x = prot.define_private_variable(input_conv)
+        w = prot.define_private_variable(filter_values)
+        d_y = prot.define_private_variable(d_y_values)
+        y = tfe.depthwise_conv2d(x, w, [2, 2], "SAME")
+        d_w = tfe.depthwise_conv2d_backprop_filter(
+            x, d_y, filter_shape, [2, 2], "SAME"
+        )
+
+        x_nhwc = tf.constant(input_conv.transpose(0, 2, 3, 1))
+        expected_y = tf.nn.depthwise_conv2d(
+            x_nhwc, filter_values, [1, 2, 2, 1], "SAME"
+        )
+        expected_d_w = tf.compat.v1.nn.depthwise_conv2d_native_backprop_filter(
+            x_nhwc,
+            filter_shape,
+            tf.constant(d_y_values.transpose(0, 2, 3, 1)),
+            [1, 2, 2, 1],
+            "SAME",
+        )
+
+        np.testing.assert_allclose(
+            y.reveal().to_native(),
+            tf.transpose(expected_y, (0, 3, 1, 2)),
+            rtol=0.0,
+            atol=0.01,
+        )
+        np.testing.assert_allclose(
+            d_w.reveal().to_native(), expected_d_w, rtol=0.0, atol=0.05
+        )
+
     def test_maximum(self):
 
         prot = ABY3()
@@ -2186,6 +2607,91 @@ class TestABY3(unittest.TestCase):
             atol=0.01,
         )
 
+    def test_sort_by_key(self):
+
+        prot = ABY3()
+        tfe.set_protocol(prot)
+
+        keys = np.random.permutation(13) - 6.0
+        keys[4] = keys[7]
+        columns = np.stack([keys * 2, keys * 3], axis=1)
+        x = tfe.define_private_variable(keys)
+        y = tfe.define_private_variable(columns)
+
+        for method in ["bitonic", "shuffle"]:
+            for acc in [True, False]:
+                expected = np.sort(keys) if acc else -np.sort(-keys)
+                z, (w,) = prot.sort_by_key(x, [y], 0, acc, method)
+                np.testing.assert_allclose(
+                    z.reveal().to_native(), expected, rtol=0.0, atol=0.01
+                )
+                np.testing.assert_allclose(
+                    w.reveal().to_native(),
+                    np.stack([expected * 2, expected * 3], axis=1),
+                    rtol=0.0,
+                    atol=0.01,
+                )
+
+    def test_argsort(self):
+
+        prot = ABY3()
+        tfe.set_protocol(prot)
+
+        x = np.array([[3, 1, 5, 2, 6, 4], [11, 8, 10, 12, 9, 7]])
+        y = tfe.define_private_variable(tf.constant(x))
+
+        for axis in [0, 1]:
+            z = prot.argsort(y, axis, acc=True)
+            np.testing.assert_allclose(
+                z.reveal().to_native(), np.argsort(x, axis=axis), rtol=0.0, atol=0.01
+            )
+        z = prot.argsort(y[0], 0, acc=False, method="shuffle")
+        np.testing.assert_allclose(
+            z.reveal().to_native(), np.argsort(-x[0]), rtol=0.0, atol=0.01
+        )
+
+    def test_top_k(self):
+
+        prot = ABY3()
+        tfe.set_protocol(prot)
+
+        x = np.reshape(np.random.permutation(69) - 34.0, [3, 23])
+        y = tfe.define_private_variable(x)
+
+        for k in [1, 3, 5, 23]:
+            values, indices = prot.top_k(y, k)
+            expected = tf.math.top_k(x, k)
+            np.testing.assert_allclose(
+                values.reveal().to_native(), expected.values, rtol=0.0, atol=0.01
+            )
+            np.testing.assert_allclose(
+                indices.reveal().to_native(), expected.indices, rtol=0.0, atol=0.01
+            )
+
+        values, indices = prot.top_k(y, 2, axis=0)
+        np.testing.assert_allclose(
+            values.reveal().to_native(), -np.sort(-x, axis=0)[:2], rtol=0.0, atol=0.01
+        )
+        np.testing.assert_allclose(
+            indices.reveal().to_native(),
+            np.argsort(-x, axis=0)[:2],
+            rtol=0.0,
+            atol=0.01,
+        )
+
+    def test_blinded_shuffle(self):
+
+        prot = ABY3()
+        tfe.set_protocol(prot)
+
+        x = np.arange(64 * 2).reshape([64, 2])
+        y = tfe.define_private_variable(tf.constant(x))
+        z = prot.blinded_shuffle(y).reveal().to_native().numpy()
+
+        # the rows are permuted together
+        self.assertFalse(np.array_equal(z, x))
+        np.testing.assert_allclose(z[np.argsort(z[:, 0])], x, rtol=0.0, atol=0.01)
+
 
 if __name__ == "__main__":
     """
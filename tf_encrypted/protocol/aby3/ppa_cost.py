@@ -0,0 +1,121 @@
+"""Cost model of the parallel prefix adder topologies used by ABY3."""
+from collections import namedtuple
+from math import ceil
+from math import log2
+from typing import Optional
+
+from ...tensor import factories
+
+PPA_TOPOLOGIES = ["kogge_stone", "sklansky", "brent_kung", "hybrid"]
+
+# The sparse topologies compact the generate and propagate bits into words of
+# half the width at every level of their tree, starting from 64-bit words.
+SPARSE_TOPOLOGIES = ["brent_kung", "hybrid"]
+
+# Width below which the hybrid topology stops compacting and switches to
+# Kogge-Stone: words of less than 8 bits are still sent as bytes.
+HYBRID_DENSE_WIDTH = 8
+
+PPACost = namedtuple("PPACost", ["rounds", "and_gates", "bytes"])
+PPACost.__doc__ = """
+Cost of adding one pair of elements with a parallel prefix adder.
+
+`rounds` is the number of communication rounds, `and_gates` the number of bit
+ANDs evaluated (including the unused bits of a word) and `bytes` the number of
+bytes sent by the three servers together.
+"""
+
+
+def _and_cost(width):
+    """Bits ANDed and bytes sent by one AND of private words of `width` bits."""
+    nbits = factories[width].nbits
+    # every server sends its share of the result to one other server
+    return nbits, 3 * nbits // 8
+
+
+def _dense_cost(width, levels):
+    """
+    Kogge-Stone levels on words of `width` bits, skipping the propagate bits
+    of the last level as the sparse topologies do.
+    """
+    gates = 0
+    nbytes = 0
+    for i in range(levels):
+        ands = 2 if i < levels - 1 else 1
+        g, b = _and_cost(width)
+        gates += ands * g
+        nbytes += ands * b
+    return PPACost(levels, gates, nbytes)
+
+
+def _sparse_prefix_cost(k, dense_width):
+    """Cost of the prefix computation of `_ppa_sparse_prefix` on `k` bits."""
+    if k <= dense_width:
+        return _dense_cost(k, ceil(log2(k)))
+
+    half = k // 2
+    g, b = _and_cost(half)
+    # the generate bits, and the propagate bits if the tree goes on
+    up = 2 if half > 1 else 1
+    # the carries of the even positions, unless they are the generate bits
+    down = 1 if half > 1 else 0
+    inner = _sparse_prefix_cost(half, dense_width)
+    return PPACost(
+        inner.rounds + 1 + down,
+        inner.and_gates + (up + down) * g,
+        inner.bytes + (up + down) * b,
+    )
+
+
+def ppa_cost(topology: str, n_bits: Optional[int] = None, nbits: int = 64) -> PPACost:
+    """
+    Cost of `ABY3.ppa` on words of `nbits` bits, of which the `n_bits` least
+    significant ones are computed.
+    """
+    k = nbits if n_bits is None else n_bits
+    if topology in ("kogge_stone", "sklansky"):
+        levels = ceil(log2(k))
+        g, b = _and_cost(nbits)
+        ands = 1 + 2 * levels
+        return PPACost(1 + levels, ands * g, ands * b)
+
+    if topology not in SPARSE_TOPOLOGIES:
+        raise NotImplementedError("Unknown adder topology.")
+    if nbits != 64:
+        raise NotImplementedError(
+            "The {} topology only supports 64-bit words".format(topology)
+        )
+    k = 2 ** ceil(log2(k))
+    dense_width = 1 if topology == "brent_kung" else HYBRID_DENSE_WIDTH
+    g, b = _and_cost(k)
+    prefix = _sparse_prefix_cost(k, dense_width)
+    return PPACost(1 + prefix.rounds, g + prefix.and_gates, b + prefix.bytes)
+
+
+def select_ppa_topology(
+    size: Optional[int],
+    n_bits: Optional[int] = None,
+    nbits: int = 64,
+    rtt: Optional[float] = None,
+    bandwidth: Optional[float] = None,
+) -> str:
+    """
+    The topology that adds `size` pairs of elements the fastest over links with
+    the given round-trip time, in seconds, and bandwidth, in bytes per second.
+
+    The time of a topology is estimated as `rounds * rtt` plus the bytes sent
+    by one server divided by the bandwidth. Kogge-Stone is returned if the link
+    or the size is unknown, and wins ties.
+    """
+    if size is None or rtt is None or bandwidth is None:
+        return "kogge_stone"
+
+    candidates = ["kogge_stone"]
+    if nbits == 64:
+        candidates += SPARSE_TOPOLOGIES
+
+    def time(topology):
+        cost = ppa_cost(topology, n_bits, nbits)
+        return cost.rounds * rtt + cost.bytes / 3 * size / bandwidth
+
+    return min(candidates, key=time)
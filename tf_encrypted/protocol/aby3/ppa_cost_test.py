@@ -0,0 +1,48 @@
+# pylint: disable=missing-docstring
+import unittest
+
+from tf_encrypted.protocol.aby3.ppa_cost import PPA_TOPOLOGIES
+from tf_encrypted.protocol.aby3.ppa_cost import ppa_cost
+from tf_encrypted.protocol.aby3.ppa_cost import select_ppa_topology
+
+
+class TestPPACost(unittest.TestCase):
+    def test_kogge_stone(self):
+        cost = ppa_cost("kogge_stone")
+        self.assertEqual(cost.rounds, 7)
+        self.assertEqual(cost.and_gates, 13 * 64)
+        self.assertEqual(cost.bytes, 3 * 13 * 8)
+        self.assertEqual(ppa_cost("sklansky"), cost)
+        self.assertEqual(ppa_cost("kogge_stone", n_bits=13).rounds, 5)
+
+    def test_sparse(self):
+        brent_kung = ppa_cost("brent_kung")
+        hybrid = ppa_cost("hybrid")
+        self.assertEqual(brent_kung.rounds, 12)
+        self.assertEqual(hybrid.rounds, 10)
+        self.assertLess(hybrid.bytes, ppa_cost("kogge_stone").bytes // 2)
+        self.assertLess(ppa_cost("hybrid", n_bits=8).rounds, hybrid.rounds)
+
+        with self.assertRaises(NotImplementedError):
+            ppa_cost("brent_kung", nbits=128)
+        with self.assertRaises(NotImplementedError):
+            ppa_cost("ladner_fischer")
+
+    def test_select(self):
+        self.assertEqual(select_ppa_topology(10**6), "kogge_stone")
+        self.assertEqual(
+            select_ppa_topology(10, rtt=0.05, bandwidth=1e8), "kogge_stone"
+        )
+        self.assertEqual(select_ppa_topology(10**6, rtt=1e-4, bandwidth=1e9), "hybrid")
+        self.assertEqual(
+            select_ppa_topology(10**6, nbits=128, rtt=1e-4, bandwidth=1e9),
+            "kogge_stone",
+        )
+        for size in [1, 10**3, 10**6]:
+            self.assertIn(
+                select_ppa_topology(size, rtt=1e-3, bandwidth=1e8), PPA_TOPOLOGIES
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+"""Offline generation of the correlated randomness consumed by ABY3."""
+from collections import Counter
+from collections import OrderedDict
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import numpy as np
+import tensorflow as tf
+
+from ...tensor.factory import AbstractFactory
+from ..protocol import _current_scope
+from ..protocol import clear_graph_nodes
+from .aby3_tensors import ABY3PrivateTensor
+
+ZERO_SHARING = "zero"
+RANDOM_SHARING = "random"
+# For edabits, the truncation amount takes the place of the share type.
+EDABIT = "edabit"
+
+
+class RandomnessPool:
+    """
+    Zero sharings and random sharings generated ahead of the online phase.
+
+    The pool is planned from the requests made while tracing a computation.
+    `fill` then generates all sharings of the same kind, share type and factory
+    together, with a single large seeded sample per server pair, and stores
+    them in variables on the servers. While the pool is installed as
+    `ABY3.randomness_pool`, the online computation slices these variables in
+    the order the requests were planned instead of sampling inline. Requests
+    that were not planned, or that come after the planned ones are used up,
+    fall back to inline sampling.
+
+    Edabits, see `ABY3._gen_edabits`, are generated the same way with the
+    offline conversions between boolean and arithmetic sharings they need.
+
+    Each sharing may only be used once: call `fill` before every execution of
+    a computation that consumes the pool.
+    """
+
+    def __init__(self, prot, requests: List[Tuple]) -> None:
+        self.prot = prot
+        self._sizes = OrderedDict()
+        self._offsets = dict()
+        for kind, shape, share_type, factory in requests:
+            group = (kind, share_type, factory)
+            offset = self._sizes.get(group, 0)
+            self._offsets.setdefault(group + (shape,), []).append(offset)
+            self._sizes[group] = offset + int(np.prod(shape, dtype=np.int64))
+        self._variables = dict()
+        self._share_types = dict()
+        self._cursors = dict()
+        self._reads = dict()
+
+    @classmethod
+    def plan(cls, prot, func: Callable, *args, **kwargs) -> "RandomnessPool":
+        """
+        Trace `func(*args, **kwargs)`, without running it, and return an empty
+        pool for the sharings it requests. `func` may be a `tfe.function`.
+        """
+        python_func = getattr(func, "__wrapped__", func)
+
+        @tf.function
+        def trace():
+            try:
+                python_func(*args, **kwargs)
+            finally:
+                clear_graph_nodes(tf.compat.v1.get_default_graph())
+
+        requests = []
+        prot._randomness_requests = requests
+        try:
+            trace.get_concrete_function()
+        finally:
+            prot._randomness_requests = None
+        return cls(prot, requests)
+
+    @property
+    def size(self) -> int:
+        """Number of elements of each share held by the pool."""
+        return sum(self._sizes.values())
+
+    def fill(self) -> None:
+        """Generate fresh sharings for every planned request."""
+        prot = self.prot
+        with tf.name_scope("randomness-pool"):
+            for group, size in self._sizes.items():
+                kind, share_type, factory = group
+                if kind == ZERO_SHARING:
+                    a = prot._sample_zero_sharing([size], share_type, factory)
+                    values = [[a[0]], [a[1]], [a[2]]]
+                elif kind == EDABIT:
+                    edabits = prot._sample_edabits([size], share_type, factory)
+                    self._share_types[group] = [t.share_type for t in edabits]
+                    values = [
+                        [v for t in edabits for v in t.unwrapped[i]] for i in range(3)
+                    ]
+                else:
+                    values = prot._sample_random_sharing(
+                        [size], share_type, factory
+                    ).unwrapped
+
+                variables = self._variables.get(group, None)
+                if variables is None:
+                    variables = [None, None, None]
+                    for i in range(3):
+                        with tf.device(prot.servers[i].device_name):
+                            variables[i] = [factory.variable(v) for v in values[i]]
+                    self._variables[group] = variables
+                else:
+                    for i in range(3):
+                        with tf.device(prot.servers[i].device_name):
+                            for variable, v in zip(variables[i], values[i]):
+                                variable.assign(v)
+        self._cursors = dict()
+        self._reads = dict()
+
+    def take(
+        self, kind: str, shape, share_type: str, factory: AbstractFactory
+    ) -> Optional[List]:
+        """
+        Slice the next planned sharing with the given signature out of the pool,
+        returning None if there is none left.
+        """
+        group = (kind, share_type, factory)
+        offsets = self._offsets.get(group + (shape,), None)
+        variables = self._variables.get(group, None)
+        if offsets is None or variables is None:
+            return None
+
+        # every trace, and the eager context, consume the pool from the start
+        scope = _current_scope()
+        cursor = self._cursors.setdefault(scope, Counter())
+        index = cursor[group + (shape,)]
+        if index >= len(offsets):
+            return None
+        cursor[group + (shape,)] += 1
+
+        start = offsets[index]
+        end = start + int(np.prod(shape, dtype=np.int64))
+        shares = [None, None, None]
+        with tf.name_scope("pooled-{}-sharing".format(kind)):
+            values = self._reads.get((scope, group), None)
+            if values is None:
+                values = [None, None, None]
+                for i in range(3):
+                    with tf.device(self.prot.servers[i].device_name):
+                        values[i] = [v.read_value() for v in variables[i]]
+                self._reads[(scope, group)] = values
+            for i in range(3):
+                with tf.device(self.prot.servers[i].device_name):
+                    shares[i] = [v[start:end].reshape(list(shape)) for v in values[i]]
+
+        if kind == ZERO_SHARING:
+            return [s[0] for s in shares]
+        if kind == EDABIT:
+            return tuple(
+                ABY3PrivateTensor(
+                    self.prot, [s[2 * j : 2 * j + 2] for s in shares], False, t
+                )
+                for j, t in enumerate(self._share_types[group])
+            )
+        return ABY3PrivateTensor(self.prot, shares, True, share_type)
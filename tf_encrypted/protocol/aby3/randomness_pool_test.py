@@ -0,0 +1,99 @@
+# pylint: disable=missing-docstring
+import unittest
+
+import numpy as np
+import pytest
+import tensorflow as tf
+
+import tf_encrypted as tfe
+from tf_encrypted.protocol.aby3 import ABY3
+from tf_encrypted.protocol.aby3 import ShareType
+from tf_encrypted.protocol.aby3.randomness_pool import ZERO_SHARING
+from tf_encrypted.tensor import factories
+
+
+@pytest.mark.aby3
+class TestRandomnessPool(unittest.TestCase):
+    def setUp(self):
+        self.debug_mode = tfe.get_config().debug
+        tfe.get_config().set_debug_mode(False)
+
+    def tearDown(self):
+        tfe.get_config().set_debug_mode(self.debug_mode)
+
+    def test_zero_sharing(self):
+        prot = ABY3()
+        tfe.set_protocol(prot)
+
+        def zero():
+            a = prot._gen_zero_sharing([2, 3])
+            b = prot._gen_zero_sharing([4], share_type=ShareType.BOOLEAN)
+            c = prot._gen_zero_sharing([5], ShareType.BOOLEAN, factories[tf.bool])
+            return a, b, c
+
+        pool = prot.preprocess_randomness(zero)
+        self.assertEqual(pool.size, 15)
+
+        for _ in range(2):
+            a, b, c = zero()
+            np.testing.assert_array_equal((a[0] + a[1] + a[2]).value, np.zeros([2, 3]))
+            np.testing.assert_array_equal((b[0] ^ b[1] ^ b[2]).value, np.zeros([4]))
+            np.testing.assert_array_equal((c[0] ^ c[1] ^ c[2]).value, np.zeros([5]))
+            pool.fill()
+
+    def test_preprocess_function(self):
+        prot = ABY3()
+        tfe.set_protocol(prot)
+
+        x = tfe.define_private_variable(np.random.uniform(-1, 1, size=(4, 5)))
+        w = tfe.define_private_variable(np.random.uniform(-1, 1, size=(5, 3)))
+        expected = np.maximum(
+            x.reveal().to_native().numpy() @ w.reveal().to_native().numpy(), 0
+        )
+
+        @tfe.function
+        def dense_relu(x, w):
+            return tfe.relu(tfe.matmul(x, w)).reveal().to_native()
+
+        pool = prot.preprocess_randomness(dense_relu, x, w)
+
+        inline_samples = []
+        sample = prot._sample_zero_sharing
+
+        def counting_sample(*args, **kwargs):
+            inline_samples.append(args)
+            return sample(*args, **kwargs)
+
+        prot._sample_zero_sharing = counting_sample
+
+        for _ in range(2):
+            result = dense_relu(x, w)
+            np.testing.assert_allclose(result, expected, rtol=0.0, atol=0.01)
+            pool.fill()
+
+        # the online trace only slices the pool, each fill samples once per group
+        zero_groups = [g for g in pool._sizes if g[0] == ZERO_SHARING]
+        self.assertEqual(len(inline_samples), 2 * len(zero_groups))
+
+    def test_edabits(self):
+        prot = ABY3()
+        tfe.set_protocol(prot)
+
+        def edabits():
+            r, r_bits = prot._gen_edabits([3, 4])
+            t, t_msb, s = prot._gen_edabits([5], amount=16)
+            return r, r_bits, t, t_msb, s
+
+        pool = prot.preprocess_randomness(edabits)
+        self.assertEqual(pool.size, 17)
+
+        for _ in range(2):
+            r, r_bits, t, t_msb, s = [x.reveal().to_native() for x in edabits()]
+            np.testing.assert_array_equal(r, r_bits)
+            np.testing.assert_array_equal(t_msb, (t < 0).numpy().astype(np.int64))
+            np.testing.assert_array_equal(s, (t.numpy() & ((1 << 63) - 1)) >> 16)
+            pool.fill()
+
+
+if __name__ == "__main__":
+    unittest.main()
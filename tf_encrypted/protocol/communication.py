@@ -0,0 +1,210 @@
+"""Accounting of the communication between players of a computation."""
+import contextlib
+import json
+import re
+from collections import OrderedDict
+from collections import namedtuple
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+
+import tensorflow as tf
+
+from ..config import get_config
+from .protocol import METHOD_SCOPE_PREFIX
+from .protocol import clear_graph_nodes
+from .protocol import method_scopes
+
+UNATTRIBUTED = "<none>"
+
+CommunicationEdge = namedtuple(
+    "CommunicationEdge",
+    ["method", "source", "destination", "bytes", "round", "tensor"],
+)
+CommunicationEdge.__doc__ = """
+A tensor sent from the `source` to the `destination` player, by the innermost
+protocol `method` that consumed it on the destination. `round` is the number
+of sequential messages on the longest path leading to this one, starting at 1.
+"""
+
+
+class CommunicationReport:
+    """Bytes and rounds of communication of a computation."""
+
+    def __init__(self, edges: List[CommunicationEdge]) -> None:
+        self.edges = edges
+
+    @property
+    def bytes(self) -> int:
+        return sum(edge.bytes for edge in self.edges)
+
+    @property
+    def rounds(self) -> int:
+        return max((edge.round for edge in self.edges), default=0)
+
+    def by_method(self) -> Dict[str, Dict[str, int]]:
+        """Bytes, messages and rounds aggregated per protocol method."""
+        methods = OrderedDict()
+        rounds = dict()
+        for edge in self.edges:
+            stats = methods.setdefault(
+                edge.method, {"bytes": 0, "messages": 0, "rounds": 0}
+            )
+            stats["bytes"] += edge.bytes
+            stats["messages"] += 1
+            rounds.setdefault(edge.method, set()).add(edge.round)
+        for method, stats in methods.items():
+            stats["rounds"] = len(rounds[method])
+        return methods
+
+    def by_link(self) -> Dict[str, int]:
+        """Bytes aggregated per pair of players, as `"source->destination"`."""
+        links = OrderedDict()
+        for edge in self.edges:
+            link = "{}->{}".format(edge.source, edge.destination)
+            links[link] = links.get(link, 0) + edge.bytes
+        return links
+
+    def to_dict(self) -> Dict:
+        return {
+            "bytes": self.bytes,
+            "rounds": self.rounds,
+            "methods": self.by_method(),
+            "links": self.by_link(),
+            "edges": [edge._asdict() for edge in self.edges],
+        }
+
+    def to_json(self, filename: Optional[str] = None, indent: int = 2) -> str:
+        """Serialize the report, and write it to `filename` if given."""
+        result = json.dumps(self.to_dict(), indent=indent)
+        if filename is not None:
+            with open(filename, "w") as f:
+                f.write(result)
+        return result
+
+    def __repr__(self) -> str:
+        return "CommunicationReport(bytes={}, rounds={}, messages={})".format(
+            self.bytes, self.rounds, len(self.edges)
+        )
+
+
+def _tensor_bytes(tensor: tf.Tensor) -> int:
+    if not tensor.shape.is_fully_defined():
+        return 0
+    try:
+        itemsize = tensor.dtype.size
+    except TypeError:
+        # resources, variants and strings have no fixed size
+        return 0
+    return tensor.shape.num_elements() * itemsize
+
+
+def _method_of(op: tf.Operation) -> str:
+    scopes = [
+        scope for scope in op.name.split("/") if scope.startswith(METHOD_SCOPE_PREFIX)
+    ]
+    if not scopes:
+        return UNATTRIBUTED
+    # drop the suffix TensorFlow adds to make repeated scope names unique
+    return re.sub(r"_\d+$", "", scopes[-1][len(METHOD_SCOPE_PREFIX) :])
+
+
+def analyze_graph(graph: tf.Graph) -> CommunicationReport:
+    """
+    Find the tensors that cross from one player's device to another in `graph`.
+
+    A tensor consumed several times on the same device is counted once, since
+    it is only sent once. Communication inside nested functions, e.g. bodies
+    of while loops, is not included.
+    """
+    players = dict()
+    for player in get_config().players:
+        players[tf.DeviceSpec.from_string(player.device_name).to_string()] = player.name
+
+    def player_of(device):
+        if not device:
+            return None
+        device = tf.DeviceSpec.from_string(device).to_string()
+        return players.get(device, device)
+
+    edges = []
+    sent = set()
+    depth = dict()
+    for op in graph.get_operations():
+        destination = player_of(op.device)
+        op_depth = 0
+        for tensor in op.inputs:
+            source = player_of(tensor.op.device)
+            crossing = source is not None and destination is not None
+            crossing = crossing and source != destination
+            if crossing and (tensor.name, destination) not in sent:
+                sent.add((tensor.name, destination))
+                edges.append(
+                    CommunicationEdge(
+                        method=_method_of(op),
+                        source=source,
+                        destination=destination,
+                        bytes=_tensor_bytes(tensor),
+                        round=depth[tensor.op.name] + 1,
+                        tensor=tensor.name,
+                    )
+                )
+            op_depth = max(op_depth, depth[tensor.op.name] + int(crossing))
+        for control_op in op.control_inputs:
+            source = player_of(control_op.device)
+            crossing = source is not None and destination is not None
+            crossing = crossing and source != destination
+            op_depth = max(op_depth, depth[control_op.name] + int(crossing))
+        depth[op.name] = op_depth
+
+    return CommunicationReport(edges)
+
+
+@contextlib.contextmanager
+def _distinct_player_devices():
+    """
+    Give every player its own device while tracing, as players of a local
+    configuration otherwise all share the same CPU and nothing crosses devices.
+    """
+    players = get_config().players
+    devices = [player.device_name for player in players]
+    if len(set(devices)) == len(devices):
+        yield
+        return
+
+    for player in players:
+        player.device_name = "/job:{}/replica:0/task:0/device:CPU:0".format(
+            player.name
+        )
+    try:
+        yield
+    finally:
+        for player, device in zip(players, devices):
+            player.device_name = device
+
+
+def communication_stats(func: Callable, *args, **kwargs) -> CommunicationReport:
+    """
+    Trace `func(*args, **kwargs)`, without running it, and report which tensors
+    it sends between players, attributed to the protocol methods creating them.
+    `func` may be a `tfe.function`.
+
+    .. code-block:: python
+
+        report = tfe.communication_stats(predict, x)
+        report.to_json("predict-communication.json")
+    """
+    python_func = getattr(func, "__wrapped__", func)
+
+    @tf.function
+    def trace():
+        try:
+            with method_scopes():
+                python_func(*args, **kwargs)
+        finally:
+            clear_graph_nodes(tf.compat.v1.get_default_graph())
+
+    with _distinct_player_devices():
+        graph = trace.get_concrete_function().graph
+        return analyze_graph(graph)
@@ -0,0 +1,125 @@
+# pylint: disable=missing-docstring
+import json
+import unittest
+
+import numpy as np
+import tensorflow as tf
+
+import tf_encrypted as tfe
+from tf_encrypted.protocol import ABY3
+
+
+class TestCommunicationStats(unittest.TestCase):
+    def setUp(self):
+        self.debug_mode = tfe.get_config().debug
+        tfe.get_config().set_debug_mode(False)
+
+    def tearDown(self):
+        tfe.get_config().set_debug_mode(self.debug_mode)
+
+    def test_private_mul(self):
+        prot = ABY3()
+        tfe.set_protocol(prot)
+        devices = [player.device_name for player in tfe.get_config().players]
+
+        x = tfe.define_private_variable(np.ones((2, 3)))
+        y = tfe.define_private_variable(np.ones((2, 3)))
+
+        @tfe.function
+        def mul(x, y):
+            return x * y
+
+        report = tfe.communication_stats(mul, x, y)
+
+        methods = report.by_method()
+        self.assertIn("mul", methods)
+        # each server sends its 2x3 share of the product to the next one
+        self.assertGreaterEqual(methods["mul"]["bytes"], 3 * 6 * 8)
+        self.assertGreaterEqual(report.rounds, 1)
+        self.assertEqual(report.bytes, sum(report.by_link().values()))
+
+        exported = json.loads(report.to_json())
+        self.assertEqual(exported["bytes"], report.bytes)
+        self.assertEqual(len(exported["edges"]), len(report.edges))
+
+        self.assertEqual(
+            [player.device_name for player in tfe.get_config().players], devices
+        )
+
+    def test_private_add(self):
+        prot = ABY3()
+        tfe.set_protocol(prot)
+
+        x = tfe.define_private_variable(np.ones((2, 3)))
+        y = tfe.define_private_variable(np.ones((2, 3)))
+
+        # additions are local to each server
+        report = tfe.communication_stats(lambda: x + y)
+        self.assertEqual(report.bytes, 0)
+        self.assertEqual(report.rounds, 0)
+
+    def test_private_dot(self):
+        prot = ABY3()
+        tfe.set_protocol(prot)
+
+        x = tfe.define_private_variable(np.ones((100, 10)))
+        y = tfe.define_private_variable(np.ones((100, 10)))
+
+        # only the 100 sums are reshared and truncated, not the 1000 products
+        fused = tfe.communication_stats(lambda: prot.dot(x, y, axis=1))
+        unfused = tfe.communication_stats(lambda: prot.reduce_sum(x * y, axis=1))
+        self.assertLess(fused.bytes * 5, unfused.bytes)
+        self.assertLessEqual(fused.rounds, unfused.rounds)
+
+    def test_forwarded_ot(self):
+        prot = ABY3()
+        tfe.set_protocol(prot)
+
+        x = tfe.define_private_variable(np.ones((100, 10)))
+        c = x > 0
+
+        # the sender sends its two masked messages to one receiver instead of two
+        parallel = tfe.communication_stats(lambda: prot.mul_ab(x, c, "parallel_ot"))
+        forwarded = tfe.communication_stats(lambda: prot.mul_ab(x, c, "forwarded_ot"))
+        self.assertLess(forwarded.bytes, parallel.bytes)
+        self.assertEqual(forwarded.rounds, parallel.rounds + 1)
+
+    def test_edabits(self):
+        x = np.random.uniform(-1, 1, size=(100, 10))
+
+        def stats(prot, func):
+            tfe.set_protocol(prot)
+            y = tfe.define_private_variable(x)
+            if prot.edabits:
+                prot.preprocess_randomness(func, y)
+            return tfe.communication_stats(func, y)
+
+        # the offline edabits leave one opening before the local part of the
+        # truncation, and before the carry tree of the comparison
+        for func in [lambda y: tfe.msb(-y), lambda y: tfe.truncate(-y)]:
+            prot = ABY3()
+            default = stats(prot, func)
+            prot = ABY3(edabits=True)
+            edabit = stats(prot, func)
+            self.assertLess(edabit.rounds, default.rounds)
+            self.assertLess(edabit.bytes, default.bytes)
+
+    def test_private_input(self):
+        prot = ABY3()
+        tfe.set_protocol(prot)
+        full_share = 100 * 10 * 8
+
+        for owner, copies in [("input-provider", 2), ("server0", 1), ("server2", 1)]:
+
+            def share():
+                x = tfe.define_private_input(owner, lambda: tf.ones([100, 10]))
+                return x.unwrapped
+
+            # two of the shares are sent as seeds, the third in full
+            report = tfe.communication_stats(share)
+            self.assertGreaterEqual(report.bytes, copies * full_share)
+            self.assertLess(report.bytes, (copies + 1) * full_share)
+
+
+if __name__ == "__main__":
+    unittest.main()
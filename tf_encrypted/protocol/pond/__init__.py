@@ -9,9 +9,11 @@ from .pond import PondPrivateTensor
 from .pond import PondPrivateVariable
 from .pond import PondPublicTensor
 from .pond import PondPublicVariable
+from .pond import PondUntruncatedTensor
 from .pond import PondTensor
 from .pond import TFEInputter
 from .pond import _type
+from .triple_sources import FileTripleSource
 from .triple_sources import OnlineTripleSource
 
 # from .triple_sources import QueuedOnlineTripleSource
@@ -25,9 +27,11 @@ __all__ = [
     "PondPublicVariable",
     "PondPrivateVariable",
     "PondMaskedVariable",
+    "PondUntruncatedTensor",
     "TFEInputter",
     "_type",
     "OnlineTripleSource",
+    "FileTripleSource",
     "QueuedOnlineTripleSource",
     "AdditiveFIFOQueue",
 ]
@@ -4,6 +4,7 @@
 Pond is a vectorized two-party secret sharing protocol similar to SPDZ with a
 generalized implementation of Beaver triples that are produced by a third-party
 helper."""
+
 from __future__ import absolute_import
 
 import abc
@@ -40,6 +41,7 @@ from ...tensor.factory import AbstractVariable
 from ...tensor.fixed import FixedpointConfig
 from ...tensor.fixed import _validate_fixedpoint_config
 from ...tensor.helpers import inverse
+from ...tensor.shared import out_size
 from ..protocol import Protocol
 from ..protocol import TFEPrivateTensor
 from ..protocol import TFEPrivateVariable
@@ -47,8 +49,9 @@ from ..protocol import TFEPublicTensor
 from ..protocol import TFEPublicVariable
 from ..protocol import TFETensor
 from ..protocol import TFETensorBone
+from ..protocol import _current_scope
+from ..protocol import dispatch_table
 from ..protocol import memoize
-from ..protocol import nodes
 from .triple_sources import BaseTripleSource
 from .triple_sources import OnlineTripleSource
 
@@ -76,6 +79,9 @@ class Pond(Protocol):
     :param AbstractFactory tensor_factory: Which backing type of tensor you would
         like to use, e.g. `int100` or `int64`
     :param Player fixedpoint_config: Parameters for fixed-point precision tensors
+    :param bool lazy_truncation: Whether to defer the truncation of products of
+        scaled private tensors until their sums, differences and negations are
+        used by any other operation.
     """  # noqa:E501
 
     def __init__(
@@ -84,6 +90,7 @@ class Pond(Protocol):
         server_1=None,
         triple_source=None,
         fixedpoint_config=None,
+        lazy_truncation=False,
     ) -> None:
         config = get_config()
         self.server_0 = config.get_player(server_0 if server_0 else "server0")
@@ -124,6 +131,7 @@ class Pond(Protocol):
         else:
             raise ValueError("Don't know how to handle {}".format(fixedpoint_config))
         _validate_fixedpoint_config(self.fixedpoint_config, self.tensor_factory)
+        self.lazy_truncation = lazy_truncation
 
     def define_constant(
         self,
@@ -279,6 +287,7 @@ class Pond(Protocol):
         share_type: str = None,
         name: Optional[str] = None,
         factory: Optional[AbstractFactory] = None,
+        persistent_mask: bool = False,
     ):
         """Define a private variable.
 
@@ -296,6 +305,11 @@ class Pond(Protocol):
         :param str name: What name to give to this node in the graph.
         :param AbstractFactory factory: Which tensor type to represent this value
             with.
+        :param bool persistent_mask: Whether to mask the value once and keep the
+            mask, and the opened masked difference, in variables that every
+            multiplication with the variable reuses until it is assigned. Suited to
+            model weights; the variable must be captured rather than passed as an
+            argument to a `tfe.function` for the mask to be found.
         """
         init_val_types = (np.ndarray, tf.Tensor, PondPublicTensor, PondPrivateTensor)
         assert isinstance(initial_value, init_val_types), type(initial_value)
@@ -344,8 +358,28 @@ class Pond(Protocol):
                 x1 = factory.variable(v1)
 
         x = PondPrivateVariable(self, x0, x1, apply_scaling)
+        if persistent_mask:
+            with tf.name_scope("persistent-mask{}".format(suffix)):
+                x.masked_variable = self._define_masked_variable(x)
         return x
 
+    def _define_masked_variable(self, x: "PondPrivateVariable"):
+        masked = _mask_private(self, x)
+        a, a0, a1, alpha_on_0, alpha_on_1 = masked.unwrapped
+
+        with tf.device(self.triple_source.producer.device_name):
+            a = a.factory.variable(a)
+        with tf.device(self.server_0.device_name):
+            a0 = a0.factory.variable(a0)
+            alpha_on_0 = alpha_on_0.factory.variable(alpha_on_0)
+        with tf.device(self.server_1.device_name):
+            a1 = a1.factory.variable(a1)
+            alpha_on_1 = alpha_on_1.factory.variable(alpha_on_1)
+
+        return PondMaskedVariable(
+            self, x, a, a0, a1, alpha_on_0, alpha_on_1, x.is_scaled
+        )
+
     def fifo_queue(self, capacity, shape, shared_name):
         return AdditiveFIFOQueue(
             protocol=self,
@@ -863,6 +897,12 @@ class Pond(Protocol):
                 with tf.device(self.server_1.device_name):
                     var1.assign(val1)
 
+            if variable.masked_variable is not None:
+                # the persistent mask is replaced along with the value
+                with tf.name_scope("persistent-mask"):
+                    masked = _mask_private(self, value)
+                    variable.masked_variable.assign(masked)
+
         elif isinstance(variable, PondPublicVariable):
             assert isinstance(value, PondPublicTensor), type(value)
             assert (
@@ -897,7 +937,11 @@ class Pond(Protocol):
         :param PondTensor x: The first operand.
         :param PondTensor y: The second operand.
         """
+        bounded = self._is_single_precision(x) and self._is_single_precision(y)
         x, y = self.lift(x, y)
+        z = self._untruncated_linear("add", x, y) if bounded else None
+        if z is not None:
+            return z
         return self.dispatch("add", x, y)
 
     # pylint: disable=inconsistent-return-statements
@@ -969,6 +1013,15 @@ class Pond(Protocol):
     @memoize
     def reduce_sum(self, x, axis=None, keepdims=None):
         x = self.lift(x)
+        if isinstance(x, PondUntruncatedTensor):
+            axes = range(len(x.shape)) if axis is None else np.atleast_1d(axis)
+            dims = [x.shape[a] for a in axes]
+            terms = x.terms * int(np.prod(dims)) if None not in dims else None
+            if terms is not None and self._fits_untruncated(terms):
+                z = self.dispatch(
+                    "reduce_sum", x.untruncated, axis=axis, keepdims=keepdims
+                )
+                return PondUntruncatedTensor(self, z, terms)
         return self.dispatch("reduce_sum", x, axis=axis, keepdims=keepdims)
 
     def sum(self, x, axis=None, keepdims=None):
@@ -986,9 +1039,78 @@ class Pond(Protocol):
 
     @memoize
     def sub(self, x, y):
+        bounded = self._is_single_precision(x) and self._is_single_precision(y)
         x, y = self.lift(x, y)
+        z = self._untruncated_linear("sub", x, y) if bounded else None
+        if z is not None:
+            return z
         return self.dispatch("sub", x, y)
 
+    def _truncate_product(self, z):
+        """
+        Truncate the product `z` of two scaled tensors, or defer its truncation
+        when `lazy_truncation` is enabled.
+        """
+        if self.lazy_truncation and isinstance(z, PondPrivateTensor):
+            return PondUntruncatedTensor(self, z, 1)
+        return self.truncate(z)
+
+    def _is_single_precision(self, x):
+        """
+        Whether `x` may be scaled up to double precision when added to a
+        `PondUntruncatedTensor`. Tensors are assumed to be bounded, like for
+        any multiplication, but constants are checked.
+        """
+        if isinstance(x, (int, float, np.ndarray)):
+            bound = self.fixedpoint_config.bound_single_precision
+            return np.max(np.abs(x)) * self.fixedpoint_config.scaling_factor < bound
+        return True
+
+    def _fits_untruncated(self, terms):
+        """
+        Overflow check for deferred truncation: a sum of `terms` values of double
+        precision must stay within `bound_intermediate_results`.
+        """
+        config = self.fixedpoint_config
+        return (
+            terms * config.bound_double_precision <= config.bound_intermediate_results
+        )
+
+    def _untruncated_linear(self, op, x, y):
+        """
+        Add or subtract `x` and `y` without truncating when one of them is a
+        `PondUntruncatedTensor`, scaling up the other one locally. Returns None
+        when this is not possible, in which case both operands are truncated.
+        """
+        if not any(isinstance(t, PondUntruncatedTensor) for t in (x, y)):
+            return None
+        if not all(
+            t.is_scaled and isinstance(t, (PondPublicTensor, PondPrivateTensor))
+            for t in (x, y)
+        ):
+            return None
+
+        terms = sum(
+            t.terms if isinstance(t, PondUntruncatedTensor) else 1 for t in (x, y)
+        )
+        if not self._fits_untruncated(terms):
+            return None
+
+        operands = []
+        for t in (x, y):
+            if isinstance(t, PondUntruncatedTensor):
+                operands.append(t.untruncated)
+            else:
+                factor = self.define_constant(
+                    np.array(self.fixedpoint_config.scaling_factor),
+                    apply_scaling=False,
+                    factory=t.backing_dtype,
+                )
+                operands.append(self.mul(t, factor))
+
+        z = self.dispatch(op, *operands)
+        return PondUntruncatedTensor(self, z, terms)
+
     def mask(self, x):
         """Convert to a PondMaskedTensor."""
         if isinstance(x, (list, tuple)):
@@ -996,18 +1118,21 @@ class Pond(Protocol):
             return [self.mask(xi) for xi in x]
 
         node_key = ("mask", x)
-        x_masked = nodes.get(node_key, None)
+        x_masked = self.nodes.get(node_key, None)
 
         if x_masked is not None:
             return x_masked
 
-        if isinstance(x, PondPrivateTensor):
+        if getattr(x, "masked_variable", None) is not None:
+            x_masked = x.masked_variable.read_value()
+
+        elif isinstance(x, PondPrivateTensor):
             x_masked = _mask_private(self, x)
 
         else:
             raise TypeError("Don't know how to mask {}".format(type(x)))
 
-        nodes[node_key] = x_masked
+        self.nodes[node_key] = x_masked
         return x_masked
 
     @memoize
@@ -1081,7 +1206,7 @@ class Pond(Protocol):
         """
 
         node_key = ("transpose", x)
-        x_t = nodes.get(node_key, None)
+        x_t = self.nodes.get(node_key, None)
 
         if x_t is not None:
             return x_t
@@ -1098,7 +1223,7 @@ class Pond(Protocol):
         else:
             raise TypeError("Don't know how to transpose {}".format(type(x)))
 
-        nodes[node_key] = x_t
+        self.nodes[node_key] = x_t
         return x_t
 
     @memoize
@@ -1132,6 +1257,9 @@ class Pond(Protocol):
 
         :param PondTensor x: Input tensor.
         """
+        if isinstance(x, PondUntruncatedTensor):
+            z = self.dispatch("negative", x.untruncated)
+            return PondUntruncatedTensor(self, z, x.terms)
         return self.dispatch("negative", x)
 
     @memoize
@@ -1174,7 +1302,7 @@ class Pond(Protocol):
 
         node_key = ("strided_slice", x)
 
-        x_sliced = nodes.get(node_key, None)
+        x_sliced = self.nodes.get(node_key, None)
 
         if x_sliced is not None:
             return x_sliced
@@ -1185,13 +1313,13 @@ class Pond(Protocol):
             x_sliced = _strided_slice_private(self, x, args, kwargs)
         elif isinstance(x, PondMaskedTensor):
             x_sliced = _strided_slice_masked(self, x, args, kwargs)
-            nodes[("strided_slice", x.unmasked)] = x_sliced.unmasked
+            self.nodes[("strided_slice", x.unmasked)] = x_sliced.unmasked
         else:
             raise TypeError(
                 ("Don't know how to do a strided slice on " " {}").format(type(x))
             )
 
-        nodes[node_key] = x_sliced
+        self.nodes[node_key] = x_sliced
 
         return x_sliced
 
@@ -1209,7 +1337,7 @@ class Pond(Protocol):
         """See tf.stack."""
 
         node_key = ("stack", tuple(xs))
-        xs_stack = nodes.get(node_key, None)
+        xs_stack = self.nodes.get(node_key, None)
 
         if xs_stack is not None:
             return xs_stack
@@ -1225,7 +1353,7 @@ class Pond(Protocol):
         else:
             raise TypeError("Don't know how to do a stack {}".format(type(xs)))
 
-        nodes[node_key] = xs_stack
+        self.nodes[node_key] = xs_stack
 
         return xs_stack
 
@@ -1380,7 +1508,7 @@ class Pond(Protocol):
         """See tf.nn.conv2d."""
 
         node_key = ("conv2d", x, w, strides, padding)
-        z = nodes.get(node_key, None)
+        z = self.nodes.get(node_key, None)
 
         if z is not None:
             return z
@@ -1404,17 +1532,71 @@ class Pond(Protocol):
             )
 
         z = func(self, x, w, strides, padding)
-        nodes[node_key] = z
+        self.nodes[node_key] = z
 
         return z
 
+    @memoize
+    def im2col(self, x, h_filter, w_filter, strides, padding):
+        """
+        :param x: An NCHW image tensor
+
+        :return: PondTensor with shape `[h_filter * w_filter * C, #row * #column * N]`,
+            the patches of `x` as in conv2d.
+        """
+        return self.dispatch("im2col", x, h_filter, w_filter, strides, padding)
+
+    @memoize
+    def depthwise_conv2d(self, x, w, strides, padding):
+        """
+        See tf.nn.depthwise_conv2d, with `x` in NCHW format and `w` of shape
+        `[h_filter, w_filter, in_channels, channel_multiplier]`.
+
+        The patches of every channel are extracted separately and multiplied
+        elementwise with the filters of that channel only, then summed over
+        the patch.
+        """
+        x, w = self.lift(x, w)
+        n_x, c_x, h_x, w_x = x.shape.as_list()
+        h_filter, w_filter, in_filters, multiplier = w.shape.as_list()
+        if c_x != in_filters:
+            raise ValueError(
+                "Can't convolve {} channels with filters for {} channels".format(
+                    c_x, in_filters
+                )
+            )
+        h_out, w_out = out_size([h_x, w_x], [h_filter, w_filter], strides, padding)
+
+        with tf.name_scope("depthwise-conv2d"):
+            patches = _depthwise_patches(self, x, h_filter, w_filter, strides, padding)
+            w = self.reshape(w, [h_filter * w_filter, 1, c_x, multiplier])
+            y = self.reduce_sum(self.mul(patches, w), axis=0)
+            y = self.reshape(y, [h_out, w_out, n_x, c_x * multiplier])
+            return self.transpose(y, perm=[2, 3, 0, 1])
+
+    @memoize
+    def depthwise_conv2d_backprop_filter(self, x, d_y, filter_shape, strides, padding):
+        """
+        The gradient of `depthwise_conv2d(x, w, strides, padding)` with respect
+        to `w` of shape `filter_shape`, given the gradient `d_y` of its output.
+        """
+        x, d_y = self.lift(x, d_y)
+        h_filter, w_filter, in_filters, multiplier = filter_shape
+
+        with tf.name_scope("depthwise-conv2d-backprop-filter"):
+            patches = _depthwise_patches(self, x, h_filter, w_filter, strides, padding)
+            d_y = self.transpose(d_y, perm=[2, 3, 0, 1])
+            d_y = self.reshape(d_y, [1, -1, in_filters, multiplier])
+            d_w = self.reduce_sum(self.mul(patches, d_y), axis=1)
+            return self.reshape(d_w, filter_shape)
+
     def maxpool2d(self, x, pool_size, strides, padding):
         raise NotImplementedError("Only SecureNN supports Max Pooling")
 
     def avgpool2d(self, x, pool_size, strides, padding):
         """See tf.nn.avgpool2d."""
         node_key = ("avgpool2d", x, tuple(pool_size), tuple(strides), padding)
-        z = nodes.get(node_key, None)
+        z = self.nodes.get(node_key, None)
 
         if z is not None:
             return z
@@ -1430,7 +1612,7 @@ class Pond(Protocol):
             raise TypeError("Don't know how to avgpool2d {}".format(type(x)))
 
         z = func(self, x, pool_size, strides, padding)
-        nodes[node_key] = z
+        self.nodes[node_key] = z
 
         return z
 
@@ -1450,22 +1632,11 @@ class Pond(Protocol):
         Finds the correct protocol logic to perform based on the dispatch_id
         attribute of the input tensors in args.
         """
-        suffix = "_".join(
-            [arg.dispatch_id for arg in args if hasattr(arg, "dispatch_id")]
-        )
-        func_name = "_{}_{}".format(base_name, suffix)
-
         if container is None:
             container = _THISMODULE
 
-        func = getattr(container, func_name, None)
-        if func is not None:
-            return func(self, *args, **kwargs)  # pylint: disable=not-callable
-        raise TypeError(
-            ("Don't know how to {}: " "{}").format(
-                base_name, [type(arg) for arg in args]
-            )
-        )
+        func = dispatch_table(container).resolve(base_name, args)
+        return func(self, *args, **kwargs)  # pylint: disable=not-callable
 
     def pad(self, x: "PondTensor", paddings: list):
         """See tf.pad."""
@@ -2017,6 +2188,56 @@ class PondPrivateTensor(PondTensor, TFEPrivateTensor):
         return self.prot.reveal(self)
 
 
+class PondUntruncatedTensor(PondPrivateTensor):
+    """
+    This class represents a scaled private value whose truncation has been
+    deferred, see the `lazy_truncation` option of Pond.
+
+    The shares of `untruncated` are at double precision and hold a sum of up to
+    `terms` values. Additions, subtractions, negations and sums are computed on
+    these shares; any other use of the tensor, e.g. through `unwrapped`, sees the
+    truncated shares, which are computed at most once per graph.
+    """
+
+    def __init__(self, prot: Pond, untruncated: PondPrivateTensor, terms: int) -> None:
+        assert isinstance(untruncated, PondPrivateTensor), type(untruncated)
+        assert untruncated.is_scaled
+
+        super(PondPrivateTensor, self).__init__(prot, untruncated.is_scaled)
+        self.untruncated = untruncated
+        self.terms = terms
+        self._truncated = {}
+
+    def __repr__(self) -> str:
+        return "PondUntruncatedTensor(shape={}, terms={})".format(
+            self.shape, self.terms
+        )
+
+    def _truncate(self) -> PondPrivateTensor:
+        scope = _current_scope()
+        truncated = self._truncated.get(scope, None)
+        if truncated is None:
+            truncated = self.prot.truncate(self.untruncated)
+            self._truncated[scope] = truncated
+        return truncated
+
+    @property
+    def share0(self) -> AbstractTensor:
+        return self._truncate().share0
+
+    @property
+    def share1(self) -> AbstractTensor:
+        return self._truncate().share1
+
+    @property
+    def shape(self) -> List[int]:
+        return self.untruncated.shape
+
+    @property
+    def backing_dtype(self):
+        return self.untruncated.backing_dtype
+
+
 class PondMaskedTensorBone(PondTensorBone):
     unmasked: PondPrivateTensorBone
     a: tf.Tensor
@@ -2189,6 +2410,7 @@ class PondPrivateVariable(PondPrivateTensor, TFEPrivateVariable):
         )
         self.variable0 = variable0
         self.variable1 = variable1
+        self.masked_variable = None
 
     def __repr__(self) -> str:
         return "PondPrivateVariable(shape={})".format(self.shape)
@@ -2238,7 +2460,7 @@ class PondMaskedVariable(PondMaskedTensor, TFEPrivateVariable):
             alpha_on_1,
             is_scaled,
         )
-        self.var_a = a1
+        self.var_a = a
         self.var_a0 = a0
         self.var_a1 = a1
         self.var_alpha_on_0 = alpha_on_0
@@ -2257,10 +2479,28 @@ class PondMaskedVariable(PondMaskedTensor, TFEPrivateVariable):
             a1 = self.var_a1.read_value()
             alpha_on_1 = self.var_alpha_on_1.read_value()
         y = PondMaskedTensor(
-            self.prot, a, a0, a1, alpha_on_0, alpha_on_1, self.is_scaled
+            self.prot,
+            self.unmasked.read_value(),
+            a,
+            a0,
+            a1,
+            alpha_on_0,
+            alpha_on_1,
+            self.is_scaled,
         )
         return y
 
+    def assign(self, value: PondMaskedTensor) -> None:
+        a, a0, a1, alpha_on_0, alpha_on_1 = value.unwrapped
+        with tf.device(self.prot.triple_source.producer.device_name):
+            self.var_a.assign(a)
+        with tf.device(self.prot.server_0.device_name):
+            self.var_a0.assign(a0)
+            self.var_alpha_on_0.assign(alpha_on_0)
+        with tf.device(self.prot.server_1.device_name):
+            self.var_a1.assign(a1)
+            self.var_alpha_on_1.assign(alpha_on_1)
+
 
 #
 # helpers
@@ -2905,7 +3145,7 @@ def _mul_public_private(prot, x, y):
             z1 = x_on_1 * y1
 
         z = PondPrivateTensor(prot, z0, z1, x.is_scaled or y.is_scaled)
-        z = prot.truncate(z) if x.is_scaled and y.is_scaled else z
+        z = prot._truncate_product(z) if x.is_scaled and y.is_scaled else z
         return z
 
 
@@ -2931,7 +3171,7 @@ def _mul_private_public(prot, x, y):
             z1 = x1 * y_on_1
 
         z = PondPrivateTensor(prot, z0, z1, x.is_scaled or y.is_scaled)
-        z = prot.truncate(z) if x.is_scaled and y.is_scaled else z
+        z = prot._truncate_product(z) if x.is_scaled and y.is_scaled else z
         return z
 
 
@@ -2983,7 +3223,7 @@ def _mul_masked_masked(prot, x, y):
                 z1 = ab1 + (a1 * beta) + (alpha * b1)
 
         z = PondPrivateTensor(prot, z0, z1, x.is_scaled or y.is_scaled)
-        z = prot.truncate(z) if x.is_scaled and y.is_scaled else z
+        z = prot._truncate_product(z) if x.is_scaled and y.is_scaled else z
         return z
 
 
@@ -3080,7 +3320,7 @@ def _square_masked(prot, x):
                 y1 = aa1 + (a1 * alpha) * 2
 
         y = PondPrivateTensor(prot, y0, y1, x.is_scaled)
-        y = prot.truncate(y) if y.is_scaled else y
+        y = prot._truncate_product(y) if y.is_scaled else y
         return y
 
 
@@ -3311,6 +3551,54 @@ def _conv2d_masked_masked(prot, x, y, strides, padding):
         return z
 
 
+#
+# depthwise conv helpers
+#
+
+
+def _im2col_public(prot, x, h_filter, w_filter, strides, padding):
+    assert isinstance(x, PondPublicTensor), type(x)
+
+    x_on_0, x_on_1 = x.unwrapped
+
+    with tf.name_scope("im2col"):
+
+        with tf.device(prot.server_0.device_name):
+            z_on_0 = x_on_0.im2col(h_filter, w_filter, strides, padding)
+
+        with tf.device(prot.server_1.device_name):
+            z_on_1 = x_on_1.im2col(h_filter, w_filter, strides, padding)
+
+        return PondPublicTensor(prot, z_on_0, z_on_1, x.is_scaled)
+
+
+def _im2col_private(prot, x, h_filter, w_filter, strides, padding):
+    assert isinstance(x, PondPrivateTensor), type(x)
+
+    x0, x1 = x.unwrapped
+
+    with tf.name_scope("im2col"):
+
+        with tf.device(prot.server_0.device_name):
+            z0 = x0.im2col(h_filter, w_filter, strides, padding)
+
+        with tf.device(prot.server_1.device_name):
+            z1 = x1.im2col(h_filter, w_filter, strides, padding)
+
+        return PondPrivateTensor(prot, z0, z1, x.is_scaled)
+
+
+def _depthwise_patches(prot, x, h_filter, w_filter, strides, padding):
+    """
+    The patches of each channel of the NCHW image `x`, with shape
+    `[h_filter * w_filter, h_out * w_out * batch, channels, 1]`.
+    """
+    n_x, c_x, h_x, w_x = x.shape.as_list()
+    x = prot.reshape(x, [n_x * c_x, 1, h_x, w_x])
+    patches = prot.im2col(x, h_filter, w_filter, strides, padding)
+    return prot.reshape(patches, [h_filter * w_filter, -1, c_x, 1])
+
+
 #
 # average pooling helpers
 #
@@ -227,6 +227,114 @@ class TestPondAssign(unittest.TestCase):
         np.testing.assert_array_equal(result, np.ones([2, 2]))
 
 
+@pytest.mark.pond
+class TestPersistentMask(unittest.TestCase):
+    def setUp(self):
+        self.debug_mode = tfe.get_config().debug
+        tfe.get_config().set_debug_mode(False)
+
+    def tearDown(self):
+        tfe.get_config().set_debug_mode(self.debug_mode)
+
+    def test_persistent_mask(self):
+        prot = tfe.protocol.Pond()
+        tfe.set_protocol(prot)
+
+        a = np.random.uniform(-1, 1, size=(2, 3))
+        b = np.random.uniform(-1, 1, size=(3, 4))
+        c = np.random.uniform(-1, 1, size=(3, 4))
+        x = prot.define_private_variable(a)
+        w = prot.define_private_variable(b, persistent_mask=True)
+        v = prot.define_private_variable(b)
+
+        @tfe.function
+        def persistent():
+            return tfe.matmul(x, w).reveal().to_native()
+
+        @tfe.function
+        def masked_every_run():
+            return tfe.matmul(x, v).reveal().to_native()
+
+        for _ in range(2):
+            np.testing.assert_allclose(persistent(), a @ b, rtol=0.0, atol=0.01)
+
+        # only the difference of x is opened
+        persistent_bytes = tfe.communication_stats(persistent).bytes
+        masked_bytes = tfe.communication_stats(masked_every_run).bytes
+        self.assertLess(persistent_bytes, masked_bytes)
+
+        # assigning the variable replaces its mask
+        prot.assign(w, prot.define_private_variable(c).read_value())
+        np.testing.assert_allclose(persistent(), a @ c, rtol=0.0, atol=0.01)
+
+
+@pytest.mark.pond
+class TestDepthwiseConv2D(unittest.TestCase):
+    def test_depthwise_conv2d(self):
+        prot = tfe.protocol.Pond()
+        tfe.set_protocol(prot)
+
+        input_conv = np.random.normal(size=(2, 3, 8, 8))
+        filter_values = np.random.normal(size=(2, 2, 3, 2))
+        x = prot.define_private_variable(input_conv)
+        w = prot.define_private_variable(filter_values)
+        y = prot.depthwise_conv2d(x, w, [1, 1], "VALID")
+
+        expected = tf.nn.depthwise_conv2d(
+            input_conv.transpose(0, 2, 3, 1), filter_values, [1, 1, 1, 1], "VALID"
+        )
+        np.testing.assert_allclose(
+            y.reveal().to_native(),
+            tf.transpose(expected, (0, 3, 1, 2)),
+            rtol=0.0,
+            atol=0.01,
+        )
+
+
+@pytest.mark.pond
+class TestLazyTruncation(unittest.TestCase):
+    def test_sum_of_products(self):
+        for fixedpoint_config in ["low", "high"]:
+            prot = tfe.protocol.Pond(
+                fixedpoint_config=fixedpoint_config, lazy_truncation=True
+            )
+            tfe.set_protocol(prot)
+
+            values = [np.random.uniform(-2, 2, size=(3, 4)) for _ in range(6)]
+            a, b, c, d, e, f = [prot.define_private_variable(v) for v in values]
+
+            truncations = []
+            truncate = prot.truncate
+
+            def counting_truncate(*args, **kwargs):
+                truncations.append(args)
+                return truncate(*args, **kwargs)
+
+            prot.truncate = counting_truncate
+
+            z = a * b + c * d - e * f + 1.5
+            self.assertIsInstance(z, tfe.protocol.pond.PondUntruncatedTensor)
+            self.assertEqual(len(truncations), 0)
+
+            expected = values[0] * values[1] + values[2] * values[3]
+            expected = expected - values[4] * values[5] + 1.5
+            np.testing.assert_allclose(
+                z.reveal().to_native(), expected, rtol=0.0, atol=0.01
+            )
+            self.assertEqual(len(truncations), 1)
+
+            # the truncated shares are used by any other operation
+            np.testing.assert_allclose(
+                (z * a).reveal().to_native(), expected * values[0], rtol=0.0, atol=0.05
+            )
+            np.testing.assert_allclose(
+                prot.reduce_sum(prot.negative(a * b), axis=1).reveal().to_native(),
+                -np.sum(values[0] * values[1], axis=1),
+                rtol=0.0,
+                atol=0.01,
+            )
+
+
 if __name__ == "__main__":
     tfe.get_config().set_debug_mode(True)
     unittest.main()
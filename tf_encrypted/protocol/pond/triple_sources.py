@@ -2,11 +2,17 @@
 protocol."""
 import abc
 import logging
+import os
 import random
+from collections import namedtuple
+from typing import Callable
 
+import numpy as np
 import tensorflow as tf
 
 from ...config import get_config
+from ..protocol import _current_scope
+from ..protocol import clear_graph_nodes
 
 logger = logging.getLogger("tf_encrypted")
 
@@ -270,116 +276,224 @@ class OnlineTripleSource(BaseTripleSource):
 #         return d0, d1
 
 
-"""
-class DatasetTripleSource(BaseTripleSource):
+MASK = "mask"
+TRIPLE = "triple"
 
-    # TODO(Morten) manually unwrap and re-wrap of values, should be hidden away
+# a value requested from the triple source, with where to find each of its
+# backing tensors in the record of every player
+_Entry = namedtuple("_Entry", ["kind", "factory", "shape", "listed", "locations"])
+
+
+def _components(x):
+    # CRT tensors are backed by a list of tensors, native ones by a single one
+    if x is None:
+        return []
+    if hasattr(x, "backing"):
+        return list(x.backing)
+    return [x.value]
+
+
+class FileTripleSource(BaseTripleSource):
+    """
+    Masks and triples generated ahead of the online phase and stored in a raw
+    binary file per player.
+
+    `generate_triples` traces a computation and runs it `num` times with the
+    producer generating masks and triples online, writing everything each
+    player receives during a run as one fixed-size record of its file. The
+    records hold the raw bytes of the values, in the order they are requested.
+    `load` then reads the files on each player's device with prefetching
+    `tf.data` iterators, and every further run of the same computation takes
+    the next record instead of involving the producer.
+
+    .. code-block:: python
+
+        source = FileTripleSource("server0", "server1", "server2")
+        tfe.set_protocol(tfe.protocol.Pond(triple_source=source))
+
+        source.generate_triples(predict, x, num=100)  # offline
+        source.load()
+        y = predict(x)  # online, run at most 100 times
+
+    The online computation must request the same masks and triples, in the
+    same order, as when the triples were generated, so run it as a
+    `tfe.function`. Once the records are used up the iterators raise
+    `tf.errors.OutOfRangeError`, as triples must never be reused.
+    """
 
     def __init__(
-        self,
-        player0,
-        player1,
-        producer,
-        capacity=10,
-        directory="/tmp/triples/",
-        support_online_running=False,
+        self, player0, player1, producer, directory="/tmp/triples/", prefetch=2
     ):
         super().__init__(player0, player1, producer)
-        self.capacity = capacity
-        self.dequeuers = list()
-        self.enqueuers = list()
-        self.initializers = list()
         self.directory = directory
-        self.support_online_running = support_online_running
-        if support_online_running:
-            self.dequeue_from_file = tf.placeholder_with_default(True,
-                                                                 shape=[])
-
-    def _build_queues(self, c0, c1):
+        self.prefetch = prefetch
+        self._layout = None
+        self._record_bytes = None
+        self._generated = None
+        self._readers = None
+        self._cursors = dict()
+        self._records = dict()
+
+    @property
+    def players(self):
+        return [self.producer, self.player0, self.player1]
+
+    def filename(self, player) -> str:
+        return os.path.join(self.directory, "{}.bin".format(player.name))
+
+    def generate_triples(self, func: Callable, *args, num: int = 1, **kwargs):
+        """
+        Generate the masks and triples of `num` runs of `func(*args, **kwargs)`
+        and write them to the files of the players, replacing their content.
+        `func` may be a `tfe.function`.
+        """
+        python_func = getattr(func, "__wrapped__", func)
+
+        @tf.function
+        def generate():
+            self._generated = [[], [], []]
+            self._layout = []
+            try:
+                python_func(*args, **kwargs)
+            finally:
+                clear_graph_nodes(tf.compat.v1.get_default_graph())
+            generated, self._generated = self._generated, None
+            return generated
+
+        self._readers = None
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
 
-        def dataset_from_file(filename, dtype, shape):
-            def parse(x):
-                res = tf.parse_tensor(x, out_type=dtype)
-                res = tf.reshape(res, shape)
-                return res
-            iterator = tf.data.TFRecordDataset(filename) \
-                .map(parse) \
-                .make_initializable_iterator()
-            return iterator.get_next(), iterator.initializer
-
-        def dataset_from_queue(queue, dtype, shape):
-            dummy = tf.data.Dataset.from_tensors(0).repeat(None)
-            iterator = (dummy.map(lambda _: queue.dequeue())
-                             .make_initializable_iterator())
-            return iterator.get_next(), iterator.initializer
-            # gen = lambda: queue.dequeue()
-            # dataset = tf.data.Dataset.from_generator(gen, [dtype], [shape])
-            # iterator = dataset.make_one_shot_iterator()
-            # return iterator.get_next(), iterator.initializer
-
-        def sanitize_filename(filename):
-            return filename.replace('/', '__')
-
-        def build_triple_store(mask):
-
-            raw_mask = mask.value
-            factory = mask.factory
-            dtype = mask.factory.native_type
-            shape = mask.shape
-
-            with tf.name_scope("triple-store"):
-
-                q = tf.queue.FIFOQueue(
-                    capacity=self.capacity,
-                    dtypes=[dtype],
-                    shapes=[shape],
+        files = [open(self.filename(player), "wb") for player in self.players]
+        try:
+            for _ in range(num):
+                for f, values in zip(files, generate()):
+                    for value in values:
+                        f.write(value.numpy().tobytes())
+        finally:
+            for f in files:
+                f.close()
+        self._record_bytes = [0, 0, 0]
+        for entry in self._layout:
+            for i, locations in enumerate(entry.locations):
+                for offset, dtype, shape in locations:
+                    size = dtype.size * int(np.prod(shape, dtype=np.int64))
+                    self._record_bytes[i] = max(self._record_bytes[i], offset + size)
+
+    def load(self):
+        """Open the generated files for the online phase."""
+        if self._layout is None:
+            raise RuntimeError("Please call `generate_triples` before `load`.")
+
+        self._readers = [None, None, None]
+        for i, player in enumerate(self.players):
+            if self._record_bytes[i] == 0:
+                continue
+            with tf.device(player.device_name):
+                dataset = tf.data.FixedLengthRecordDataset(
+                    self.filename(player), self._record_bytes[i]
                 )
+                self._readers[i] = iter(dataset.prefetch(self.prefetch))
+        self._cursors = dict()
+        self._records = dict()
 
-                e = q.enqueue(raw_mask)
-                f = os.path.join(self.directory, sanitize_filename(q.name))
-
-                if self.support_online_running:
-                    r, i = tf.cond(
-                        self.dequeue_from_file,
-                        true_fn=lambda: dataset_from_file(f, dtype, shape),
-                        false_fn=lambda: dataset_from_queue(q, dtype, shape),
-                    )
-                else:
-                    r, i = dataset_from_file(f, dtype, shape)
-                d = factory.tensor(r)
+    def mask(self, backing_dtype, shape):
+        if self._readers is not None:
+            return self._read(MASK, backing_dtype, shape)
 
-            return f, q, e, d, i
+        a, d0, d1 = super().mask(backing_dtype, shape)
+        self._write(MASK, [a, d0, d1])
+        return a, d0, d1
 
-        with tf.device(self.player0.device_name):
-            f0, q0, e0, d0, i0 = build_triple_store(c0)
+    def mul_triple(self, a, b):
+        return self._triple(lambda: super(FileTripleSource, self).mul_triple(a, b))
 
-        with tf.device(self.player1.device_name):
-            f1, q1, e1, d1, i1 = build_triple_store(c1)
+    def square_triple(self, a):
+        return self._triple(lambda: super(FileTripleSource, self).square_triple(a))
 
-        self.dequeuers += [(f0, q0.dequeue()), (f1, q1.dequeue())]
-        self.enqueuers += [(e0, e1)]
-        self.initializers += [(i0, i1)]
-        return d0, d1
+    def matmul_triple(self, a, b):
+        return self._triple(lambda: super(FileTripleSource, self).matmul_triple(a, b))
 
-    def initialize(self, sess, tag=None):
-        sess.run(self.initializers, tag=tag)
+    def conv2d_triple(self, a, b, strides, padding):
+        return self._triple(
+            lambda: super(FileTripleSource, self).conv2d_triple(a, b, strides, padding)
+        )
 
-    def generate_triples(self, sess, num=1, tag=None, save_to_file=True):
-        for _ in range(num):
-            sess.run(self.enqueuers, tag=tag)
+    def _build_queues(self, c0, c1):
+        return c0, c1
 
-        if save_to_file:
-            self.save_triples_to_file(sess, num=num, tag=tag)
+    def _triple(self, produce):
+        if self._readers is not None:
+            _, d0, d1 = self._read(TRIPLE)
+            return d0, d1
 
-    def save_triples_to_file(self, sess, num, tag=None):
-        if not os.path.exists(self.directory):
-            os.makedirs(self.directory)
+        d0, d1 = produce()
+        self._write(TRIPLE, [None, d0, d1])
+        return d0, d1
 
-        for filename, dequeue in self.dequeuers:
-            with tf.io.TFRecordWriter(filename) as writer:
-                # size = sess.run(queue.size(), tag=tag)
-                for _ in range(num):
-                    serialized = tf.io.serialize_tensor(dequeue)
-                    triple = sess.run(serialized, tag=tag)
-                    writer.write(triple)
-"""  # pylint: disable=pointless-string-statement
+    def _write(self, kind, values):
+        if self._generated is None:
+            # not generating, the values were produced online
+            return
+
+        value = next(v for v in values if v is not None)
+        locations = [[], [], []]
+        for i, v in enumerate(values):
+            offset = sum(
+                t.dtype.size * t.shape.num_elements() for t in self._generated[i]
+            )
+            for component in _components(v):
+                locations[i].append(
+                    (offset, component.dtype, component.shape.as_list())
+                )
+                offset += component.dtype.size * component.shape.num_elements()
+                self._generated[i].append(component)
+
+        listed = hasattr(value, "backing")
+        self._layout.append(
+            _Entry(kind, value.factory, value.shape.as_list(), listed, locations)
+        )
+
+    def _read(self, kind, factory=None, shape=None):
+        # every trace, and the eager context, starts at the beginning of a record
+        scope = _current_scope()
+        cursor = self._cursors.get(scope, 0)
+        entry = self._layout[cursor]
+        if entry.kind != kind or (
+            kind == MASK and (entry.factory, entry.shape) != (factory, list(shape))
+        ):
+            raise ValueError(
+                "Expected a {} of shape {}, the computation does not match the one "
+                "the triples were generated for".format(entry.kind, entry.shape)
+            )
+
+        with tf.name_scope("stored-{}".format(kind)):
+            if cursor == 0:
+                records = [None, None, None]
+                for i, player in enumerate(self.players):
+                    if self._readers[i] is not None:
+                        with tf.device(player.device_name):
+                            records[i] = tf.io.decode_raw(
+                                next(self._readers[i]), tf.uint8
+                            )
+                self._records[scope] = records
+            records = self._records[scope]
+
+            values = [None, None, None]
+            for i, player in enumerate(self.players):
+                if not entry.locations[i]:
+                    continue
+                with tf.device(player.device_name):
+                    components = []
+                    for offset, dtype, component_shape in entry.locations[i]:
+                        size = int(np.prod(component_shape, dtype=np.int64))
+                        raw = records[i][offset : offset + dtype.size * size]
+                        component = tf.bitcast(
+                            tf.reshape(raw, [size, dtype.size]), dtype
+                        )
+                        components.append(tf.reshape(component, component_shape))
+                    value = components if entry.listed else components[0]
+                    values[i] = entry.factory.tensor(value, encode=False)
+
+        self._cursors[scope] = (cursor + 1) % len(self._layout)
+        return values
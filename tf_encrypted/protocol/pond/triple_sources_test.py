@@ -0,0 +1,75 @@
+# pylint: disable=missing-docstring
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pytest
+import tensorflow as tf
+
+import tf_encrypted as tfe
+from tf_encrypted.protocol.pond import FileTripleSource
+
+
+@pytest.mark.pond
+class TestFileTripleSource(unittest.TestCase):
+    def setUp(self):
+        self.debug_mode = tfe.get_config().debug
+        tfe.get_config().set_debug_mode(False)
+
+    def tearDown(self):
+        tfe.get_config().set_debug_mode(self.debug_mode)
+
+    def test_stored_triples(self):
+        for fixedpoint_config in ["low", "high"]:
+            directory = tempfile.mkdtemp()
+            source = FileTripleSource("server0", "server1", "server2", directory)
+            prot = tfe.protocol.Pond(
+                triple_source=source, fixedpoint_config=fixedpoint_config
+            )
+            tfe.set_protocol(prot)
+
+            a = np.random.uniform(-1, 1, size=(2, 3))
+            b = np.random.uniform(-1, 1, size=(3, 4))
+            x = tfe.define_private_variable(a)
+            w = tfe.define_private_variable(b)
+
+            # int100 tensors can not be passed as arguments of a tfe.function
+            @tfe.function
+            def layer():
+                y = tfe.matmul(x, w)
+                return (y * y + x[:, 0:1] * 2).reveal().to_native()
+
+            source.generate_triples(layer, num=2)
+            for player in source.players:
+                self.assertTrue(os.path.exists(source.filename(player)))
+
+            source.load()
+            expected = np.square(a @ b) + a[:, 0:1] * 2
+            for _ in range(2):
+                np.testing.assert_allclose(layer(), expected, rtol=0.0, atol=0.01)
+
+            # triples are never reused
+            with self.assertRaises(tf.errors.OutOfRangeError):
+                layer()
+
+    def test_different_computation(self):
+        source = FileTripleSource("server0", "server1", "server2", tempfile.mkdtemp())
+        prot = tfe.protocol.Pond(triple_source=source)
+        tfe.set_protocol(prot)
+
+        x = tfe.define_private_variable(np.ones((2, 3)))
+        y = tfe.define_private_variable(np.ones((3, 3)))
+
+        @tfe.function
+        def square(x):
+            return (x * x).reveal().to_native()
+
+        source.generate_triples(square, x)
+        source.load()
+        with self.assertRaisesRegex(ValueError, "does not match"):
+            square(y)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,17 @@
 """Base abstraction for a Protocol."""
+import contextlib
 import functools
+import inspect
+import threading
+import weakref
 from abc import ABC
+from collections import OrderedDict
 from types import TracebackType
 from typing import Any
 from typing import Callable
+from typing import Dict
 from typing import Optional
+from typing import Tuple
 
 import tensorflow as tf
 
@@ -13,7 +20,132 @@ import tf_encrypted as tfe
 from ..config import get_config
 from ..tensor.factory import AbstractTensor
 
-nodes = dict()
+DEFAULT_NODE_CACHE_SIZE = 2**16
+METHOD_SCOPE_PREFIX = "tfe."
+
+_node_caches = weakref.WeakSet()
+_method_scopes_enabled = False
+
+
+def _current_scope():
+    """Scope of cached nodes: the graph being traced, or `None` when eager."""
+    if tf.executing_eagerly():
+        return None
+    return tf.compat.v1.get_default_graph()
+
+
+class NodeCache:
+    """
+    Size-bounded LRU cache for the nodes created by memoized protocol methods.
+
+    Entries are scoped by the graph they are created in, so that nodes of a
+    finished `tfe.function` trace can be dropped without touching the rest.
+    Hits, misses and evictions are counted to help sizing the cache. Access is
+    locked, as inputs may be shared eagerly by a prefetching thread while a
+    model runs.
+
+    :param int maxsize: Maximum number of cached nodes, `None` for no bound.
+    """
+
+    def __init__(self, maxsize: Optional[int] = DEFAULT_NODE_CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._scopes = dict()
+        self._lock = threading.RLock()
+        _node_caches.add(self)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return (_current_scope(), key) in self._entries
+
+    def get(self, key, default=None):
+        entry_key = (_current_scope(), key)
+        with self._lock:
+            value = self._entries.get(entry_key, None)
+            if value is None:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self._entries.move_to_end(entry_key)
+            return value
+
+    def __setitem__(self, key, value) -> None:
+        scope = _current_scope()
+        entry_key = (scope, key)
+        with self._lock:
+            self._entries[entry_key] = value
+            self._entries.move_to_end(entry_key)
+            self._scopes.setdefault(scope, set()).add(key)
+
+            if self.maxsize is None:
+                return
+            while len(self._entries) > self.maxsize:
+                (old_scope, old_key), _ = self._entries.popitem(last=False)
+                self._discard(old_scope, old_key)
+                self.evictions += 1
+
+    def _discard(self, scope, key) -> None:
+        keys = self._scopes.get(scope)
+        keys.discard(key)
+        if not keys:
+            del self._scopes[scope]
+
+    def clear(self, graph=None) -> None:
+        """
+        Drop cached nodes.
+
+        :param tf.Graph graph: Only drop the nodes created in this graph, if given.
+        """
+        with self._lock:
+            if graph is None:
+                self._entries.clear()
+                self._scopes.clear()
+                return
+
+            for key in self._scopes.pop(graph, ()):
+                del self._entries[(graph, key)]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def clear_graph_nodes(graph) -> None:
+    """Drop the nodes created in `graph` from the caches of all protocols."""
+    for cache in list(_node_caches):
+        cache.clear(graph)
+
+
+@contextlib.contextmanager
+def method_scopes():
+    """
+    Name the ops created by memoized protocol methods after the method, e.g.
+    `tfe.mul/...`, so that they can be attributed to it when inspecting a graph.
+    """
+    global _method_scopes_enabled
+    previous = _method_scopes_enabled
+    _method_scopes_enabled = True
+    try:
+        yield
+    finally:
+        _method_scopes_enabled = previous
+
+
+def _method_scope(func: Callable):
+    if not _method_scopes_enabled:
+        return contextlib.nullcontext()
+    return tf.name_scope(METHOD_SCOPE_PREFIX + func.__name__)
 
 
 class Protocol(ABC):
@@ -38,8 +170,15 @@ class Protocol(ABC):
     ) -> Optional[bool]:
         tfe.set_protocol(self.last_protocol)
 
+    @property
+    def nodes(self) -> NodeCache:
+        """Cache of the nodes created by the memoized methods of this protocol."""
+        if getattr(self, "_nodes", None) is None:
+            self._nodes = NodeCache()
+        return self._nodes
+
     def reset(self):
-        pass
+        self.nodes.clear()
 
 
 class TFETensorBone(ABC):
@@ -70,6 +209,102 @@ class TFEPublicVariable(TFEPublicTensor, TFEVariable):
     pass
 
 
+class _IdentityKey:
+    """Hashable stand-in for an unhashable object, compared by identity."""
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj) -> None:
+        # keeping a reference prevents the id from being reused
+        self.obj = obj
+
+    def __hash__(self) -> int:
+        return id(self.obj)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, _IdentityKey) and other.obj is self.obj
+
+
+def _dispatch_ids(cls=TFETensor):
+    """Collect the `dispatch_id` of all known tensor classes."""
+    ids = set()
+    for subclass in cls.__subclasses__():
+        dispatch_id = getattr(subclass, "dispatch_id", None)
+        if isinstance(dispatch_id, str):
+            ids.add(dispatch_id)
+        ids |= _dispatch_ids(subclass)
+    return ids
+
+
+class DispatchTable:
+    """
+    Maps `(base_name, dispatch_ids)` to the implementation of an operation.
+
+    Implementations are the functions of a module named
+    `_<base_name>_<dispatch_id>_..._<dispatch_id>`, e.g. `_mul_private_public`
+    is found under `("mul", ("private", "public"))`. They are collected once
+    per module rather than looked up by name on every dispatch, and resolved
+    implementations are further cached on the types of the arguments.
+    """
+
+    def __init__(self, module) -> None:
+        self.module_name = module.__name__
+        self._table = dict()
+        self._resolved = dict()
+
+        known_ids = _dispatch_ids()
+        for name, func in vars(module).items():
+            if not name.startswith("_") or not inspect.isfunction(func):
+                continue
+            tokens = name[1:].split("_")
+            if tokens[-1] == "":
+                # e.g. `_while_loop_`, which takes no tensor arguments
+                self._table[("_".join(tokens[:-1]), ())] = func
+                continue
+            for i in range(len(tokens) - 1, 0, -1):
+                if tokens[i] not in known_ids:
+                    break
+                self._table[("_".join(tokens[:i]), tuple(tokens[i:]))] = func
+
+    def lookup(self, base_name: str, dispatch_ids: Tuple[str, ...]) -> Callable:
+        func = self._table.get((base_name, dispatch_ids), None)
+        if func is None:
+            available = sorted(ids for name, ids in self._table if name == base_name)
+            raise TypeError(
+                "Don't know how to {} {} tensors in {}, implemented for: {}".format(
+                    base_name,
+                    list(dispatch_ids),
+                    self.module_name,
+                    [list(ids) for ids in available] or "none",
+                )
+            )
+        return func
+
+    def resolve(self, base_name: str, args) -> Callable:
+        """Find the implementation of `base_name` for the given arguments."""
+        key = (base_name, *map(type, args))
+        func = self._resolved.get(key, None)
+        if func is None:
+            dispatch_ids = tuple(
+                [arg.dispatch_id for arg in args if hasattr(arg, "dispatch_id")]
+            )
+            func = self.lookup(base_name, dispatch_ids)
+            self._resolved[key] = func
+        return func
+
+
+_dispatch_tables = dict()
+
+
+def dispatch_table(module) -> DispatchTable:
+    """Return the dispatch table of `module`, building it on first use."""
+    table = _dispatch_tables.get(module, None)
+    if table is None:
+        table = DispatchTable(module)
+        _dispatch_tables[module] = table
+    return table
+
+
 def make_hashable(x):
     if isinstance(x, (tuple, list)):
         return tuple([make_hashable(y) for y in x])
@@ -81,14 +316,14 @@ def make_hashable(x):
         )
     elif isinstance(x, tf.TensorShape):
         return tuple(x.as_list())
+    elif isinstance(x, (tf.Tensor, tf.Variable)):
+        return x.ref()
     else:
         try:
             hash(x)
             return x
         except TypeError:
-            # not safe
-            # collision may happen
-            return str(id(x)) + str(x)
+            return _IdentityKey(x)
 
 
 def memoize(func: Callable) -> Callable:
@@ -104,19 +339,21 @@ def memoize(func: Callable) -> Callable:
     @functools.wraps(func)
     def cache_nodes(self: Protocol, *args: Any, **kwargs: Any) -> AbstractTensor:
         if get_config().debug:
-            return func(self, *args, **kwargs)
+            with _method_scope(func):
+                return func(self, *args, **kwargs)
 
         hashable_args = make_hashable(args)
         hashable_kwargs = make_hashable(kwargs)
         node_key = (func.__name__, hashable_args, hashable_kwargs)
 
-        cached_result = nodes.get(node_key, None)
+        cached_result = self.nodes.get(node_key, None)
         if cached_result is not None:
             return cached_result
 
-        result = func(self, *args, **kwargs)
+        with _method_scope(func):
+            result = func(self, *args, **kwargs)
 
-        nodes[node_key] = result
+        self.nodes[node_key] = result
         return result
 
     return cache_nodes
@@ -174,9 +411,13 @@ def function(func: Callable) -> Callable:
 
     @tf.function
     def graph_function(args, kwargs):
-        args, kwargs = input_wrap(args, kwargs)
-        result = func(*args, **kwargs)
-        result = unwrap_func(result)
+        try:
+            args, kwargs = input_wrap(args, kwargs)
+            result = func(*args, **kwargs)
+            result = unwrap_func(result)
+        finally:
+            # nodes of this trace can never be reused once it is finished
+            clear_graph_nodes(tf.compat.v1.get_default_graph())
         return result
 
     @functools.wraps(func)
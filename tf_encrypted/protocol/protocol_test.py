@@ -0,0 +1,110 @@
+# pylint: disable=missing-docstring
+import unittest
+
+import numpy as np
+import tensorflow as tf
+
+import tf_encrypted as tfe
+from tf_encrypted.protocol import ABY3
+from tf_encrypted.protocol.aby3 import aby3
+from tf_encrypted.protocol.protocol import NodeCache
+from tf_encrypted.protocol.protocol import dispatch_table
+from tf_encrypted.protocol.protocol import make_hashable
+
+
+class TestNodeCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = NodeCache(maxsize=2)
+        cache["a"] = 1
+        cache["b"] = 2
+        self.assertEqual(cache.get("a"), 1)
+        cache["c"] = 3
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(
+            cache.stats(),
+            {"size": 2, "maxsize": 2, "hits": 3, "misses": 1, "evictions": 1},
+        )
+
+    def test_graph_scope(self):
+        cache = NodeCache()
+        cache["a"] = 1
+
+        graph = tf.Graph()
+        with graph.as_default():
+            self.assertIsNone(cache.get("a"))
+            cache["a"] = 2
+            self.assertEqual(cache.get("a"), 2)
+
+        self.assertEqual(cache.get("a"), 1)
+        cache.clear(graph)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.get("a"), 1)
+
+    def test_make_hashable(self):
+        x = tf.constant([1, 2, 3])
+        self.assertEqual(make_hashable((x, [1, 2])), make_hashable((x, [1, 2])))
+
+        y = np.array([1, 2, 3])
+        z = np.array([1, 2, 3])
+        self.assertEqual(make_hashable(y), make_hashable(y))
+        self.assertNotEqual(make_hashable(y), make_hashable(z))
+
+
+class TestDispatchTable(unittest.TestCase):
+    def test_lookup(self):
+        table = dispatch_table(aby3)
+        self.assertIs(dispatch_table(aby3), table)
+        self.assertIs(
+            table.lookup("mul", ("private", "public")), aby3._mul_private_public
+        )
+        self.assertIs(
+            table.lookup("mul_ab", ("public", "private")), aby3._mul_ab_public_private
+        )
+        self.assertIs(table.lookup("while_loop", ()), aby3._while_loop_)
+
+    def test_missing_combination(self):
+        table = dispatch_table(aby3)
+        with self.assertRaisesRegex(TypeError, "matmul.*implemented for"):
+            table.lookup("matmul", ("private", "private", "private"))
+
+
+class TestMemoize(unittest.TestCase):
+    def setUp(self):
+        self.debug_mode = tfe.get_config().debug
+        tfe.get_config().set_debug_mode(False)
+
+    def tearDown(self):
+        tfe.get_config().set_debug_mode(self.debug_mode)
+
+    def test_reset_clears_nodes(self):
+        prot = ABY3()
+        tfe.set_protocol(prot)
+
+        x = tfe.define_private_variable(tf.ones(shape=(2, 2)))
+        y = x + x
+        self.assertIs(x + x, y)
+
+        prot.reset()
+        self.assertEqual(len(prot.nodes), 0)
+
+    def test_function_clears_trace_nodes(self):
+        prot = ABY3()
+        tfe.set_protocol(prot)
+
+        x = tfe.define_private_variable(tf.ones(shape=(2, 2)))
+        size_before = len(prot.nodes)
+
+        @tfe.function
+        def double(x):
+            return (x + x).reveal().to_native()
+
+        result = double(x)
+        np.testing.assert_allclose(result, np.ones((2, 2)) * 2, rtol=0.0, atol=0.01)
+        self.assertEqual(len(prot.nodes), size_before)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -24,7 +24,6 @@ from tf_encrypted.protocol.pond import PondPrivateTensor
 from tf_encrypted.protocol.pond import PondPublicTensor
 from tf_encrypted.protocol.pond import PondTensor
 from tf_encrypted.protocol.pond import _type
-from tf_encrypted.protocol.protocol import nodes
 from tf_encrypted.protocol.securenn.odd_tensor import oddint64_factory
 from tf_encrypted.tensor import int64factory
 from tf_encrypted.tensor import native_factory
@@ -419,7 +418,7 @@ class SecureNN(Pond):
         :param str padding: Which type of padding to use ("SAME" or "VALID").
         """
         node_key = ("maxpool2d", x, tuple(pool_size), tuple(strides), padding)
-        z = nodes.get(node_key, None)
+        z = self.nodes.get(node_key, None)
 
         if z is not None:
             return z
@@ -435,7 +434,7 @@ class SecureNN(Pond):
             raise TypeError("Don't know how to avgpool2d {}".format(type(x)))
 
         z = func(self, x, pool_size, strides, padding)
-        nodes[node_key] = z
+        self.nodes[node_key] = z
 
         return z
 
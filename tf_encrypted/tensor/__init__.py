@@ -13,8 +13,10 @@ from .fixed import fixed100_ni
 from .int100 import int100factory
 from .int128 import int128_factory
 from .native import native_factory
+from .packedboolfactory import packed_bool_factory
 
 int1factory = bool_factory()
+int1packedfactory = packed_bool_factory()
 int8factory = native_factory(tf.int8)
 int16factory = native_factory(tf.int16)
 int32factory = native_factory(tf.int32)
@@ -51,6 +53,7 @@ assert _validate_fixedpoint_config(fixed64_heuristic, int64factory)
 
 __all__ = [
     "int1factory",
+    "int1packedfactory",
     "int8factory",
     "int16factory",
     "int32factory",
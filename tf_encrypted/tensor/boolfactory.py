@@ -290,11 +290,11 @@ def bool_factory():
 
         def assign(self, value: Union[Tensor, np.ndarray]) -> None:
             if isinstance(value, Tensor):
-                self.variable.assign(value.value)
-            if isinstance(value, np.ndarray):
-                self.variable.assign(value)
-
-            raise TypeError("Don't know how to handle {}".format(type(value)))
+                return self.variable.assign(value.value)
+            elif isinstance(value, np.ndarray):
+                return self.variable.assign(value)
+            else:
+                raise TypeError("Don't know how to handle {}".format(type(value)))
 
         def read_value(self) -> Tensor:
             return Tensor(self.variable.read_value())
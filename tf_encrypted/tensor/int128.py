@@ -361,9 +361,11 @@ def int128_factory():  # pylint: disable=invalid-name
             value = tf_i128.mul(x.value, y.value)
             return Tensor(value)
 
-        def matmul(self, other):
+        def matmul(self, other, transpose_a=False, transpose_b=False):
             x, y = _lift(self, other)
-            value = tf_i128.matmul(x.value, y.value)
+            value = tf_i128.matmul(
+                x.value, y.value, transpose_a=transpose_a, transpose_b=transpose_b
+            )
             return Tensor(value)
 
         def bit_reverse(self):
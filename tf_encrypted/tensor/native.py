@@ -24,18 +24,30 @@ from .shared import binarize
 from .shared import conv2d
 from .shared import im2col
 from .shared import im2patches
+from .shared import limb_matmul
 from .shared import patches2im
 
 
 def native_factory(
     NATIVE_TYPE,
     EXPLICIT_MODULUS=None,
+    MATMUL_LIMB_BITS=None,
 ):  # pylint: disable=invalid-name
-    """Constructs the native tensor Factory."""
+    """Constructs the native tensor Factory.
+
+    If `MATMUL_LIMB_BITS` is given, matrix multiplications are computed exactly
+    with float64 matrix multiplications on limbs of that many bits instead of
+    integer ones, see `shared.limb_matmul`. This can also be changed on an
+    existing factory through its `matmul_limb_bits` attribute, and is ignored
+    when an explicit modulus is used.
+    """
 
     class Factory(AbstractFactory):
         """Native tensor factory."""
 
+        def __init__(self):
+            self.matmul_limb_bits = MATMUL_LIMB_BITS
+
         def tensor(self, initial_value, encode: bool = True):
             if encode:
                 initial_value = self._encode(initial_value)
@@ -360,9 +372,21 @@ def native_factory(
                 value %= EXPLICIT_MODULUS
             return Tensor(value)
 
-        def matmul(self, other):
+        def matmul(self, other, transpose_a=False, transpose_b=False):
             x, y = _lift(self, other)
-            value = tf.matmul(x.value, y.value)
+            limb_bits = FACTORY.matmul_limb_bits
+            if limb_bits is not None and EXPLICIT_MODULUS is None:
+                value = limb_matmul(
+                    x.value,
+                    y.value,
+                    limb_bits,
+                    transpose_a=transpose_a,
+                    transpose_b=transpose_b,
+                )
+            else:
+                value = tf.matmul(
+                    x.value, y.value, transpose_a=transpose_a, transpose_b=transpose_b
+                )
             if EXPLICIT_MODULUS is not None:
                 value %= EXPLICIT_MODULUS
             return Tensor(value)
@@ -5,6 +5,7 @@ import numpy as np
 import tensorflow as tf
 
 from tf_encrypted.tensor import int64factory
+from tf_encrypted.tensor import native_factory
 
 
 class TestInt64Tensor(unittest.TestCase):
@@ -69,6 +70,19 @@ class TestInt64Tensor(unittest.TestCase):
             np.testing.assert_equal(actual[j], bin_list)
             j += 1
 
+    def test_limb_matmul(self) -> None:
+        limb_factory = native_factory(tf.int64, MATMUL_LIMB_BITS=22)
+        info = np.iinfo(np.int64)
+
+        # inner dimension spans several float64 chunks of 2**9
+        for shape_x, shape_y in [((7, 1100), (1100, 5)), ((2, 3, 4), (2, 4, 6))]:
+            x = np.random.randint(info.min, info.max, size=shape_x, dtype=np.int64)
+            y = np.random.randint(info.min, info.max, size=shape_y, dtype=np.int64)
+
+            expected = int64factory.tensor(x).matmul(int64factory.tensor(y))
+            actual = limb_factory.tensor(x).matmul(limb_factory.tensor(y))
+            np.testing.assert_array_equal(actual.to_native(), expected.to_native())
+
 
 class TestConv2D(unittest.TestCase):
     def test_forward(self) -> None:
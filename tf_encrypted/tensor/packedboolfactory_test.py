@@ -0,0 +1,88 @@
+# pylint: disable=missing-docstring
+import unittest
+
+import numpy as np
+import tensorflow as tf
+
+from tf_encrypted.operations import secure_random
+from tf_encrypted.tensor import int1packedfactory
+from tf_encrypted.tensor import int64factory
+
+
+class TestPackedBoolTensor(unittest.TestCase):
+    def setUp(self):
+        self.x = np.random.randint(0, 2, size=(3, 50)).astype(bool)
+        self.y = np.random.randint(0, 2, size=(3, 50)).astype(bool)
+
+    def test_round_trip(self):
+        for shape in [(), (1,), (64,), (65,), (3, 50), (2, 3, 64)]:
+            x = np.random.randint(0, 2, size=shape).astype(bool)
+            t = int1packedfactory.tensor(x)
+            self.assertEqual(t.shape, tf.TensorShape(shape))
+            self.assertEqual(t.words.shape, [(x.size + 63) // 64])
+            np.testing.assert_array_equal(t.to_native(), x)
+
+    def test_bitwise(self):
+        x = int1packedfactory.tensor(self.x)
+        y = int1packedfactory.tensor(self.y)
+
+        np.testing.assert_array_equal((x ^ y).to_native(), self.x ^ self.y)
+        np.testing.assert_array_equal((x & y).to_native(), self.x & self.y)
+        np.testing.assert_array_equal((x | y).to_native(), self.x | self.y)
+        np.testing.assert_array_equal((~x).to_native(), ~self.x)
+
+    def test_broadcast(self):
+        x = int1packedfactory.tensor(self.x)
+        np.testing.assert_array_equal((x ^ 1).to_native(), ~self.x)
+        np.testing.assert_array_equal((x & 0).to_native(), np.zeros_like(self.x))
+
+        row = int1packedfactory.tensor(self.y[0])
+        np.testing.assert_array_equal((x & row).to_native(), self.x & self.y[0])
+
+    def test_where(self):
+        x = int1packedfactory.tensor(self.x)
+        y = int1packedfactory.tensor(self.y)
+        c = np.random.randint(0, 2, size=(3, 50)).astype(bool)
+
+        expected = np.where(c, self.x, self.y)
+        z = int1packedfactory.where(int1packedfactory.tensor(c), x, y)
+        np.testing.assert_array_equal(z.to_native(), expected)
+        z = int1packedfactory.where(tf.constant(c), x, y)
+        np.testing.assert_array_equal(z.to_native(), expected)
+
+    def test_reshape_and_gather(self):
+        x = int1packedfactory.tensor(self.x)
+
+        np.testing.assert_array_equal(
+            x.reshape([-1, 15]).to_native(), self.x.reshape([-1, 15])
+        )
+        np.testing.assert_array_equal(
+            x.expand_dims(1).squeeze([1]).to_native(), self.x
+        )
+        np.testing.assert_array_equal(
+            x.gather([2, 0], axis=0).to_native(), self.x[[2, 0]]
+        )
+        np.testing.assert_array_equal(x.transpose([1, 0]).to_native(), self.x.T)
+        np.testing.assert_array_equal(x[:, 10:20].to_native(), self.x[:, 10:20])
+
+    def test_cast(self):
+        x = int1packedfactory.tensor(self.x)
+        np.testing.assert_array_equal(
+            x.cast(int64factory).to_native(), self.x.astype(np.int64)
+        )
+        y = int64factory.tensor(self.x.astype(np.int64)).cast(int1packedfactory)
+        np.testing.assert_array_equal(y.to_native(), self.x)
+
+    def test_seeded_uniform(self):
+        if secure_random.supports_seeded_randomness():
+            seed = secure_random.secure_seed()
+        else:
+            seed = tf.constant([1, 2], dtype=tf.int64)
+        x = int1packedfactory.sample_seeded_uniform([5, 100], seed)
+        y = int1packedfactory.sample_seeded_uniform([5, 100], seed)
+        self.assertEqual(x.shape, tf.TensorShape([5, 100]))
+        np.testing.assert_array_equal(x.to_native(), y.to_native())
+
+
+if __name__ == "__main__":
+    unittest.main()
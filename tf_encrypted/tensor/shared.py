@@ -42,6 +42,73 @@ def bits(
         # return tf.stack(bits, axis=-1)
 
 
+# integers up to 2**53 are exactly representable as float64
+FLOAT64_EXACT_BITS = 53
+
+
+def limb_matmul(
+    x: tf.Tensor,
+    y: tf.Tensor,
+    limb_bits: int = 22,
+    transpose_a: bool = False,
+    transpose_b: bool = False,
+) -> tf.Tensor:
+    """
+    Matrix multiplication of integer tensors modulo 2**nbits of their dtype,
+    computed exactly with float64 matrix multiplications.
+
+    Both operands are split into unsigned limbs of `limb_bits` bits. The
+    product of two limbs has at most `2 * limb_bits` bits, so the inner
+    dimension is processed in chunks small enough for the float64 sums to stay
+    exact. Only the limb products contributing to the low `nbits` bits of the
+    result are computed, e.g. 6 for 64 bit integers and 22 bit limbs.
+    """
+
+    nbits = x.dtype.size * 8
+    if not 0 < 2 * limb_bits < FLOAT64_EXACT_BITS:
+        raise ValueError("Limbs of {} bits are not supported".format(limb_bits))
+
+    if transpose_a:
+        x = tf.linalg.matrix_transpose(x)
+    if transpose_b:
+        y = tf.linalg.matrix_transpose(y)
+
+    inner = x.shape[-1]
+    if inner is None:
+        return tf.matmul(x, y)
+
+    with tf.name_scope("limb-matmul"):
+        n_limbs = math.ceil(nbits / limb_bits)
+        mask = (1 << limb_bits) - 1
+        chunk = 2 ** (FLOAT64_EXACT_BITS - 2 * limb_bits)
+
+        def split(z):
+            return [
+                tf.cast(
+                    tf.bitwise.bitwise_and(
+                        tf.bitwise.right_shift(z, i * limb_bits), tf.cast(mask, z.dtype)
+                    ),
+                    tf.float64,
+                )
+                for i in range(n_limbs)
+            ]
+
+        x_limbs = split(x)
+        y_limbs = split(y)
+
+        result = None
+        for i in range(n_limbs):
+            for j in range(n_limbs - i):
+                for start in range(0, inner, chunk):
+                    xi = x_limbs[i][..., start : start + chunk]
+                    yj = y_limbs[j][..., start : start + chunk, :]
+                    z = tf.cast(tf.matmul(xi, yj), tf.int64)
+                    z = z * (1 << ((i + j) * limb_bits))
+                    result = z if result is None else result + z
+
+        return tf.cast(result, x.dtype)
+
+
 def im2patches(x, patch_size, strides=[1, 1], padding="SAME", data_format="NCHW"):
     """
     :param x: a 4-D Tensor.